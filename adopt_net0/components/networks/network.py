@@ -12,6 +12,8 @@ import copy
 import pyomo.environ as pyo
 import pyomo.gdp as gdp
 
+from ...model_construction.profiling import profile
+
 import logging
 
 log = logging.getLogger(__name__)
@@ -240,7 +242,7 @@ class Network(ModelComponent):
         self.processed_coeff.time_independent = time_independent
 
     def construct_netw_model(
-        self, b_netw, data: dict, set_nodes, set_t_full, set_t_clustered
+        self, b_netw, data: dict, set_nodes, set_t_full, set_t_clustered, profiler=None
     ):
         """
         Constructs a network as model block.
@@ -250,6 +252,8 @@ class Network(ModelComponent):
         :param set_nodes: pyomo set containing all nodes
         :param set_t_full: pyomo set containing timesteps
         :param set_t_clustered: pyomo set containing clustered timesteps
+        :param ConstructionProfiler profiler: profiler recording the construction of
+            the arcs (None = no profiling)
         :return: pyomo block with network model
         """
         # LOG
@@ -292,21 +296,23 @@ class Network(ModelComponent):
             Constructs each arc as a block
             """
 
-            b_arc.big_m_transformation_required = 0
-            b_arc = self._define_size_arc(b_arc, b_netw, node_from, node_to)
-            b_arc = self._define_capex_variables_arc(b_arc, b_netw)
-            b_arc = self._define_capex_constraints_arc(
-                b_arc, b_netw, node_from, node_to
-            )
-            b_arc = self._define_flow(b_arc, b_netw)
-            b_arc = self._define_opex_arc(b_arc, b_netw)
-            b_arc = self._define_emissions_arc(b_arc, b_netw)
+            with profile(profiler, b_arc, "arc", "construct_arc"):
+                b_arc.big_m_transformation_required = 0
+                b_arc = self._define_size_arc(b_arc, b_netw, node_from, node_to)
+                b_arc = self._define_capex_variables_arc(b_arc, b_netw)
+                b_arc = self._define_capex_constraints_arc(
+                    b_arc, b_netw, node_from, node_to
+                )
+                b_arc = self._define_flow(b_arc, b_netw)
+                b_arc = self._define_opex_arc(b_arc, b_netw)
+                b_arc = self._define_emissions_arc(b_arc, b_netw)
 
-            if self.component_options.energyconsumption:
-                b_arc = self._define_energyconsumption_arc(b_arc, b_netw)
+                if self.component_options.energyconsumption:
+                    b_arc = self._define_energyconsumption_arc(b_arc, b_netw)
 
             if b_arc.big_m_transformation_required:
-                b_arc = perform_disjunct_relaxation(b_arc)
+                with profile(profiler, b_arc, "arc", "perform_disjunct_relaxation"):
+                    b_arc = perform_disjunct_relaxation(b_arc)
 
             # LOG
             log_msg = f"\t\t - Constructing Arc {node_from} - {node_to} " f"completed"
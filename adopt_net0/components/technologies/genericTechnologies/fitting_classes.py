@@ -1,9 +1,9 @@
-import statsmodels.api as sm
 import numpy as np
 
 from ..utilities import (
-    fit_linear_function,
+    fit_linear_function_batched,
     fit_piecewise_function,
+    add_constant,
     sig_figs,
 )
 
@@ -26,12 +26,13 @@ class FitGenericTecTypeType1:
         :param dict performance_data: performance data
         """
         x = performance_data["in"]
+        carriers = list(performance_data["out"])
+        y = np.column_stack([performance_data["out"][car] for car in carriers])
+        fit = fit_linear_function_batched(x, y)
 
-        for car in performance_data["out"]:
+        for idx, car in enumerate(carriers):
             self.coeff[car] = {}
-            y = performance_data["out"][car]
-            fit = fit_linear_function(x, y)
-            self.coeff[car]["alpha1"] = sig_figs(fit[0], 6)
+            self.coeff[car]["alpha1"] = sig_figs(fit[0, idx], 6)
 
         return self.coeff
 
@@ -116,15 +117,15 @@ class FitGenericTecTypeType2:
 
         :param dict performance_data: performance data
         """
-        x = performance_data["in"]
-        x = sm.add_constant(x)
+        x = add_constant(performance_data["in"])
+        carriers = list(performance_data["out"])
+        y = np.column_stack([performance_data["out"][car] for car in carriers])
+        fit = fit_linear_function_batched(x, y)
 
-        for car in performance_data["out"]:
+        for idx, car in enumerate(carriers):
             self.coeff[car] = {}
-            y = performance_data["out"][car]
-            fit = fit_linear_function(x, y)
-            self.coeff[car]["alpha1"] = sig_figs(fit[1], 6)
-            self.coeff[car]["alpha2"] = sig_figs(fit[0], 6)
+            self.coeff[car]["alpha1"] = sig_figs(fit[1, idx], 6)
+            self.coeff[car]["alpha2"] = sig_figs(fit[0, idx], 6)
 
         return self.coeff
 
@@ -1,14 +1,206 @@
 import warnings
+import json
+import hashlib
+from functools import lru_cache
 import pvlib
 from timezonefinder import TimezoneFinder
 import pandas as pd
 from pathlib import Path
 import pyomo.environ as pyo
-from scipy.interpolate import interp1d
 import numpy as np
 
 from ..technology import Technology
-from ...utilities import get_attribute_from_dict
+from ...utilities import get_attribute_from_dict, get_climate_data_fingerprint
+
+# Maximum number of PV capacity factor time series kept in memory
+PV_CACHE_SIZE = 128
+
+_pv_performance_cache = {}
+
+
+@lru_cache(maxsize=1)
+def get_cec_module_database() -> pd.DataFrame:
+    """
+    Returns the CEC module database of pvlib
+
+    The database is read only once per process.
+
+    :return: CEC module database
+    :rtype: pd.DataFrame
+    """
+    return pvlib.pvsystem.retrieve_sam("CECMod")
+
+
+def clear_pv_performance_cache():
+    """
+    Clears the memoized PV capacity factors
+    """
+    _pv_performance_cache.clear()
+
+
+class WindTurbineCurveRegistry:
+    """
+    Registry of wind turbine power curves
+
+    The power curves in ``data/technology_data/RES/WT_data/WT_data.csv`` are read
+    once and kept as numpy arrays. Capacity factors are memoized per turbine, hub
+    height, power-law exponent and wind speed time series.
+
+    :param Path data_path: path to the csv file containing the power curves
+    :param int cache_size: number of capacity factor time series kept in memory
+    """
+
+    default_turbine = "WindTurbine_Onshore_1500"
+
+    def __init__(self, data_path: Path = None, cache_size: int = 128):
+        """
+        Constructor
+        """
+        if data_path is None:
+            data_path = (
+                Path(__file__).parent.parent.parent.parent
+                / "data/technology_data/RES/WT_data/WT_data.csv"
+            )
+        self.data_path = data_path
+        self.cache_size = cache_size
+        # Wind speeds of the power curves in m/s
+        self.wind_speeds = np.linspace(0, 35, 71)
+        self._turbines = None
+        self._capacity_factors = {}
+
+    def _load(self):
+        """
+        Reads the power curves (only once)
+        """
+        if self._turbines is None:
+            wt_data = pd.read_csv(self.data_path, delimiter=";")
+            rated_power = wt_data["RatedPowerkW"].to_numpy(dtype=float)
+            power_curves = wt_data.iloc[:, 13:84].to_numpy(dtype=float)
+            self._turbines = {}
+            for idx, name in enumerate(wt_data["TurbineName"]):
+                if name not in self._turbines:
+                    self._turbines[name] = (rated_power[idx], power_curves[idx])
+
+    def get_power_curve(self, name: str) -> tuple:
+        """
+        Returns rated power and power curve of a wind turbine
+
+        If the turbine is not in the csv file, the standard turbine
+        WindTurbine_Onshore_1500 is used.
+
+        :param str name: name of the turbine
+        :return: rated power in kW, power output in kW at self.wind_speeds
+        :rtype: tuple
+        """
+        self._load()
+        if name not in self._turbines:
+            warnings.warn(
+                "TurbineName not in csv, standard WindTurbine_Onshore_1500 selected."
+            )
+            name = self.default_turbine
+        return self._turbines[name]
+
+    def calculate_capacity_factors(self, ws: np.array, turbines: list) -> np.array:
+        """
+        Calculates capacity factors of wind turbines
+
+        All turbines with the same hub height and power-law exponent are evaluated
+        in one batch. Missing wind speeds (NaN) result in missing capacity factors.
+
+        :param np.array ws: wind speeds at 10 m
+        :param list turbines: list of tuples (name, hubheight, power-law exponent)
+        :return: capacity factors with shape (len(turbines), len(ws))
+        :rtype: np.array
+        """
+        ws = np.asarray(ws, dtype=float)
+        ws_fingerprint = hashlib.sha256(ws.tobytes()).hexdigest()
+
+        # Turbines not yet in the cache grouped by wind speeds at hub height
+        batches = {}
+        calculated = {}
+        for name, hubheight, alpha in turbines:
+            key = (name, float(hubheight), float(alpha), ws_fingerprint)
+            if key not in self._capacity_factors:
+                batches.setdefault((float(hubheight), float(alpha)), {})[key] = name
+
+        for (hubheight, alpha), batch in batches.items():
+            # Correct wind speed for height
+            if hubheight > 0:
+                ws_hub = ws * (hubheight / 10) ** alpha
+            else:
+                ws_hub = ws.copy()
+            ws_hub[ws_hub < 0] = 0
+
+            # Missing wind speeds result in missing capacity factors
+            missing = ~np.isfinite(ws_hub)
+            ws_hub[missing] = 0
+
+            # Linear interpolation of all power curves at once
+            ws_hub = np.minimum(ws_hub, self.wind_speeds[-1])
+            step = self.wind_speeds[1] - self.wind_speeds[0]
+            idx = np.minimum((ws_hub // step).astype(int), len(self.wind_speeds) - 2)
+            weight = (ws_hub - self.wind_speeds[idx]) / step
+            rated_power, power_curves = zip(
+                *[self.get_power_curve(name) for name in batch.values()]
+            )
+            power_curves = np.array(power_curves)
+            power = (
+                power_curves[:, idx] * (1 - weight) + power_curves[:, idx + 1] * weight
+            )
+            capacity_factors = power / np.array(rated_power)[:, np.newaxis]
+            capacity_factors[:, missing] = np.nan
+
+            for key, capacity_factor in zip(batch.keys(), capacity_factors):
+                if len(self._capacity_factors) >= self.cache_size:
+                    del self._capacity_factors[next(iter(self._capacity_factors))]
+                capacity_factor.flags.writeable = False
+                self._capacity_factors[key] = capacity_factor
+                calculated[key] = capacity_factor
+
+        # Batches larger than the cache are taken from the calculated values
+        capacity_factors = []
+        for name, hubheight, alpha in turbines:
+            key = (name, float(hubheight), float(alpha), ws_fingerprint)
+            if key in calculated:
+                capacity_factors.append(calculated[key])
+            else:
+                capacity_factors.append(self._capacity_factors[key])
+
+        return np.array(capacity_factors)
+
+    def clear_cache(self):
+        """
+        Clears the memoized capacity factors
+        """
+        self._capacity_factors.clear()
+
+
+wind_turbine_curves = WindTurbineCurveRegistry()
+
+
+def calculate_wind_turbine_capacity_factors(tecs: list, climate_data: list):
+    """
+    Calculates the capacity factors of many wind turbines in one batch
+
+    All wind turbines with the same climate data (e.g. all wind turbines of a node)
+    are evaluated with one call to the registry. The capacity factors are memoized
+    in the registry, the subsequent fitting of the wind turbines uses them. Other
+    technologies are ignored.
+
+    :param list tecs: technologies to fit
+    :param list climate_data: climate data of each technology
+    """
+    batches = {}
+    for tec, climate in zip(tecs, climate_data):
+        if isinstance(tec, Res):
+            turbine = tec.get_wind_turbine()
+            if turbine is not None:
+                batches.setdefault(id(climate), (climate, []))[1].append(turbine)
+
+    for climate, turbines in batches.values():
+        wind_turbine_curves.calculate_capacity_factors(
+            climate["ws10"].to_numpy(), turbines
+        )
 
 
 class Res(Technology):
@@ -69,17 +261,26 @@ class Res(Technology):
             self._perform_fitting_ST(climate_data)
 
         elif "WindTurbine" in self.name:
-            if "hubheight" in self.input_parameters.performance_data:
-                hubheight = self.input_parameters.performance_data["hubheight"]
-            else:
-                hubheight = 120
-            self._perform_fitting_wt(climate_data, hubheight)
+            _, hubheight, alpha = self.get_wind_turbine()
+            self._perform_fitting_wt(climate_data, hubheight, alpha)
 
         # Options
         self.component_options.other["curtailment"] = get_attribute_from_dict(
             self.input_parameters.performance_data, "curtailment", 0
         )
 
+    def get_fitting_data_files(self) -> list:
+        """
+        Returns the data files read when fitting the technology performance
+
+        :return: paths of the data files (power curves of wind turbines)
+        :rtype: list
+        """
+        if "WindTurbine" in self.name:
+            return [wind_turbine_curves.data_path]
+        else:
+            return []
+
     def _perform_fitting_pv(self, climate_data: pd.DataFrame, location: dict, **kwargs):
         """
         Calculates capacity factors and specific area requirements for a PV system using pvlib
@@ -97,6 +298,63 @@ class Res(Technology):
         else:
             system_data = kwargs["system_data"]
 
+        # Define parameters for convinience
+        lon = location["lon"]
+        lat = location["lat"]
+        alt = location["alt"]
+
+        if (
+            (np.isnan(location["lon"]))
+            or (np.isnan(location["lat"]))
+            or (np.isnan(location["alt"]))
+        ):
+            raise Exception(
+                "To use Photovoltaic technology you need to specify a "
+                "location in the NodeLocations.csv file"
+            )
+
+        # Identical locations, systems and climate data result in the same
+        # performance
+        cache_key = (
+            float(lon),
+            float(lat),
+            float(alt),
+            json.dumps(system_data, sort_keys=True, default=str),
+            get_climate_data_fingerprint(climate_data),
+        )
+        if cache_key not in _pv_performance_cache:
+            if len(_pv_performance_cache) >= PV_CACHE_SIZE:
+                del _pv_performance_cache[next(iter(_pv_performance_cache))]
+            _pv_performance_cache[cache_key] = self._calculate_pv_performance(
+                climate_data, lon, lat, alt, system_data
+            )
+        capacity_factor, specific_area = _pv_performance_cache[cache_key]
+
+        # Coefficients
+        self.processed_coeff.time_dependent_full["capfactor"] = capacity_factor.copy()
+        self.processed_coeff.time_independent["specific_area"] = specific_area
+
+    @staticmethod
+    def _calculate_pv_performance(
+        climate_data: pd.DataFrame,
+        lon: float,
+        lat: float,
+        alt: float,
+        system_data: dict,
+    ) -> tuple:
+        """
+        Runs the pvlib model chain of a PV system
+
+        :param pd.Dataframe climate_data: dataframe containing climate data
+        :param float lon: longitude
+        :param float lat: latitude
+        :param float alt: altitude
+        :param dict system_data: contains data on tilt, surface_azimuth,
+            module_name, inverter efficiency
+        :return: capacity factors, specific area requirements
+        :rtype: tuple
+        """
+
         def define_pv_system(location: dict, system_data: dict):
             """
             defines the pv system
@@ -106,7 +364,7 @@ class Res(Technology):
             module_name, inverter efficiency
             :return: returns PV model chain, peak power, specific area requirements
             """
-            module_database = pvlib.pvsystem.retrieve_sam("CECMod")
+            module_database = get_cec_module_database()
             module = module_database[system_data["module_name"]]
 
             # Define temperature losses of module
@@ -137,21 +395,6 @@ class Res(Technology):
 
             return pv_model, peakpower, specific_area
 
-        # Define parameters for convinience
-        lon = location["lon"]
-        lat = location["lat"]
-        alt = location["alt"]
-
-        if (
-            (np.isnan(location["lon"]))
-            or (np.isnan(location["lat"]))
-            or (np.isnan(location["alt"]))
-        ):
-            raise Exception(
-                "To use Photovoltaic technology you need to specify a "
-                "location in the NodeLocations.csv file"
-            )
-
         # Get location
         tf = TimezoneFinder()
         tz = tf.timezone_at(lng=lon, lat=lat)
@@ -167,9 +410,27 @@ class Res(Technology):
         power = pv_model.results.ac.p_mp
         capacity_factor = round(power / peakpower, 3)
 
-        # Coefficients
-        self.processed_coeff.time_dependent_full["capfactor"] = capacity_factor.values
-        self.processed_coeff.time_independent["specific_area"] = specific_area
+        return capacity_factor.to_numpy(), specific_area
+
+    def get_wind_turbine(self) -> tuple | None:
+        """
+        Returns the wind turbine as used by the registry of power curves
+
+        :return: (name, hubheight, power-law exponent) or None if the technology
+            is not a wind turbine
+        :rtype: tuple | None
+        """
+        if "WindTurbine" not in self.name:
+            return None
+
+        if "hubheight" in self.input_parameters.performance_data:
+            hubheight = self.input_parameters.performance_data["hubheight"]
+        else:
+            hubheight = 120
+        alpha = get_attribute_from_dict(
+            self.input_parameters.performance_data, "power_law_exponent", 1 / 7
+        )
+        return (self.name, hubheight, alpha)
 
     def _perform_fitting_ST(self, climate_data: pd.DataFrame):
         """
@@ -180,55 +441,25 @@ class Res(Technology):
         # Todo: code this
         pass
 
-    def _perform_fitting_wt(self, climate_data: pd.DataFrame, hubheight: float):
+    def _perform_fitting_wt(
+        self, climate_data: pd.DataFrame, hubheight: float, alpha: float = 1 / 7
+    ):
         """
         Calculates capacity factors for a wind turbine
 
-        The power curves are located in ``data/technology_data/RES/WT_data``
+        The power curves are located in ``data/technology_data/RES/WT_data``. The
+        power curve of the turbine with the same name as the technology is used. If
+        there is no such turbine, the standard turbine WindTurbine_Onshore_1500 is
+        used.
 
         :param pd.Dataframe climate_data: dataframe containing climate data
         :param float hubheight: hubheight of wind turbine
+        :param float alpha: power-law exponent to correct the wind speed for height
         """
-        # Load data for wind turbine type
-        wt_path = Path(__file__).parent.parent.parent.parent
-        wt_data_path = wt_path / "data/technology_data/RES/WT_data/WT_data.csv"
-        wt_data = pd.read_csv(wt_data_path, delimiter=";")
-
-        # match WT with data
-        if self.name in wt_data["TurbineName"]:
-            wt_data = wt_data[wt_data["TurbineName"] == self.name]
-        else:
-            wt_data = wt_data[wt_data["TurbineName"] == "WindTurbine_Onshore_1500"]
-            warnings.warn(
-                "TurbineName not in csv, standard WindTurbine_Onshore_1500 selected."
-            )
-
-        # Load wind speed and correct for height
-        ws = climate_data["ws10"]
-
-        # TODO: make power exponent choice possible
-        # TODO: Make different heights possible
-        alpha = 1 / 7
-        # if data.node_data.windPowerExponent(node) >= 0
-        #     alpha = data.node_data.windPowerExponent(node);
-        # else:
-        #     if data.node_data.offshore(node) == 1:
-        #         alpha = 0.45;
-        #     else:
-        #         alpha = 1 / 7;
-
-        if hubheight > 0:
-            ws = ws * (hubheight / 10) ** alpha
-
-        # Make power curve
-        rated_power = wt_data.iloc[0]["RatedPowerkW"]
-        x = np.linspace(0, 35, 71)
-        y = wt_data.iloc[:, 13:84]
-        y = y.to_numpy()
-
-        f = interp1d(x, y)
-        ws[ws < 0] = 0
-        capacity_factor = f(ws) / rated_power
+        rated_power = wind_turbine_curves.get_power_curve(self.name)[0]
+        capacity_factor = wind_turbine_curves.calculate_capacity_factors(
+            climate_data["ws10"].to_numpy(), [(self.name, hubheight, alpha)]
+        )
 
         # Coefficients
         self.processed_coeff.time_dependent_full["capfactor"] = capacity_factor[
@@ -1,16 +1,21 @@
 import warnings
+import os
+from functools import lru_cache
 
 import pyomo.environ as pyo
 import pyomo.gdp as gdp
-import copy
 import numpy as np
 import pandas as pd
 from pathlib import Path
-from scipy.interpolate import griddata
 
 from ..technology import Technology
-from ...utilities import link_full_resolution_to_clustered
-from ..utilities import fit_piecewise_function
+from ...utilities import link_full_resolution_to_clustered, get_attribute_from_dict
+from ..utilities import (
+    fit_piecewise_function,
+    fit_piecewise_function_batched,
+    get_unique_conditions,
+    interpolate_linear_batched,
+)
 
 
 import logging
@@ -18,6 +23,86 @@ import logging
 log = logging.getLogger(__name__)
 
 
+def read_ccpp_performance_tables(performance_data_path: Path | str) -> dict:
+    """
+    Reads the GT, HP and MP performance tables of a CCPP
+
+    The tables are read only once per process (and again if a file is modified).
+
+    :param Path | str performance_data_path: directory containing the files
+        GT_fitting_data.csv, HP_fitting_data.csv and MP_fitting_data.csv
+    :return: GT performance per IGV position and HP/MP performance tables
+    :rtype: dict
+    """
+    performance_data_path = Path(performance_data_path)
+    modification_times = tuple(
+        os.stat(performance_data_path / (table + "_fitting_data.csv")).st_mtime_ns
+        for table in ["GT", "HP", "MP"]
+    )
+    return _read_ccpp_performance_tables(str(performance_data_path), modification_times)
+
+
+@lru_cache(maxsize=16)
+def _read_ccpp_performance_tables(
+    performance_data_path: str, modification_times: tuple
+) -> dict:
+    """
+    Reads the GT, HP and MP performance tables of a CCPP (cached)
+
+    GT data: IGV positions with the same temperatures are grouped, such that they
+    can be interpolated together. For each group, the temperatures and an array
+    with columns (eta_el, p_in, share_thermal) for each IGV position is stored.
+
+    :param str performance_data_path: directory containing the files
+    :param tuple modification_times: modification times of the files (cache key)
+    :return: GT performance per IGV position and HP/MP performance tables
+    :rtype: dict
+    """
+    performance_data_path = Path(performance_data_path)
+    tables = {}
+
+    gt_data = pd.read_csv(performance_data_path / "GT_fitting_data.csv", sep=";")
+    gt_data["share_thermal"] = (gt_data["GT_P_el"] + gt_data["GT_P_th"]) / gt_data[
+        "GT_P_in"
+    ]
+    igv_positions = list(gt_data["IGV"].unique())
+    igv_groups = {}
+    for pos, igv_position in enumerate(igv_positions):
+        data = gt_data[gt_data["IGV"] == igv_position]
+        temperatures = data["T"].to_numpy(dtype=float)
+        key = temperatures.tobytes()
+        if key not in igv_groups:
+            igv_groups[key] = {"T": temperatures, "positions": [], "values": []}
+        igv_groups[key]["positions"].append(pos)
+        igv_groups[key]["values"].append(
+            data[["GT_eta", "GT_P_in", "share_thermal"]].to_numpy(dtype=float)
+        )
+
+    tables["GT"] = {"nr_igv_positions": len(igv_positions), "groups": []}
+    for group in igv_groups.values():
+        group["values"] = np.hstack(group["values"])
+        for item in [group["T"], group["values"]]:
+            item.flags.writeable = False
+        tables["GT"]["groups"].append(group)
+
+    for turbine in ["HP", "MP"]:
+        data = pd.read_csv(
+            performance_data_path / (turbine + "_fitting_data.csv"),
+            sep=";",
+            index_col=0,
+            header=[0, 1],
+        )
+        tables[turbine] = {
+            "T": data.index.to_numpy(dtype=float),
+            "columns": list(data.columns),
+            "values": data.to_numpy(dtype=float),
+        }
+        for item in [tables[turbine]["T"], tables[turbine]["values"]]:
+            item.flags.writeable = False
+
+    return tables
+
+
 class CCPP(Technology):
     """
     Combined Cycle Power Plant with Steam Production
@@ -187,6 +272,35 @@ class CCPP(Technology):
         self.component_options.other["max_steam_extract_MP"] = 51
         self.component_options.other["kappa_steam"] = 0.45
 
+    def _get_performance_data_path(self) -> Path:
+        """
+        Returns the directory containing the GT, HP and MP performance tables
+
+        :return: directory of the performance tables
+        :rtype: Path
+        """
+        if "performance_data_path" in self.input_parameters.performance_data:
+            return Path(self.input_parameters.performance_data["performance_data_path"])
+        else:
+            performance_data_path = Path(__file__).parent.parent.parent.parent
+            return (
+                performance_data_path
+                / "data/technology_data/PowerGeneration/CombinedCycle_fixed_size_data"
+            )
+
+    def get_fitting_data_files(self) -> list:
+        """
+        Returns the data files read when fitting the technology performance
+
+        :return: paths of the data files (GT, HP and MP performance tables)
+        :rtype: list
+        """
+        performance_data_path = self._get_performance_data_path()
+        return [
+            performance_data_path / (table + "_fitting_data.csv")
+            for table in ["GT", "HP", "MP"]
+        ]
+
     def fit_technology_performance(self, climate_data: pd.DataFrame, location: dict):
         """
         Performs fitting for technology type CCPP
@@ -197,76 +311,41 @@ class CCPP(Technology):
         """
         super(CCPP, self).fit_technology_performance(climate_data, location)
 
-        # Climate data & Number of timesteps
-        T = copy.deepcopy(climate_data["temp_air"])
+        # Climate data & Number of timesteps (without outliers)
+        T = np.clip(climate_data["temp_air"].to_numpy(dtype=float), 0, 30)
 
-        # Remove outliers
-        T[T >= 30] = 30
-        T[T <= 0] = 0
+        # Round temperature
+        decimals = get_attribute_from_dict(
+            self.input_parameters.performance_data, "fitting_condition_decimals", None
+        )
+        if decimals is not None:
+            T = np.round(T, decimals)
 
         # Determine correct reading paths
-        data_path = {}
-        if "performance_data_path" in self.input_parameters.performance_data:
-            performance_data_path = self.input_parameters.performance_data[
-                "performance_data_path"
-            ]
-        else:
-            performance_data_path = Path(__file__).parent.parent.parent.parent
-            performance_data_path = (
-                performance_data_path
-                / "data/technology_data/PowerGeneration/CombinedCycle_fixed_size_data"
-            )
+        performance_data_path = self._get_performance_data_path()
+        if "performance_data_path" not in self.input_parameters.performance_data:
             log.warning(
                 "Using performance data with noice (not the same as in "
                 "publication. Refer to the paper authors (Jan Wiegner) to get "
                 "the actual data."
             )
 
-        data_path["GT"] = Path("GT_fitting_data.csv")
-        data_path["HP"] = Path("HP_fitting_data.csv")
-        data_path["MP"] = Path("MP_fitting_data.csv")
+        perf_data = read_ccpp_performance_tables(performance_data_path)
 
-        # Fit GT performance
-        perf_data = {}
-        perf_data["GT"] = pd.read_csv(performance_data_path / data_path["GT"], sep=";")
-
-        for turbine in ["HP", "MP"]:
-            perf_data[turbine] = pd.read_csv(
-                performance_data_path / data_path[turbine],
-                sep=";",
-                index_col=0,
-                header=[0, 1],
-            )
-            perf_data[turbine] = pd.read_csv(
-                performance_data_path / data_path[turbine],
-                sep=";",
-                index_col=0,
-                header=[0, 1],
-            )
-
-        # Fit to temperature
-        igv_positions = list(perf_data["GT"]["IGV"].unique())
-        nr_igv_positions = len(igv_positions)
+        # Fit to temperature (each temperature only once)
+        T_full = T
+        T, T_index = get_unique_conditions(T_full)
+        nr_igv_positions = perf_data["GT"]["nr_igv_positions"]
         gt_eta_el = np.empty(shape=(len(T), nr_igv_positions))
         gt_p_in = np.empty(shape=(len(T), nr_igv_positions))
         gt_alpha_th = np.empty(shape=(len(T), nr_igv_positions))
 
-        pos = 0
-        for igv_position in igv_positions:
-            data = perf_data["GT"][perf_data["GT"]["IGV"] == igv_position]
-            gt_eta_el[:, pos] = griddata(
-                np.array(data["T"]), np.array(data["GT_eta"]), T, method="linear"
-            )
-            gt_p_in[:, pos] = griddata(
-                np.array(data["T"]), np.array(data["GT_P_in"]), T, method="linear"
-            )
-            data["share_thermal"] = (data["GT_P_el"] + data["GT_P_th"]) / data[
-                "GT_P_in"
-            ]
-            gt_alpha_th[:, pos] = griddata(
-                np.array(data["T"]), np.array(data["share_thermal"]), T, method="linear"
-            )
-            pos += 1
+        for group in perf_data["GT"]["groups"]:
+            interpolated = interpolate_linear_batched(T, group["T"], group["values"])
+            positions = group["positions"]
+            gt_eta_el[:, positions] = interpolated[:, 0::3]
+            gt_p_in[:, positions] = interpolated[:, 1::3]
+            gt_alpha_th[:, positions] = interpolated[:, 2::3]
 
         # Fit performance (piecewise performance GT)
         nr_segments = self.component_options.other["nr_segments"]
@@ -279,29 +358,50 @@ class CCPP(Technology):
 
         log.info("Deriving GT performance for CCPP...")
 
-        for timestep in range(len(T)):
-            if timestep % 100 == 1:
-                print("\rComplete: ", round(timestep / len(T), 2) * 100, "%", end="")
+        piecewise_fitting_method = get_attribute_from_dict(
+            self.input_parameters.performance_data,
+            "piecewise_fitting_method",
+            "batched",
+        )
 
+        if piecewise_fitting_method == "batched":
             # Input-Output relation
             y = {}
-            y["out_el"] = gt_p_in[timestep, :] * gt_eta_el[timestep, :]
-            time_step_fit = fit_piecewise_function(
-                gt_p_in[timestep, :], y, int(nr_segments)
-            )
-            alpha_el[timestep, :] = time_step_fit["out_el"]["alpha1"]
-            beta_el[timestep, :] = time_step_fit["out_el"]["alpha2"]
-            bp_el_x[timestep, :] = time_step_fit["out_el"]["bp_x"]
-            bp_el_y[timestep, :] = time_step_fit["out_el"]["bp_y"]
+            y["out_el"] = gt_p_in * gt_eta_el
+            batched_fit = fit_piecewise_function_batched(gt_p_in, y, int(nr_segments))
+            alpha_el = batched_fit["out_el"]["alpha1"]
+            beta_el = batched_fit["out_el"]["alpha2"]
+            bp_el_x = batched_fit["out_el"]["bp_x"]
+            bp_el_y = batched_fit["out_el"]["bp_y"]
+
+        else:
+            for timestep in range(len(T)):
+                if timestep % 100 == 1:
+                    print(
+                        "\rComplete: ", round(timestep / len(T), 2) * 100, "%", end=""
+                    )
+
+                # Input-Output relation
+                y = {}
+                y["out_el"] = gt_p_in[timestep, :] * gt_eta_el[timestep, :]
+                time_step_fit = fit_piecewise_function(
+                    gt_p_in[timestep, :], y, int(nr_segments)
+                )
+                alpha_el[timestep, :] = time_step_fit["out_el"]["alpha1"]
+                beta_el[timestep, :] = time_step_fit["out_el"]["alpha2"]
+                bp_el_x[timestep, :] = time_step_fit["out_el"]["bp_x"]
+                bp_el_y[timestep, :] = time_step_fit["out_el"]["bp_y"]
 
         print("Complete: ", 100, "%")
 
+        # Map to all time steps
         self.processed_coeff.time_dependent_full["GT"] = {}
-        self.processed_coeff.time_dependent_full["GT"]["alpha_el"] = alpha_el
-        self.processed_coeff.time_dependent_full["GT"]["beta_el"] = beta_el
-        self.processed_coeff.time_dependent_full["GT"]["bp_el_x"] = bp_el_x
-        self.processed_coeff.time_dependent_full["GT"]["bp_el_y"] = bp_el_y
-        self.processed_coeff.time_dependent_full["GT"]["alpha_th"] = alpha_th
+        self.processed_coeff.time_dependent_full["GT"]["alpha_el"] = alpha_el[T_index]
+        self.processed_coeff.time_dependent_full["GT"]["beta_el"] = beta_el[T_index]
+        self.processed_coeff.time_dependent_full["GT"]["bp_el_x"] = bp_el_x[T_index]
+        self.processed_coeff.time_dependent_full["GT"]["bp_el_y"] = bp_el_y[T_index]
+        self.processed_coeff.time_dependent_full["GT"]["alpha_th"] = alpha_th[T_index]
+        T = T_full
 
         # Fit HP/MP performance
         bp = {}
@@ -309,47 +409,27 @@ class CCPP(Technology):
         bp["MP"] = [0, 42.50, 100]
         for p in ["HP", "MP"]:
 
-            alpha_gt = np.empty(shape=(len(T), nr_segments))
-            alpha_hp = np.empty(shape=(len(T), nr_segments))
-            alpha_mp = np.empty(shape=(len(T), nr_segments))
-            alpha_cst = np.empty(shape=(len(T), nr_segments))
-            if self.component_options.other["component"] == "DB":
-                alpha_db = np.empty(shape=(len(T), nr_segments))
-            elif self.component_options.other["component"] == "OHB":
-                alpha_ohb = np.empty(shape=(len(T), nr_segments))
-
-            for par in [1, 2]:
-                data = perf_data[p]["GT"]["alpha_" + str(par)]
-                alpha_gt[:, par - 1] = griddata(
-                    np.array(data.index), np.array(data), T, method="linear"
-                )
-
-                data = perf_data[p]["HP"]["alpha_" + str(par)]
-                alpha_hp[:, par - 1] = griddata(
-                    np.array(data.index), np.array(data), T, method="linear"
-                )
-
-                data = perf_data[p]["MP"]["alpha_" + str(par)]
-                alpha_mp[:, par - 1] = griddata(
-                    np.array(data.index), np.array(data), T, method="linear"
-                )
-
-                data = perf_data[p]["cst"]["alpha_" + str(par)]
-                alpha_cst[:, par - 1] = griddata(
-                    np.array(data.index), np.array(data), T, method="linear"
+            interpolated = interpolate_linear_batched(
+                T, perf_data[p]["T"], perf_data[p]["values"]
+            )
+            interpolated = {
+                column: interpolated[:, col]
+                for col, column in enumerate(perf_data[p]["columns"])
+            }
+
+            def get_alphas(component):
+                return np.column_stack(
+                    [interpolated[(component, "alpha_" + str(par))] for par in [1, 2]]
                 )
 
-                if self.component_options.other["component"] == "DB":
-                    data = perf_data[p]["DB"]["alpha_" + str(par)]
-                    alpha_db[:, par - 1] = griddata(
-                        np.array(data.index), np.array(data), T, method="linear"
-                    )
-
-                elif self.component_options.other["component"] == "OHB":
-                    data = perf_data[p]["OHB"]["alpha_" + str(par)]
-                    alpha_ohb[:, par - 1] = griddata(
-                        np.array(data.index), np.array(data), T, method="linear"
-                    )
+            alpha_gt = get_alphas("GT")
+            alpha_hp = get_alphas("HP")
+            alpha_mp = get_alphas("MP")
+            alpha_cst = get_alphas("cst")
+            if self.component_options.other["component"] == "DB":
+                alpha_db = get_alphas("DB")
+            elif self.component_options.other["component"] == "OHB":
+                alpha_ohb = get_alphas("OHB")
 
             self.processed_coeff.time_independent[p] = {}
             self.processed_coeff.time_independent[p]["alpha_gt"] = alpha_gt
@@ -1,13 +1,18 @@
 import pyomo.environ as pyo
 import pyomo.gdp as gdp
-import copy
 import pandas as pd
 import numpy as np
 from pathlib import Path
-from scipy.interpolate import griddata
-
-from ..utilities import fit_piecewise_function
+from scipy.interpolate import LinearNDInterpolator
+from scipy.spatial import Delaunay
+
+from ..utilities import (
+    fit_piecewise_function,
+    fit_piecewise_function_batched,
+    get_unique_conditions,
+)
 from ..technology import Technology
+from ...utilities import get_attribute_from_dict
 
 import logging
 
@@ -42,6 +47,20 @@ class DacAdsorption(Technology):
         self.component_options.emissions_based_on = "output"
         self.component_options.main_output_carrier = "CO2captured"
 
+    def get_fitting_data_files(self) -> list:
+        """
+        Returns the data files read when fitting the technology performance
+
+        :return: paths of the data files (performance data)
+        :rtype: list
+        """
+        performance_data_path = Path(__file__).parent.parent.parent.parent
+        performance_data_path = (
+            performance_data_path
+            / "data/technology_data/CO2Capture/DAC_adsorption_data/dac_adsorption_performance.txt"
+        )
+        return [performance_data_path]
+
     def fit_technology_performance(self, climate_data: pd.DataFrame, location: dict):
         """
         Fits the technology performance
@@ -55,13 +74,7 @@ class DacAdsorption(Technology):
         nr_segments = self.input_parameters.performance_data["nr_segments"]
 
         # Read performance data from file
-        performance_data_path = Path(__file__).parent.parent.parent.parent
-        performance_data_path = (
-            performance_data_path
-            / "data/technology_data/CO2Capture/DAC_adsorption_data/dac_adsorption_performance.txt"
-        )
-
-        performance_data = pd.read_csv(performance_data_path, sep=",")
+        performance_data = pd.read_csv(self.get_fitting_data_files()[0], sep=",")
         performance_data = performance_data.rename(
             columns={"T": "temp_air", "RH": "humidity"}
         )
@@ -78,36 +91,62 @@ class DacAdsorption(Technology):
         )  # in MWh / h
         performance_data.CO2_Out = performance_data.CO2_Out / 1000  # in t / h
 
-        # Get humidity and temperature
-        RH = copy.deepcopy(climate_data["rh"])
-        T = copy.deepcopy(climate_data["temp_air"])
-
-        # Set minimum temperature
-        T.loc[T < min(performance_data.temp_air)] = min(performance_data.temp_air)
-
-        # Derive performance points for each timestep
-        def interpolate_performance_point(t, rh, point_data, var):
-            zi = griddata(
-                (point_data.temp_air, point_data.humidity),
-                point_data[var],
-                (T, RH),
-                method="linear",
-            )
-            return zi
+        # Get humidity and temperature (with minimum temperature)
+        RH = climate_data["rh"].to_numpy()
+        T = np.maximum(
+            climate_data["temp_air"].to_numpy(), min(performance_data.temp_air)
+        )
 
-        CO2_Out = np.empty(shape=(len(T), len(performance_data.Point.unique())))
-        E_tot = np.empty(shape=(len(T), len(performance_data.Point.unique())))
-        E_el = np.empty(shape=(len(T), len(performance_data.Point.unique())))
+        # Fit each (rounded) combination of temperature and humidity only once
+        conditions, condition_index = get_unique_conditions(
+            np.column_stack((T, RH)),
+            get_attribute_from_dict(
+                self.input_parameters.performance_data,
+                "fitting_condition_decimals",
+                None,
+            ),
+        )
+        T = conditions[:, 0]
+        RH = conditions[:, 1]
+
+        # Derive performance points for each timestep: one triangulation for all
+        # performance points with the same (temp_air, humidity) data, evaluated for
+        # all variables at once
+        variables = ["CO2_Out", "E_tot", "E_el"]
+        nr_points = len(performance_data.Point.unique())
+        point_sets = {}
         for point in performance_data.Point.unique():
-            CO2_Out[:, point - 1] = interpolate_performance_point(
-                T, RH, performance_data.loc[performance_data.Point == point], "CO2_Out"
+            point_data = performance_data.loc[performance_data.Point == point]
+            coordinates = point_data[["temp_air", "humidity"]].to_numpy(dtype=float)
+            key = (coordinates.shape, coordinates.tobytes())
+            if key not in point_sets:
+                point_sets[key] = {
+                    "coordinates": coordinates,
+                    "points": [],
+                    "values": [],
+                }
+            point_sets[key]["points"].append(point)
+            point_sets[key]["values"].append(
+                point_data[variables].to_numpy(dtype=float)
             )
-            E_tot[:, point - 1] = interpolate_performance_point(
-                T, RH, performance_data.loc[performance_data.Point == point], "E_tot"
-            )
-            E_el[:, point - 1] = interpolate_performance_point(
-                T, RH, performance_data.loc[performance_data.Point == point], "E_el"
+
+        performance = {}
+        for var in variables:
+            performance[var] = np.empty(shape=(len(T), nr_points))
+        for point_set in point_sets.values():
+            interpolator = LinearNDInterpolator(
+                Delaunay(point_set["coordinates"]), np.hstack(point_set["values"])
             )
+            interpolated = interpolator(conditions)
+            for idx, point in enumerate(point_set["points"]):
+                for var_idx, var in enumerate(variables):
+                    performance[var][:, point - 1] = interpolated[
+                        :, idx * len(variables) + var_idx
+                    ]
+
+        CO2_Out = performance["CO2_Out"]
+        E_tot = performance["E_tot"]
+        E_el = performance["E_el"]
 
         # Derive piecewise definition
         alpha = np.empty(shape=(len(T), nr_segments))
@@ -123,46 +162,82 @@ class DacAdsorption(Technology):
 
         log.info("Deriving performance data for DAC...")
 
-        for timestep in range(len(T)):
-            if timestep % 100 == 1:
-                print("\rComplete: ", round(timestep / len(T), 2) * 100, "%", end="")
+        piecewise_fitting_method = get_attribute_from_dict(
+            self.input_parameters.performance_data,
+            "piecewise_fitting_method",
+            "batched",
+        )
+
+        if piecewise_fitting_method == "batched":
             # Input-Output relation
             y = {}
-            y["CO2_Out"] = CO2_Out[timestep, :]
-            time_step_fit = fit_piecewise_function(
-                E_tot[timestep, :], y, int(nr_segments)
-            )
-            alpha[timestep, :] = time_step_fit["CO2_Out"]["alpha1"]
-            beta[timestep, :] = time_step_fit["CO2_Out"]["alpha2"]
-            b[timestep, :] = time_step_fit["CO2_Out"]["bp_x"]
-            out_max[timestep] = max(time_step_fit["CO2_Out"]["bp_y"])
-            total_in_max[timestep] = max(time_step_fit["CO2_Out"]["bp_x"])
+            y["CO2_Out"] = CO2_Out
+            batched_fit = fit_piecewise_function_batched(E_tot, y, int(nr_segments))
+            alpha = batched_fit["CO2_Out"]["alpha1"]
+            beta = batched_fit["CO2_Out"]["alpha2"]
+            b = batched_fit["CO2_Out"]["bp_x"]
+            out_max = batched_fit["CO2_Out"]["bp_y"].max(axis=1)
+            total_in_max = batched_fit["CO2_Out"]["bp_x"].max(axis=1)
 
             # Input-Input relation
             y = {}
-            y["E_el"] = E_el[timestep, :]
-            time_step_fit = fit_piecewise_function(
-                E_tot[timestep, :], y, int(nr_segments)
-            )
-            gamma[timestep, :] = time_step_fit["E_el"]["alpha1"]
-            delta[timestep, :] = time_step_fit["E_el"]["alpha2"]
-            a[timestep, :] = time_step_fit["E_el"]["bp_x"]
-            el_in_max[timestep] = max(time_step_fit["E_el"]["bp_y"])
-            th_in_max[timestep] = max(time_step_fit["E_el"]["bp_x"])
+            y["E_el"] = E_el
+            batched_fit = fit_piecewise_function_batched(E_tot, y, int(nr_segments))
+            gamma = batched_fit["E_el"]["alpha1"]
+            delta = batched_fit["E_el"]["alpha2"]
+            a = batched_fit["E_el"]["bp_x"]
+            el_in_max = batched_fit["E_el"]["bp_y"].max(axis=1)
+            th_in_max = batched_fit["E_el"]["bp_x"].max(axis=1)
+
+        else:
+            for timestep in range(len(T)):
+                if timestep % 100 == 1:
+                    print(
+                        "\rComplete: ", round(timestep / len(T), 2) * 100, "%", end=""
+                    )
+                # Input-Output relation
+                y = {}
+                y["CO2_Out"] = CO2_Out[timestep, :]
+                time_step_fit = fit_piecewise_function(
+                    E_tot[timestep, :], y, int(nr_segments)
+                )
+                alpha[timestep, :] = time_step_fit["CO2_Out"]["alpha1"]
+                beta[timestep, :] = time_step_fit["CO2_Out"]["alpha2"]
+                b[timestep, :] = time_step_fit["CO2_Out"]["bp_x"]
+                out_max[timestep] = max(time_step_fit["CO2_Out"]["bp_y"])
+                total_in_max[timestep] = max(time_step_fit["CO2_Out"]["bp_x"])
+
+                # Input-Input relation
+                y = {}
+                y["E_el"] = E_el[timestep, :]
+                time_step_fit = fit_piecewise_function(
+                    E_tot[timestep, :], y, int(nr_segments)
+                )
+                gamma[timestep, :] = time_step_fit["E_el"]["alpha1"]
+                delta[timestep, :] = time_step_fit["E_el"]["alpha2"]
+                a[timestep, :] = time_step_fit["E_el"]["bp_x"]
+                el_in_max[timestep] = max(time_step_fit["E_el"]["bp_y"])
+                th_in_max[timestep] = max(time_step_fit["E_el"]["bp_x"])
 
         print("Complete: ", 100, "%")
 
-        # Coefficients
-        self.processed_coeff.time_dependent_full["alpha"] = alpha
-        self.processed_coeff.time_dependent_full["beta"] = beta
-        self.processed_coeff.time_dependent_full["b"] = b
-        self.processed_coeff.time_dependent_full["gamma"] = gamma
-        self.processed_coeff.time_dependent_full["delta"] = delta
-        self.processed_coeff.time_dependent_full["a"] = a
-        self.processed_coeff.time_dependent_full["out_max"] = out_max
-        self.processed_coeff.time_dependent_full["el_in_max"] = el_in_max
-        self.processed_coeff.time_dependent_full["th_in_max"] = th_in_max
-        self.processed_coeff.time_dependent_full["total_in_max"] = total_in_max
+        # Coefficients (mapped to all time steps)
+        self.processed_coeff.time_dependent_full["alpha"] = alpha[condition_index]
+        self.processed_coeff.time_dependent_full["beta"] = beta[condition_index]
+        self.processed_coeff.time_dependent_full["b"] = b[condition_index]
+        self.processed_coeff.time_dependent_full["gamma"] = gamma[condition_index]
+        self.processed_coeff.time_dependent_full["delta"] = delta[condition_index]
+        self.processed_coeff.time_dependent_full["a"] = a[condition_index]
+        self.processed_coeff.time_dependent_full["out_max"] = out_max[condition_index]
+        self.processed_coeff.time_dependent_full["el_in_max"] = el_in_max[
+            condition_index
+        ]
+        self.processed_coeff.time_dependent_full["th_in_max"] = th_in_max[
+            condition_index
+        ]
+        self.processed_coeff.time_dependent_full["total_in_max"] = total_in_max[
+            condition_index
+        ]
 
         self.processed_coeff.time_independent["eta_elth"] = (
             self.input_parameters.performance_data["performance"]["eta_elth"]
@@ -2,12 +2,17 @@ import pyomo.environ as pyo
 import pyomo.gdp as gdp
 import copy
 import numpy as np
-import statsmodels.api as sm
 import pandas as pd
 
-from ..utilities import fit_piecewise_function, fit_linear_function
+from ..utilities import (
+    fit_piecewise_function,
+    fit_piecewise_function_batched,
+    fit_linear_function_batched,
+    add_constant,
+    get_unique_conditions,
+)
 from ..technology import Technology
-from ...utilities import link_full_resolution_to_clustered
+from ...utilities import link_full_resolution_to_clustered, get_attribute_from_dict
 
 import logging
 
@@ -74,6 +79,11 @@ class HeatPump(Technology):
 
         # Ambient air temperature
         T = copy.deepcopy(climate_data["temp_air"])
+        decimals = get_attribute_from_dict(
+            self.input_parameters.performance_data, "fitting_condition_decimals", None
+        )
+        if decimals is not None:
+            T = T.round(decimals)
 
         # Determine T_out
         if self.input_parameters.performance_data["application"] == "radiator_heating":
@@ -94,6 +104,10 @@ class HeatPump(Technology):
         elif "WaterSourced" in self.name:
             cop = 9.97 - 0.20 * delta_T + 0.0012 * delta_T**2
 
+        # Fit each COP only once
+        cop, cop_index = get_unique_conditions(cop)
+        time_steps = len(cop)
+
         log.info("Deriving performance data for Heat Pump...")
 
         if (
@@ -114,35 +128,43 @@ class HeatPump(Technology):
         alpha2 = np.empty(shape=(time_steps, size_alpha))
         bp_x = np.empty(shape=(time_steps, size_alpha + 1))
 
-        for idx, cop_t in enumerate(cop):
-            if idx % 100 == 1:
-                print("\rComplete: ", round(idx / time_steps, 2) * 100, "%", end="")
+        piecewise_fitting_method = get_attribute_from_dict(
+            self.input_parameters.performance_data,
+            "piecewise_fitting_method",
+            "batched",
+        )
 
-            if self.component_options.performance_function_type == 1:
-                x = np.linspace(
-                    self.input_parameters.performance_data["min_part_load"], 1, 9
-                )
-                y = (x / (1 - 0.9 * (1 - x))) * cop_t * x
-                coeff = fit_linear_function(x, y)
-                alpha1[idx, :] = coeff[0]
+        x = np.linspace(self.input_parameters.performance_data["min_part_load"], 1, 9)
+
+        if self.component_options.performance_function_type == 1:
+            # Linear performance function, all time steps at once
+            y = np.outer((x / (1 - 0.9 * (1 - x))) * x, cop)
+            coeff = fit_linear_function_batched(x, y)
+            alpha1[:, 0] = coeff[0]
+
+        elif self.component_options.performance_function_type == 2:
+            # Linear performance function, all time steps at once
+            y = np.outer((x / (1 - 0.9 * (1 - x))) * x, cop)
+            coeff = fit_linear_function_batched(add_constant(x), y)
+            alpha1[:, 0] = coeff[1]
+            alpha2[:, 0] = coeff[0]
+
+        elif piecewise_fitting_method == "batched":
+            # Piecewise performance function, all time steps at once
+            y = {}
+            y["out"] = np.outer(cop, (x / (1 - 0.9 * (1 - x))) * x)
+            batched_fit = fit_piecewise_function_batched(x, y, 2)
+            alpha1 = batched_fit["out"]["alpha1"]
+            alpha2 = batched_fit["out"]["alpha2"]
+            bp_x = batched_fit["out"]["bp_x"]
+
+        else:
+            # Piecewise performance function, each time step with pwlf
+            for idx, cop_t in enumerate(cop):
+                if idx % 100 == 1:
+                    print("\rComplete: ", round(idx / time_steps, 2) * 100, "%", end="")
 
-            elif self.component_options.performance_function_type == 2:
-                x = np.linspace(
-                    self.input_parameters.performance_data["min_part_load"], 1, 9
-                )
-                y = (x / (1 - 0.9 * (1 - x))) * cop_t * x
-                x = sm.add_constant(x)
-                coeff = fit_linear_function(x, y)
-                alpha1[idx, :] = coeff[1]
-                alpha2[idx, :] = coeff[0]
-
-            elif (
-                self.component_options.performance_function_type == 3
-            ):  # piecewise performance function
                 y = {}
-                x = np.linspace(
-                    self.input_parameters.performance_data["min_part_load"], 1, 9
-                )
                 y["out"] = (x / (1 - 0.9 * (1 - x))) * cop_t * x
                 time_step_fit = fit_piecewise_function(x, y, 2)
                 alpha1[idx, :] = time_step_fit["out"]["alpha1"]
@@ -150,6 +172,11 @@ class HeatPump(Technology):
                 bp_x[idx, :] = time_step_fit["out"]["bp_x"]
         print("Complete: ", 100, "%")
 
+        # Map to all time steps
+        alpha1 = alpha1[cop_index]
+        alpha2 = alpha2[cop_index]
+        bp_x = bp_x[cop_index]
+
         # Coefficients
         fit["coeff"] = {}
         if self.component_options.performance_function_type == 1:
@@ -1,5 +1,6 @@
 import pyomo.gdp as gdp
 import pyomo.environ as pyo
+from pyomo.core.expr import identify_variables
 import numpy as np
 import pandas as pd
 
@@ -13,6 +14,7 @@ from ..utilities import (
 )
 from .utilities import set_capex_model
 from .ccs import fit_ccs_coeff
+from ...utilities import get_config_option, is_lower_bound_implied
 
 import logging
 
@@ -109,6 +111,11 @@ class Technology(ModelComponent):
     - var_tec_emissions_pos: positive emissions, defined per time slice
     - var_tec_emissions_neg: negative emissions, defined per time slice
 
+    For lean models, var_input_tot, var_output_tot, var_opex_variable,
+    var_opex_variable_tot, var_tec_emissions_pos and var_tec_emissions_neg are
+    declared as pyomo expressions instead of variables with defining constraints.
+    Non-negative quantities are constrained to be non-negative instead.
+
     If ccs is possible:
 
     - var_size_ccs: Size of CCS
@@ -277,12 +284,7 @@ class Technology(ModelComponent):
         time_independent = {}
 
         # Size
-        time_independent["size_min"] = input_parameters.size_min
-        if not self.existing:
-            time_independent["size_max"] = input_parameters.size_max
-        else:
-            time_independent["size_max"] = input_parameters.size_initial
-            time_independent["size_initial"] = input_parameters.size_initial
+        self._set_size_coefficients(time_independent)
 
         # Emissions
         time_independent["emission_factor"] = input_parameters.performance_data[
@@ -319,14 +321,91 @@ class Technology(ModelComponent):
 
         # CCS
         if self.component_options.ccs_possible:
-            co2_concentration = self.input_parameters.performance_data["ccs"][
-                "co2_concentration"
-            ]
-            self.ccs_data["name"] = "CCS"
-            self.ccs_data["tec_type"] = self.component_options.ccs_type
-            self.ccs_component = fit_ccs_coeff(
-                co2_concentration, self.ccs_data, climate_data
-            )
+            self._fit_ccs(climate_data)
+
+    def get_fitting_data_files(self) -> list:
+        """
+        Returns the data files (other than the json files) read when fitting the
+        technology performance. Overwritten in child classes
+
+        :return: paths of the data files
+        :rtype: list
+        """
+        return []
+
+    def _set_size_coefficients(self, time_independent: dict):
+        """
+        Writes the size limits of the technology to the time independent coefficients
+
+        :param dict time_independent: time independent coefficients
+        """
+        input_parameters = self.input_parameters
+        time_independent["size_min"] = input_parameters.size_min
+        if not self.existing:
+            time_independent["size_max"] = input_parameters.size_max
+            time_independent.pop("size_initial", None)
+        else:
+            time_independent["size_max"] = input_parameters.size_initial
+            time_independent["size_initial"] = input_parameters.size_initial
+
+    def _fit_ccs(self, climate_data: pd.DataFrame):
+        """
+        Fits the CCS component of the technology
+
+        :param pd.Dataframe climate_data: dataframe containing climate data
+        """
+        co2_concentration = self.input_parameters.performance_data["ccs"][
+            "co2_concentration"
+        ]
+        self.ccs_data["name"] = "CCS"
+        self.ccs_data["tec_type"] = self.component_options.ccs_type
+        self.ccs_component = fit_ccs_coeff(
+            co2_concentration, self.ccs_data, climate_data
+        )
+
+    def get_fitted_state(self) -> dict:
+        """
+        Returns all attributes that are set when fitting the technology performance
+
+        The CCS component is not contained, as it is refitted when restoring the
+        state.
+
+        :return: fitted state of the technology
+        :rtype: dict
+        """
+        return {
+            "time_independent": self.processed_coeff.time_independent,
+            "time_dependent_full": self.processed_coeff.time_dependent_full,
+            "dynamics": self.processed_coeff.dynamics,
+            "other": self.component_options.other,
+            "rated_power": self.input_parameters.rated_power,
+            "performance_data": self.input_parameters.performance_data,
+            "capex_model": self.economics.capex_model,
+        }
+
+    def restore_fitted_state(self, state: dict, climate_data: pd.DataFrame):
+        """
+        Restores a fitted state obtained with get_fitted_state
+
+        Replaces fit_technology_performance, e.g. if the fitted state is read from a
+        cache. The size limits are derived again, so that a state fitted for a new
+        technology can also be used for an existing technology and vice versa.
+
+        :param dict state: fitted state of the technology
+        :param pd.Dataframe climate_data: dataframe containing climate data
+        """
+        self.processed_coeff.time_independent = state["time_independent"]
+        self._set_size_coefficients(self.processed_coeff.time_independent)
+        self.processed_coeff.time_dependent_full = state["time_dependent_full"]
+        self.processed_coeff.dynamics = state["dynamics"]
+        self.component_options.other = state["other"]
+        self.input_parameters.rated_power = state["rated_power"]
+        self.input_parameters.performance_data = state["performance_data"]
+        self.economics.capex_model = state["capex_model"]
+
+        # CCS
+        if self.component_options.ccs_possible:
+            self._fit_ccs(climate_data)
 
     def _calculate_bounds(self):
         """
@@ -379,6 +458,11 @@ class Technology(ModelComponent):
         # TECHNOLOGY DATA
         config = data["config"]
 
+        # LEAN MODEL
+        self.component_options.lean_model = bool(
+            get_config_option(config, ["optimization", "lean_model"], 0)
+        )
+
         # SET T
         self.set_t_full = set_t_full
 
@@ -896,9 +980,8 @@ class Technology(ModelComponent):
         b_tec.para_opex_variable = pyo.Param(
             domain=pyo.Reals, initialize=economics.opex_variable, mutable=True
         )
-        b_tec.var_opex_variable = pyo.Var(self.set_t_global)
 
-        def init_opex_variable(const, t):
+        def init_opex_variable(expr, t):
             """opexvar_{t} = Input_{t, maincarrier} * opex_{var}"""
             if (
                 (self.component_options.technology_model == "RES")
@@ -915,13 +998,14 @@ class Technology(ModelComponent):
                     opex_variable_based_on = b_tec.var_input[
                         t, self.component_options.main_input_carrier
                     ]
-            return (
-                opex_variable_based_on * b_tec.para_opex_variable
-                == b_tec.var_opex_variable[t]
-            )
-
-        b_tec.const_opex_variable = pyo.Constraint(
-            self.set_t_global, rule=init_opex_variable
+            return opex_variable_based_on * b_tec.para_opex_variable
+
+        self._define_dependent_quantity(
+            b_tec,
+            "var_opex_variable",
+            "const_opex_variable",
+            [self.set_t_global],
+            init_opex_variable,
         )
 
         # FIXED OPEX
@@ -948,128 +1032,49 @@ class Technology(ModelComponent):
         b_tec.para_tec_emissionfactor = pyo.Param(
             domain=pyo.Reals, initialize=c["emission_factor"]
         )
-        b_tec.var_tec_emissions_pos = pyo.Var(
-            self.set_t_global, within=pyo.NonNegativeReals
-        )
-        b_tec.var_tec_emissions_neg = pyo.Var(
-            self.set_t_global, within=pyo.NonNegativeReals
-        )
-
-        if technology_model == "RES":
-            # Set emissions to zero
-            def init_tec_emissions_pos(const, t):
-                return b_tec.var_tec_emissions_pos[t] == 0
-
-            b_tec.const_tec_emissions_pos = pyo.Constraint(
-                self.set_t_global, rule=init_tec_emissions_pos
-            )
-
-            def init_tec_emissions_neg(const, t):
-                return b_tec.var_tec_emissions_neg[t] == 0
-
-            b_tec.const_tec_emissions_neg = pyo.Constraint(
-                self.set_t_global, rule=init_tec_emissions_neg
-            )
-
-        else:
 
+        def emissions_based_on_flow(t):
+            """Input or output the emissions are based on"""
             if emissions_based_on == "output":
-
-                def init_tec_emissions_pos(const, t):
-                    """emissions_pos = output * emissionfactor"""
-                    if c["emission_factor"] >= 0:
-                        return (
-                            b_tec.var_output[
-                                t, self.component_options.main_output_carrier
-                            ]
-                            * b_tec.para_tec_emissionfactor
-                            == b_tec.var_tec_emissions_pos[t]
-                        )
-                    else:
-                        return b_tec.var_tec_emissions_pos[t] == 0
-
-                b_tec.const_tec_emissions_pos = pyo.Constraint(
-                    self.set_t_global, rule=init_tec_emissions_pos
-                )
-
-                def init_tec_emissions_neg(const, t):
-                    if c["emission_factor"] < 0:
-                        return (
-                            b_tec.var_output[
-                                t, self.component_options.main_output_carrier
-                            ]
-                            * (-b_tec.para_tec_emissionfactor)
-                            == b_tec.var_tec_emissions_neg[t]
-                        )
-                    else:
-                        return b_tec.var_tec_emissions_neg[t] == 0
-
-                b_tec.const_tec_emissions_neg = pyo.Constraint(
-                    self.set_t_global, rule=init_tec_emissions_neg
+                return b_tec.var_output[t, self.component_options.main_output_carrier]
+            elif self.component_options.main_input_carrier == "sum":
+                return sum(
+                    b_tec.var_input[t, input_car]
+                    for input_car in b_tec.set_input_carriers
                 )
+            else:
+                return b_tec.var_input[t, self.component_options.main_input_carrier]
 
-            elif emissions_based_on == "input":
-                if self.component_options.main_input_carrier == 'sum':
-                    def init_tec_emissions_pos(const, t):
-                        if c["emission_factor"] >= 0:
-                            return (
-                                    sum(b_tec.var_input[t, input_car] for input_car in b_tec.set_input_carriers)
-                                    * b_tec.para_tec_emissionfactor
-                                    == b_tec.var_tec_emissions_pos[t]
-                            )
-                        else:
-                            return b_tec.var_tec_emissions_pos[t] == 0
-
-                    b_tec.const_tec_emissions_pos = pyo.Constraint(
-                        self.set_t_global, rule=init_tec_emissions_pos
-                    )
-
-                    def init_tec_emissions_neg(const, t):
-                        if c["emission_factor"] < 0:
-                            return (
-                                    sum(b_tec.var_input[t, input_car] for input_car in b_tec.set_input_carriers)
-                                    * (-b_tec.para_tec_emissionfactor)
-                                    == b_tec.var_tec_emissions_neg[t]
-                            )
-                        else:
-                            return b_tec.var_tec_emissions_neg[t] == 0
-
-                    b_tec.const_tec_emissions_neg = pyo.Constraint(
-                        self.set_t_global, rule=init_tec_emissions_neg
-                    )
-
-                else:
-
-                    def init_tec_emissions_pos(const, t):
-                        if c["emission_factor"] >= 0:
-                            return (
-                                b_tec.var_input[
-                                    t, self.component_options.main_input_carrier
-                                ]
-                                * b_tec.para_tec_emissionfactor
-                                == b_tec.var_tec_emissions_pos[t]
-                            )
-                        else:
-                            return b_tec.var_tec_emissions_pos[t] == 0
-
-                    b_tec.const_tec_emissions_pos = pyo.Constraint(
-                        self.set_t_global, rule=init_tec_emissions_pos
-                    )
-
-                    def init_tec_emissions_neg(const, t):
-                        if c["emission_factor"] < 0:
-                            return (
-                                b_tec.var_input[
-                                    t, self.component_options.main_input_carrier
-                                ](-b_tec.para_tec_emissionfactor)
-                                == b_tec.var_tec_emissions_neg[t]
-                            )
-                        else:
-                            return b_tec.var_tec_emissions_neg[t] == 0
+        def init_tec_emissions_pos(expr, t):
+            """emissions_pos = output (input) * emissionfactor"""
+            if technology_model != "RES" and c["emission_factor"] >= 0:
+                return emissions_based_on_flow(t) * b_tec.para_tec_emissionfactor
+            else:
+                return 0
 
-                    b_tec.const_tec_emissions_neg = pyo.Constraint(
-                        self.set_t_global, rule=init_tec_emissions_neg
-                    )
+        def init_tec_emissions_neg(expr, t):
+            """emissions_neg = output (input) * (-emissionfactor)"""
+            if technology_model != "RES" and c["emission_factor"] < 0:
+                return emissions_based_on_flow(t) * (-b_tec.para_tec_emissionfactor)
+            else:
+                return 0
+
+        self._define_dependent_quantity(
+            b_tec,
+            "var_tec_emissions_pos",
+            "const_tec_emissions_pos",
+            [self.set_t_global],
+            init_tec_emissions_pos,
+            within=pyo.NonNegativeReals,
+        )
+        self._define_dependent_quantity(
+            b_tec,
+            "var_tec_emissions_neg",
+            "const_tec_emissions_neg",
+            [self.set_t_global],
+            init_tec_emissions_neg,
+            within=pyo.NonNegativeReals,
+        )
 
         return b_tec
 
@@ -1131,6 +1136,59 @@ class Technology(ModelComponent):
 
         return b_tec
 
+    def _define_dependent_quantity(
+        self, b_tec, name: str, const_name: str, index: list, rule, within=pyo.Reals
+    ):
+        """
+        Defines a quantity that is fully determined by other variables
+
+        In lean models, the quantity is defined as a pyomo expression. If the domain
+        is bounded (e.g. NonNegativeReals), the bounds are added as constraints on
+        the expression, unless they are already implied by the bounds of its
+        variables (e.g. a sum of non-negative variables). Otherwise, a variable and
+        an equality constraint defining it are added. In both cases, the quantity
+        can be indexed in the same way.
+
+        :param b_tec: pyomo block with technology model
+        :param str name: name of the quantity
+        :param str const_name: name of the defining constraint (or of the bounds in
+            lean models)
+        :param list index: sets the quantity is indexed by
+        :param rule: pyomo rule returning the expression of the quantity
+        :param within: domain of the variable
+        """
+        if self.component_options.lean_model:
+            expr = pyo.Expression(*index, rule=rule)
+            b_tec.add_component(name, expr)
+
+            lower_bound, upper_bound = within.bounds()
+            if (lower_bound is not None) or (upper_bound is not None):
+
+                def init_domain(const, *idx):
+                    # Expressions without variables (e.g. no emissions) are skipped
+                    if next(identify_variables(expr[idx]), None) is None:
+                        return pyo.Constraint.Skip
+                    lower = lower_bound
+                    if is_lower_bound_implied(expr[idx], lower_bound):
+                        lower = None
+                    if lower is None and upper_bound is None:
+                        return pyo.Constraint.Skip
+                    return (lower, expr[idx], upper_bound)
+
+                b_tec.add_component(
+                    const_name, pyo.Constraint(*index, rule=init_domain)
+                )
+        else:
+            var = pyo.Var(*index, within=within)
+            b_tec.add_component(name, var)
+
+            def init_definition(const, *idx):
+                return rule(b_tec, *idx) == var[idx]
+
+            b_tec.add_component(
+                const_name, pyo.Constraint(*index, rule=init_definition)
+            )
+
     def _aggregate_input(self, b_tec):
         """
         Aggregates CCS and technology input
@@ -1139,13 +1197,7 @@ class Technology(ModelComponent):
         :return: pyomo block with technology model
         """
 
-        b_tec.var_input_tot = pyo.Var(
-            self.set_t_global,
-            b_tec.set_input_carriers_all,
-            within=pyo.NonNegativeReals,
-        )
-
-        def init_aggregate_input(const, t, car):
+        def init_aggregate_input(expr, t, car):
             """input_ccs + input = input_tot"""
             input_tec = (
                 b_tec.var_input[t, car] if car in b_tec.set_input_carriers else 0
@@ -1158,10 +1210,15 @@ class Technology(ModelComponent):
                 )
             else:
                 input_ccs = 0
-            return input_tec + input_ccs == b_tec.var_input_tot[t, car]
-
-        b_tec.const_input_aggregation = pyo.Constraint(
-            self.set_t_global, b_tec.set_input_carriers_all, rule=init_aggregate_input
+            return input_tec + input_ccs
+
+        self._define_dependent_quantity(
+            b_tec,
+            "var_input_tot",
+            "const_input_aggregation",
+            [self.set_t_global, b_tec.set_input_carriers_all],
+            init_aggregate_input,
+            within=pyo.NonNegativeReals,
         )
 
         return b_tec
@@ -1173,13 +1230,8 @@ class Technology(ModelComponent):
         :param b_tec: pyomo block with technology model
         :return: pyomo block with technology model
         """
-        b_tec.var_output_tot = pyo.Var(
-            self.set_t_global,
-            b_tec.set_output_carriers_all,
-            within=pyo.NonNegativeReals,
-        )
 
-        def init_aggregate_output(const, t, car):
+        def init_aggregate_output(expr, t, car):
             """output + output_ccs = output_tot"""
             output_tec = (
                 b_tec.var_output[t, car] if car in b_tec.set_output_carriers else 0
@@ -1192,10 +1244,15 @@ class Technology(ModelComponent):
                 )
             else:
                 output_ccs = 0
-            return output_tec + output_ccs == b_tec.var_output_tot[t, car]
-
-        b_tec.const_output_aggregation = pyo.Constraint(
-            self.set_t_global, b_tec.set_output_carriers_all, rule=init_aggregate_output
+            return output_tec + output_ccs
+
+        self._define_dependent_quantity(
+            b_tec,
+            "var_output_tot",
+            "const_output_aggregation",
+            [self.set_t_global, b_tec.set_output_carriers_all],
+            init_aggregate_output,
+            within=pyo.NonNegativeReals,
         )
 
         return b_tec
@@ -1209,7 +1266,6 @@ class Technology(ModelComponent):
         """
         b_tec.var_capex_tot = pyo.Var()
         b_tec.var_opex_fixed_tot = pyo.Var()
-        b_tec.var_opex_variable_tot = pyo.Var(self.set_t_global)
 
         def init_aggregate_capex(const):
             """capex + capex_ccs = capex_tot"""
@@ -1222,17 +1278,21 @@ class Technology(ModelComponent):
 
         b_tec.const_capex_aggregation = pyo.Constraint(rule=init_aggregate_capex)
 
-        def init_aggregate_opex_var(const, t):
+        def init_aggregate_opex_var(expr, t):
             """var_opex_variable + var_opex_variable_ccs = var_opex_variable_tot"""
             opex_var_tec = b_tec.var_opex_variable[t]
             if self.component_options.ccs_possible:
                 opex_var_ccs = b_tec.var_opex_variable_ccs[t]
             else:
                 opex_var_ccs = 0
-            return b_tec.var_opex_variable_tot[t] == opex_var_tec + opex_var_ccs
-
-        b_tec.const_opex_var_aggregation = pyo.Constraint(
-            self.set_t_global, rule=init_aggregate_opex_var
+            return opex_var_tec + opex_var_ccs
+
+        self._define_dependent_quantity(
+            b_tec,
+            "var_opex_variable_tot",
+            "const_opex_var_aggregation",
+            [self.set_t_global],
+            init_aggregate_opex_var,
         )
 
         def init_aggregate_opex_fixed(const):
@@ -1264,7 +1324,10 @@ class Technology(ModelComponent):
         h5_group.create_dataset(
             "opex_variable",
             data=[
-                sum(model_block.var_opex_variable[t].value for t in self.set_t_global)
+                sum(
+                    pyo.value(model_block.var_opex_variable[t], exception=False)
+                    for t in self.set_t_global
+                )
             ],
         )
         h5_group.create_dataset(
@@ -1274,7 +1337,7 @@ class Technology(ModelComponent):
             "emissions_pos",
             data=[
                 sum(
-                    model_block.var_tec_emissions_pos[t].value
+                    pyo.value(model_block.var_tec_emissions_pos[t], exception=False)
                     for t in self.set_t_global
                 )
             ],
@@ -1283,7 +1346,7 @@ class Technology(ModelComponent):
             "emissions_neg",
             data=[
                 sum(
-                    model_block.var_tec_emissions_neg[t].value
+                    pyo.value(model_block.var_tec_emissions_neg[t], exception=False)
                     for t in self.set_t_global
                 )
             ],
@@ -1317,7 +1380,7 @@ class Technology(ModelComponent):
                 h5_group.create_dataset(
                     f"{car}_input",
                     data=[
-                        model_block.var_input_tot[t, car].value
+                        pyo.value(model_block.var_input_tot[t, car], exception=False)
                         for t in self.set_t_global
                     ],
                 )
@@ -1325,19 +1388,22 @@ class Technology(ModelComponent):
             h5_group.create_dataset(
                 f"{car}_output",
                 data=[
-                    model_block.var_output_tot[t, car].value for t in self.set_t_global
+                    pyo.value(model_block.var_output_tot[t, car], exception=False)
+                    for t in self.set_t_global
                 ],
             )
         h5_group.create_dataset(
             "emissions_pos",
             data=[
-                model_block.var_tec_emissions_pos[t].value for t in self.set_t_global
+                pyo.value(model_block.var_tec_emissions_pos[t], exception=False)
+                for t in self.set_t_global
             ],
         )
         h5_group.create_dataset(
             "emissions_neg",
             data=[
-                model_block.var_tec_emissions_neg[t].value for t in self.set_t_global
+                pyo.value(model_block.var_tec_emissions_neg[t], exception=False)
+                for t in self.set_t_global
             ],
         )
         if model_block.find_component("var_x"):
@@ -1427,12 +1493,6 @@ class Technology(ModelComponent):
             domain=pyo.Reals,
             initialize=self.processed_coeff.time_independent["emission_factor"],
         )
-        b_tec.var_tec_emissions_pos = pyo.Var(
-            self.set_t_global, within=pyo.NonNegativeReals
-        )
-        b_tec.var_tec_emissions_neg = pyo.Var(
-            self.set_t_global, within=pyo.NonNegativeReals
-        )
 
         def init_input_bounds(bounds, t, car):
             return tuple(
@@ -1506,47 +1566,40 @@ class Technology(ModelComponent):
         emissions_based_on = self.component_options.emissions_based_on
 
         # Emissions
-        if emissions_based_on == "output":
-
-            def init_tec_emissions_pos(const, t):
-                return (
-                    b_tec.var_output[t, self.component_options.main_output_carrier]
-                    * b_tec.para_tec_emissionfactor
-                    - b_tec.var_output_ccs[t, "CO2captured"]
-                    == b_tec.var_tec_emissions_pos[t]
-                )
-
-            b_tec.const_tec_emissions_pos = pyo.Constraint(
-                self.set_t_global, rule=init_tec_emissions_pos
-            )
-
-            def init_tec_emissions_neg(const, t):
-                return b_tec.var_tec_emissions_neg[t] == 0
-
-            b_tec.const_tec_emissions_neg = pyo.Constraint(
-                self.set_t_global, rule=init_tec_emissions_neg
-            )
-
-        elif emissions_based_on == "input":
-
-            def init_tec_emissions_pos(const, t):
-                return (
-                    b_tec.var_input[t, self.component_options.main_input_carrier]
-                    * b_tec.para_tec_emissionfactor
-                    - b_tec.var_output_ccs[t, "CO2captured"]
-                    == b_tec.var_tec_emissions_pos[t]
-                )
-
-            b_tec.const_tec_emissions_pos = pyo.Constraint(
-                self.set_t_global, rule=init_tec_emissions_pos
+        def init_tec_emissions_pos(expr, t):
+            """emissions_pos = output (input) * emissionfactor - output_ccs"""
+            if emissions_based_on == "output":
+                emissions_based_on_flow = b_tec.var_output[
+                    t, self.component_options.main_output_carrier
+                ]
+            else:
+                emissions_based_on_flow = b_tec.var_input[
+                    t, self.component_options.main_input_carrier
+                ]
+            return (
+                emissions_based_on_flow * b_tec.para_tec_emissionfactor
+                - b_tec.var_output_ccs[t, "CO2captured"]
             )
 
-            def init_tec_emissions_neg(const, t):
-                return b_tec.var_tec_emissions_neg[t] == 0
+        def init_tec_emissions_neg(expr, t):
+            return 0
 
-            b_tec.const_tec_emissions_neg = pyo.Constraint(
-                self.set_t_global, rule=init_tec_emissions_neg
-            )
+        self._define_dependent_quantity(
+            b_tec,
+            "var_tec_emissions_pos",
+            "const_tec_emissions_pos",
+            [self.set_t_global],
+            init_tec_emissions_pos,
+            within=pyo.NonNegativeReals,
+        )
+        self._define_dependent_quantity(
+            b_tec,
+            "var_tec_emissions_neg",
+            "const_tec_emissions_neg",
+            [self.set_t_global],
+            init_tec_emissions_neg,
+            within=pyo.NonNegativeReals,
+        )
 
         # Initialize the size of CCS as in _define_size (size given in mass flow of CO2 entering the CCS object)
         b_tec.para_size_min_ccs = pyo.Param(
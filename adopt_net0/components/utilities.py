@@ -1,4 +1,7 @@
 import time
+import json
+import hashlib
+import pandas as pd
 import pyomo.environ as pyo
 
 import logging
@@ -195,3 +198,20 @@ def get_attribute_from_dict(d: dict, key: str, value_other) -> str | float:
         return d[key]
     else:
         return value_other
+
+
+def get_climate_data_fingerprint(climate_data: pd.DataFrame) -> str:
+    """
+    Calculates a fingerprint of the climate data of a node
+
+    :param pd.DataFrame climate_data: climate data of the node
+    :return: fingerprint as hex string
+    :rtype: str
+    """
+    fingerprint = hashlib.sha256()
+    fingerprint.update(json.dumps([str(col) for col in climate_data.columns]).encode())
+    fingerprint.update(
+        pd.util.hash_pandas_object(climate_data, index=True).to_numpy().tobytes()
+    )
+
+    return fingerprint.hexdigest()
@@ -1,10 +1,14 @@
 import numpy as np
 import pandas as pd
 from pathlib import Path
-import tsam.timeseriesaggregation as tsam
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 
 from .utilities import *
+from ..utilities import get_config_option
 from ..components.networks import *
+from ..components.technologies.genericTechnologies.res import (
+    calculate_wind_turbine_capacity_factors,
+)
 import logging
 
 log = logging.getLogger(__name__)
@@ -29,6 +33,9 @@ class DataHandle:
     :param pd.DataFrame node_locations: Container for node locations
     :param dict model_config: Container for the model configuration
     :param dict k_means_specs: Container for k-means clustering algorithm specifications
+        (per investment period: sequence, an int32 array with the clustered time step
+        of each full resolution time step and factors, a float array with the
+        number of occurrences of each clustered time step)
     :param dict averaged_specs: Container for averaging algorithm specifications
     :param int, None start_period: starting period to use, if None, the first available period is used
     :param int, None end_period: end period to use, if None, the last available period is used
@@ -43,6 +50,7 @@ class DataHandle:
         self.time_series = {}
         self.energybalance_options = {}
         self.technology_data = {}
+        self.fitting_cache_statistics = {"hits": 0, "misses": 0}
         self.network_data = {}
         self.node_locations = pd.DataFrame()
         self.model_config = {}
@@ -167,96 +175,107 @@ class DataHandle:
     def _read_time_series(self):
         """
         Reads all time-series data and shortens time series accordingly
-        """
-
-        def replace_nan_in_list(ls: list) -> list:
-            """
-            Replaces nan with zeros and writes warning to logger
-
-            :param list ls: List
-            :return list: returns list with nan replaces by zero
-            :rtype: list
-            """
-            if any(np.isnan(x) for x in ls):
-                ls = [0 if np.isnan(x) else x for x in ls]
-                log.debug(
-                    f"Found NaN values in data for investment period {investment_period},"
-                    f" node {node}, key1 {var}, carrier {carrier}, key2 {key}."
-                    f" Replaced with zeros."
-                )
-                return ls
-            else:
-                return ls
 
-        # Initialize data dict
-        data = {}
+        The csv files of all investment periods and nodes are read either serially
+        or with a pool of threads, depending on the setting read_workers in the
+        model configuration. If time_series_cache is turned on, the time series are
+        stored in TimeSeriesCache.h5 next to Topology.json and are read from there
+        as long as no input file has changed.
+        """
 
-        # Loop through all investment_periods and nodes
+        # Collect all files to read
+        files_to_read = []
         for investment_period in self.topology["investment_periods"]:
             for node in self.topology["nodes"]:
+                node_path = self.data_path / investment_period / "node_data" / node
 
                 # Carbon Costs
-                var = "CarbonCost"
-                carrier = "global"
-                carbon_cost = pd.read_csv(
-                    self.data_path
-                    / investment_period
-                    / "node_data"
-                    / node
-                    / "CarbonCost.csv",
-                    sep=";",
-                    index_col=0,
-                ).to_dict(orient="list")
-                for key in carbon_cost.keys():
-                    data[(investment_period, node, var, carrier, key)] = (
-                        replace_nan_in_list(carbon_cost[key])
+                files_to_read.append(
+                    (
+                        (investment_period, node, "CarbonCost", "global"),
+                        node_path / "CarbonCost.csv",
                     )
+                )
 
                 # Climate Data
-                var = "ClimateData"
-                carrier = "global"
-                climate_data = pd.read_csv(
-                    self.data_path
-                    / investment_period
-                    / "node_data"
-                    / node
-                    / "ClimateData.csv",
-                    sep=";",
-                    index_col=0,
-                ).to_dict(orient="list")
-                for key in climate_data.keys():
-                    data[(investment_period, node, var, carrier, key)] = (
-                        replace_nan_in_list(climate_data[key])
+                files_to_read.append(
+                    (
+                        (investment_period, node, "ClimateData", "global"),
+                        node_path / "ClimateData.csv",
                     )
+                )
 
                 # Carrier Data
-                var = "CarrierData"
-                carrier = "global"
                 for carrier in self.topology["carriers"]:
-                    carrier_data = pd.read_csv(
-                        self.data_path
-                        / investment_period
-                        / "node_data"
-                        / node
-                        / "carrier_data"
-                        / (carrier + ".csv"),
-                        sep=";",
-                        index_col=0,
-                    ).to_dict(orient="list")
-                    for key in carrier_data.keys():
-                        data[(investment_period, node, var, carrier, key)] = (
-                            replace_nan_in_list(carrier_data[key])
+                    files_to_read.append(
+                        (
+                            (investment_period, node, "CarrierData", carrier),
+                            node_path / "carrier_data" / (carrier + ".csv"),
                         )
+                    )
+
+        file_paths = [file_path for _, file_path in files_to_read]
 
-        # Post-process data dict to dataframe and shorten
-        data = pd.DataFrame(data)
-        data = data.iloc[self.start_period : self.end_period]
-        data.index = self.topology["time_index"]["full"]
-        data.columns.set_names(
-            ["InvestmentPeriod", "Node", "Key1", "Carrier", "Key2"], inplace=True
+        # Load time series from cache if input files did not change
+        use_cache = get_config_option(
+            self.model_config, ["datahandling", "time_series_cache"], 0
+        )
+        if use_cache:
+            cache_path = self.data_path / "TimeSeriesCache.h5"
+            fingerprint = get_input_files_fingerprint(
+                [self.data_path / "Topology.json"] + file_paths,
+                {"start_period": self.start_period, "end_period": self.end_period},
+            )
+            data = load_time_series_cache(cache_path, fingerprint)
+            if data is not None:
+                data.index = self.topology["time_index"]["full"]
+                self.time_series["full"] = data
+
+                log_msg = f"Time series read successfully from cache {cache_path}"
+                log.info(log_msg)
+                return
+
+        # Read all files
+        nr_workers = get_config_option(
+            self.model_config, ["datahandling", "read_workers"], 1
+        )
+        if nr_workers > 1:
+            with ThreadPoolExecutor(max_workers=nr_workers) as executor:
+                file_contents = list(executor.map(read_time_series_csv, file_paths))
+        else:
+            file_contents = [read_time_series_csv(path) for path in file_paths]
+
+        # Shorten and replace nan with zeros
+        columns = []
+        blocks = []
+        for (file_key, _), (keys, block) in zip(files_to_read, file_contents):
+            block = block[self.start_period : self.end_period]
+            is_nan = np.isnan(block)
+            if is_nan.any():
+                for col in np.flatnonzero(is_nan.any(axis=0)):
+                    log.debug(
+                        f"Found NaN values in data for investment period"
+                        f" {file_key[0]}, node {file_key[1]}, key1 {file_key[2]},"
+                        f" carrier {file_key[3]}, key2 {keys[col]}."
+                        f" Replaced with zeros."
+                    )
+                block[is_nan] = 0
+            columns.extend(file_key + (key,) for key in keys)
+            blocks.append(block)
+
+        # Write all blocks to a single dataframe
+        data = pd.DataFrame(
+            np.hstack(blocks),
+            index=self.topology["time_index"]["full"],
+            columns=pd.MultiIndex.from_tuples(
+                columns, names=["InvestmentPeriod", "Node", "Key1", "Carrier", "Key2"]
+            ),
         )
         self.time_series["full"] = data
 
+        if use_cache:
+            save_time_series_cache(cache_path, fingerprint, data)
+
         # Log success
         log_msg = "Time series read successfully"
         log.info(log_msg)
@@ -301,7 +320,16 @@ class DataHandle:
         """
         Reads all technology data and fits it
 
-        :param str aggregation_model: specifies the aggregation type and thus the dict key to write the data to
+        Technologies with the same data, climate data and location (e.g. the same
+        technology in several investment periods) are fitted only once. The other
+        technologies get a copy of the fitted coefficients, which share read-only
+        copies of the arrays.
+
+        The fitting is either done serially or with a pool of processes, depending
+        on the setting fitting_workers in the model configuration. In both cases,
+        the technologies are fitted in the same order. When fitting serially, the
+        power curves of all wind turbines of a node are evaluated in one batch
+        before the fitting.
         """
         # Technology data always fitted based on full resolution
         aggregation_model = "full"
@@ -309,7 +337,8 @@ class DataHandle:
         # Initialize technology_data dict
         technology_data = {}
 
-        # Loop through all investment_periods and nodes
+        # Read technology data of all investment_periods and nodes
+        fitting_jobs = []
         for investment_period in self.topology["investment_periods"]:
             technology_data[investment_period] = {}
             for node in self.topology["nodes"]:
@@ -325,47 +354,140 @@ class DataHandle:
                 ) as json_file:
                     technologies_at_node = json.load(json_file)
 
+                tec_path = (
+                    self.data_path
+                    / investment_period
+                    / "node_data"
+                    / node
+                    / "technology_data"
+                )
+
                 # New technologies
                 for technology in technologies_at_node["new"]:
-                    tec_data = read_tec_data(
-                        technology,
-                        self.data_path
-                        / investment_period
-                        / "node_data"
-                        / node
-                        / "technology_data",
-                    )
-                    tec_data.fit_technology_performance(
-                        self.time_series[aggregation_model][investment_period][node][
-                            "ClimateData"
-                        ]["global"],
-                        self.node_locations.loc[node, :],
+                    tec_data = read_tec_data(technology, tec_path)
+                    fitting_jobs.append(
+                        (investment_period, node, technology, tec_path, tec_data)
                     )
-                    technology_data[investment_period][node][technology] = tec_data
 
                 # Existing technologies
                 for technology in technologies_at_node["existing"]:
-                    tec_data = read_tec_data(
-                        technology,
-                        self.data_path
-                        / investment_period
-                        / "node_data"
-                        / node
-                        / "technology_data",
-                    )
+                    tec_data = read_tec_data(technology, tec_path)
                     tec_data.existing = 1
                     tec_data.input_parameters.size_initial = technologies_at_node[
                         "existing"
                     ][technology]
-                    tec_data.fit_technology_performance(
-                        self.time_series[aggregation_model][investment_period][node][
-                            "ClimateData"
-                        ]["global"],
-                        self.node_locations.loc[node, :],
+                    fitting_jobs.append(
+                        (investment_period, node, technology, tec_path, tec_data)
+                    )
+
+        tecs = [job[4] for job in fitting_jobs]
+        climate_data = [
+            self.time_series[aggregation_model][job[0]][job[1]]["ClimateData"]["global"]
+            for job in fitting_jobs
+        ]
+        locations = [self.node_locations.loc[job[1], :] for job in fitting_jobs]
+
+        # Group identical fits
+        climate_data_fingerprints = {}
+        fitting_groups = {}
+        for job_id, job in enumerate(fitting_jobs):
+            if (job[0], job[1]) not in climate_data_fingerprints:
+                climate_data_fingerprints[(job[0], job[1])] = (
+                    get_climate_data_fingerprint(climate_data[job_id])
+                )
+            fingerprint = get_technology_fingerprint(
+                job[2],
+                job[3],
+                tecs[job_id],
+                climate_data_fingerprints[(job[0], job[1])],
+                locations[job_id],
+            )
+            fitting_groups.setdefault(fingerprint, []).append(job_id)
+
+        # Read fitted technologies from cache
+        self.fitting_cache_statistics = {"hits": 0, "misses": 0}
+        cache_path = get_config_option(
+            self.model_config, ["datahandling", "fitting_cache_path"], ""
+        )
+        groups_to_fit = list(fitting_groups)
+        if cache_path:
+            cache_path = self.data_path / cache_path
+            cache_path.mkdir(parents=True, exist_ok=True)
+            groups_to_fit = []
+            for fingerprint, group in fitting_groups.items():
+                job_id = group[0]
+                state = load_fitted_technology(cache_path / (fingerprint + ".npz"))
+                if state is None:
+                    groups_to_fit.append(fingerprint)
+                    self.fitting_cache_statistics["misses"] += 1
+                else:
+                    tecs[job_id].restore_fitted_state(state, climate_data[job_id])
+                    self.fitting_cache_statistics["hits"] += 1
+
+            log_msg = (
+                f"Technology fitting cache: {self.fitting_cache_statistics['hits']} "
+                f"hits, {self.fitting_cache_statistics['misses']} misses"
+            )
+            log.info(log_msg)
+
+        # Fit technologies (only first technology of each group)
+        jobs_to_fit = [fitting_groups[fingerprint][0] for fingerprint in groups_to_fit]
+        tecs_to_fit = [tecs[job_id] for job_id in jobs_to_fit]
+        climate_data_to_fit = [climate_data[job_id] for job_id in jobs_to_fit]
+        locations_to_fit = [locations[job_id] for job_id in jobs_to_fit]
+
+        nr_workers = get_config_option(
+            self.model_config, ["datahandling", "fitting_workers"], 1
+        )
+        if nr_workers > 1 and len(jobs_to_fit) > 1:
+            with ProcessPoolExecutor(max_workers=nr_workers) as executor:
+                fitted_tecs = list(
+                    executor.map(
+                        fit_technology,
+                        tecs_to_fit,
+                        climate_data_to_fit,
+                        locations_to_fit,
                     )
-                    technology_data[investment_period][node][
-                        technology + "_existing"
-                    ] = tec_data
+                )
+        else:
+            # Power curves of all wind turbines are evaluated in one batch per node
+            calculate_wind_turbine_capacity_factors(tecs_to_fit, climate_data_to_fit)
+            fitted_tecs = list(
+                map(fit_technology, tecs_to_fit, climate_data_to_fit, locations_to_fit)
+            )
+
+        for fingerprint, job_id, tec_data in zip(
+            groups_to_fit, jobs_to_fit, fitted_tecs
+        ):
+            tecs[job_id] = tec_data
+            if cache_path:
+                save_fitted_technology(
+                    cache_path / (fingerprint + ".npz"), tec_data.get_fitted_state()
+                )
+
+        # Pass fitted state to all other technologies of a group, these share a
+        # read-only copy of the arrays of the first technology
+        for group in fitting_groups.values():
+            if len(group) == 1:
+                continue
+            fitted_state = share_fitted_state(tecs[group[0]].get_fitted_state())
+            for job_id in group[1:]:
+                tecs[job_id].restore_fitted_state(
+                    share_fitted_state(fitted_state), climate_data[job_id]
+                )
+
+        log_msg = (
+            f"{len(fitting_groups)} different technology fits for "
+            f"{len(fitting_jobs)} technologies"
+        )
+        log.info(log_msg)
+
+        for (investment_period, node, technology, _, _), tec_data in zip(
+            fitting_jobs, tecs
+        ):
+            if tec_data.existing:
+                technology = technology + "_existing"
+            technology_data[investment_period][node][technology] = tec_data
 
         self.technology_data = technology_data
 
@@ -575,54 +697,137 @@ class DataHandle:
         Cluster full resolution input data
 
         Uses the package tsam to cluster all time-dependent input data (time series
-        and time dependent technology performance).
+        and time dependent technology performance). If segments is set in the
+        typicaldays options, the hours of each typical day are merged into segments of
+        variable duration. The sequence then maps each hour to its segment and the
+        factors contain the segment durations. The investment periods are
+        clustered serially or with a pool of processes, depending on the setting
+        aggregation_workers in the model configuration. If clustering_cache_path is
+        set in the model configuration, the clustering results of each investment period
+        are stored there and reused as long as the full resolution data and the
+        clustering settings do not change.
         """
         nr_clusters = self.model_config["optimization"]["typicaldays"]["N"]["value"]
         hours_per_day = self.topology["hours_per_day"]["full"]
+        nr_segments = get_config_option(
+            self.model_config, ["optimization", "typicaldays", "segments"], 0
+        )
+        if not 0 < nr_segments < hours_per_day:
+            nr_segments = 0
 
-        self.topology["time_index"]["clustered"] = range(0, nr_clusters * hours_per_day)
+        cache_path = get_config_option(
+            self.model_config, ["datahandling", "clustering_cache_path"], ""
+        )
+        if cache_path:
+            cache_path = self.data_path / cache_path
+            cache_path.mkdir(parents=True, exist_ok=True)
+
+        investment_periods = self.topology["investment_periods"]
+        settings = {
+            "nr_clusters": nr_clusters,
+            "hours_per_day": hours_per_day,
+            "nr_segments": nr_segments,
+            "cluster_method": "k_means",
+        }
+
+        # Collect data and read clustering from cache
+        full_res_data_matrices = {}
+        fingerprints = {}
+        clusterings = {}
+        for investment_period in investment_periods:
+            full_res_data_matrix = self._collect_full_res_data(investment_period)
+            full_res_data_matrices[investment_period] = full_res_data_matrix
+            if cache_path:
+                fingerprints[investment_period] = get_clustering_fingerprint(
+                    full_res_data_matrix, settings
+                )
+                clustering = load_clustering_cache(
+                    cache_path / (fingerprints[investment_period] + ".h5")
+                )
+                if clustering is not None:
+                    clusterings[investment_period] = clustering
+                    log_msg = (
+                        f"Clustering of investment period {investment_period} read "
+                        f"from cache"
+                    )
+                    log.info(log_msg)
 
-        clustered_resolution = {}
-        for investment_period in self.topology["investment_periods"]:
-            self.k_means_specs[investment_period] = {}
-            self.k_means_specs[investment_period]["sequence"] = []
-            self.k_means_specs[investment_period]["factors"] = []
+        # Cluster to typical days (investment periods are independent)
+        periods_to_cluster = [
+            investment_period
+            for investment_period in investment_periods
+            if investment_period not in clusterings
+        ]
+        matrices_to_cluster = [
+            full_res_data_matrices[investment_period]
+            for investment_period in periods_to_cluster
+        ]
+        nr_workers = get_config_option(
+            self.model_config, ["datahandling", "aggregation_workers"], 1
+        )
+        if nr_workers > 1 and len(periods_to_cluster) > 1:
+            with ProcessPoolExecutor(max_workers=nr_workers) as executor:
+                new_clusterings = list(
+                    executor.map(
+                        cluster_time_series,
+                        matrices_to_cluster,
+                        [nr_clusters] * len(periods_to_cluster),
+                        [hours_per_day] * len(periods_to_cluster),
+                        [nr_segments] * len(periods_to_cluster),
+                    )
+                )
+        else:
+            new_clusterings = [
+                cluster_time_series(matrix, nr_clusters, hours_per_day, nr_segments)
+                for matrix in matrices_to_cluster
+            ]
+
+        for investment_period, clustering in zip(periods_to_cluster, new_clusterings):
+            clusterings[investment_period] = clustering
+            if cache_path:
+                save_clustering_cache(
+                    cache_path / (fingerprints[investment_period] + ".h5"), clustering
+                )
 
-            full_res_data_matrix = self._collect_full_res_data(investment_period)
+        # Write clustered data
+        self._write_clustered_data(clusterings, nr_segments)
 
-            # Cluster to typical days
-            aggregation = tsam.TimeSeriesAggregation(
-                full_res_data_matrix,
-                noTypicalPeriods=nr_clusters,
-                hoursPerPeriod=hours_per_day,
-                noSegments=hours_per_day,
-                clusterMethod="k_means",
-            )
+        # Log success
+        log_msg = "Clustered data successfully"
+        log.info(log_msg)
 
-            typPeriods = aggregation.createTypicalPeriods()
-
-            # Determine help variables
-            cluster_order = aggregation._clusterOrder
-            cluster_no_occ = aggregation._clusterPeriodNoOccur
-            clustered_index = typPeriods.index
-            clustered_index = clustered_index.set_names(["Day", "Hour"])
-            clustered_index = clustered_index.to_frame().reset_index(drop=True)
-            clustered_index = clustered_index["Day"].reset_index()
-            clustered_index["index"] = clustered_index["index"] + 1
-
-            # Determine Sequence
-            for d in cluster_order:
-                self.k_means_specs[investment_period]["sequence"].extend(
-                    (clustered_index[clustered_index["Day"] == d]["index"].to_list())
-                )
+    def _write_clustered_data(self, clusterings: dict, nr_segments: int = 0):
+        """
+        Writes the clustering results of all investment periods to the data handle
+
+        Sets the clustered time index, the clustered time series, the clustered
+        technology performances and the sequence and factors of the k-means
+        specifications.
+
+        :param dict clusterings: clustering (see cluster_time_series) per investment
+            period
+        :param int nr_segments: number of segments per typical day (0 = no
+            segmentation)
+        """
+        investment_periods = self.topology["investment_periods"]
+        self.topology["time_index"]["clustered"] = range(
+            0, len(clusterings[investment_periods[0]]["typical_periods"])
+        )
+
+        clustered_resolution = {}
+        for investment_period in investment_periods:
+            clustering = clusterings[investment_period]
 
-            # Determine Factors (how many times does a clustered hour occur)
-            self.k_means_specs[investment_period]["factors"] = (
-                clustered_index["Day"].map(cluster_no_occ).to_list()
+            sequence, factors = get_clustering_sequence_and_factors(
+                clustering, nr_segments
             )
+            self.k_means_specs[investment_period] = {
+                "sequence": sequence,
+                "factors": factors,
+            }
 
             # Write time series
-            typPeriods = typPeriods.reset_index()
+            typPeriods = clustering["typical_periods"].reset_index()
             clustered_resolution[investment_period] = typPeriods["time_series"]
 
             # Write technology performance
@@ -635,22 +840,18 @@ class DataHandle:
             clustered_resolution, names=["InvestmentPeriod"], axis=1
         )
 
-        # Log success
-        log_msg = "Clustered data successfully"
-        log.info(log_msg)
-
     def _average_data(self):
         """
         Averages full resolution input data
 
-        Uses the package tsam to average all time-dependent input data (time series
-        and time dependent technology performance).
+        Averages all time-dependent input data (time series and time dependent
+        technology performance) over blocks of consecutive time steps (see
+        average_time_series).
         """
         nr_timesteps_averaged = self.model_config["optimization"]["timestaging"][
             "value"
         ]
         nr_timesteps_full = len(self.topology["time_index"]["full"])
-        resolution_full = self.topology["resolution_in_h"]["full"]
         hours_per_day = self.topology["hours_per_day"]["full"]
 
         self.topology["time_index"]["averaged"] = range(
@@ -666,18 +867,11 @@ class DataHandle:
 
             full_res_data_matrix = self._collect_full_res_data(investment_period)
 
-            # Cluster to typical days
-            aggregation = tsam.TimeSeriesAggregation(
-                full_res_data_matrix,
-                noTypicalPeriods=int(nr_timesteps_full / nr_timesteps_averaged),
-                hoursPerPeriod=1,
-                noSegments=1,
-                resolution=resolution_full,
-                clusterMethod="averaging",
+            # Average data
+            typPeriods = average_time_series(
+                full_res_data_matrix, nr_timesteps_averaged
             )
 
-            typPeriods = aggregation.createTypicalPeriods()
-
             typPeriods.index = self.topology["time_index"]["averaged"]
             averaged_resolution[investment_period] = typPeriods["time_series"]
 
@@ -1,10 +1,18 @@
 from pathlib import Path
+import numpy as np
 import pandas as pd
 import pvlib
 import os
 import json
+import hashlib
+import tempfile
+from functools import lru_cache
+import tsam.timeseriesaggregation as tsam
+from importlib.metadata import version, PackageNotFoundError
 
 from ..components.technologies import *
+from ..utilities import json_catalogue
+from ..components.utilities import get_climate_data_fingerprint
 
 import logging
 
@@ -31,6 +39,287 @@ def calculate_dni(data: pd.DataFrame, lon: float, lat: float) -> pd.Series:
     return data["dni"]
 
 
+def read_time_series_csv(file_path: Path) -> (list, np.ndarray):
+    """
+    Reads a time series csv file (CarbonCost.csv, ClimateData.csv or carrier data)
+
+    :param Path file_path: path of the csv file
+    :return: tuple of column names and a float64 array with one column per time
+        series
+    :rtype: tuple
+    """
+    data = pd.read_csv(file_path, sep=";", index_col=0)
+    return list(data.columns), data.to_numpy(dtype=np.float64)
+
+
+def get_input_files_fingerprint(file_paths: list, settings: dict) -> str:
+    """
+    Calculates a fingerprint of input files and settings
+
+    The fingerprint is based on the path, modification time and size of each file
+    and on the settings passed. It changes as soon as one of the files is modified.
+
+    :param list file_paths: list of file paths
+    :param dict settings: further settings the fingerprint depends on (need to be
+        json serializable)
+    :return: fingerprint as hex string
+    :rtype: str
+    """
+    file_stats = []
+    for file_path in file_paths:
+        stat = os.stat(file_path)
+        file_stats.append([str(file_path), stat.st_mtime_ns, stat.st_size])
+
+    fingerprint = json.dumps({"files": file_stats, "settings": settings})
+
+    return hashlib.sha256(fingerprint.encode()).hexdigest()
+
+
+def load_time_series_cache(cache_path: Path, fingerprint: str) -> pd.DataFrame | None:
+    """
+    Loads the time series from an h5 cache file if the cache is valid
+
+    :param Path cache_path: path of the cache file
+    :param str fingerprint: fingerprint of the current input data
+    :return: cached time series or None, if there is no valid cache
+    """
+    if not os.path.isfile(cache_path):
+        return None
+
+    try:
+        cached_fingerprint = pd.read_hdf(cache_path, key="fingerprint").iloc[0]
+        if cached_fingerprint != fingerprint:
+            return None
+        return pd.read_hdf(cache_path, key="time_series")
+    except (KeyError, OSError, ValueError) as e:
+        log.warning(f"Could not read time series cache {cache_path}: {e}")
+        return None
+
+
+def save_time_series_cache(cache_path: Path, fingerprint: str, data: pd.DataFrame):
+    """
+    Saves the time series to an h5 cache file
+
+    :param Path cache_path: path of the cache file
+    :param str fingerprint: fingerprint of the input data
+    :param pd.DataFrame data: time series to save
+    """
+    try:
+        data.to_hdf(cache_path, key="time_series", mode="w")
+        pd.Series([fingerprint]).to_hdf(cache_path, key="fingerprint")
+    except OSError as e:
+        log.warning(f"Could not write time series cache {cache_path}: {e}")
+
+
+def cluster_time_series(
+    full_res_data_matrix: pd.DataFrame,
+    nr_clusters: int,
+    hours_per_day: int,
+    nr_segments: int = 0,
+) -> dict:
+    """
+    Clusters the full resolution data of an investment period to typical days
+
+    If nr_segments is smaller than hours_per_day, the hours of each typical day are
+    merged into nr_segments segments of variable duration (tsam segmentation). The
+    durations are contained in the index of the typical periods.
+
+    This is a module level function, so that it can be used in a process pool.
+
+    :param pd.DataFrame full_res_data_matrix: full resolution data matrix
+    :param int nr_clusters: number of typical days
+    :param int hours_per_day: number of hours per day
+    :param int nr_segments: number of segments per typical day (0 = no
+        segmentation)
+    :return: dict with typical periods, cluster order and number of occurrences of
+        each cluster
+    :rtype: dict
+    """
+    segmentation = 0 < nr_segments < hours_per_day
+    aggregation = tsam.TimeSeriesAggregation(
+        full_res_data_matrix,
+        noTypicalPeriods=nr_clusters,
+        hoursPerPeriod=hours_per_day,
+        noSegments=nr_segments if segmentation else hours_per_day,
+        segmentation=segmentation,
+        clusterMethod="k_means",
+    )
+    clustering = {
+        "typical_periods": aggregation.createTypicalPeriods(),
+        "cluster_order": aggregation._clusterOrder,
+        "cluster_no_occur": aggregation._clusterPeriodNoOccur,
+    }
+
+    return clustering
+
+
+def get_clustering_sequence_and_factors(
+    clustering: dict, nr_segments: int = 0
+) -> (np.ndarray, np.ndarray):
+    """
+    Determines sequence and factors of a clustering
+
+    The sequence contains the clustered time step (starting at 1) of each full
+    resolution time step, in order of the days. A segment is repeated for each hour
+    it covers. The factors contain the number of hours each clustered time step
+    represents.
+
+    :param dict clustering: clustering as returned by cluster_time_series
+    :param int nr_segments: number of segments per typical day (0 = no
+        segmentation)
+    :return: sequence (int32) and factors (float)
+    :rtype: (np.ndarray, np.ndarray)
+    """
+    typPeriods = clustering["typical_periods"]
+    cluster_order = np.asarray(clustering["cluster_order"])
+    cluster_no_occ = clustering["cluster_no_occur"]
+    day_of_timestep = typPeriods.index.get_level_values(0).to_numpy()
+    days = np.unique(day_of_timestep)
+    if nr_segments:
+        durations = typPeriods.index.get_level_values(2).to_numpy(dtype=int)
+    else:
+        durations = np.ones(len(day_of_timestep), dtype=int)
+
+    # Sequence
+    timesteps_of_day = np.argsort(day_of_timestep, kind="stable").reshape(len(days), -1)
+    timesteps = timesteps_of_day[np.searchsorted(days, cluster_order)].ravel()
+    sequence = np.repeat(timesteps + 1, durations[timesteps]).astype(np.int32)
+
+    # Factors
+    occurrences = np.array([cluster_no_occ[day] for day in days], dtype=float)
+    factors = occurrences[np.searchsorted(days, day_of_timestep)] * durations
+
+    return sequence, factors
+
+
+def average_time_series(
+    full_res_data_matrix: pd.DataFrame, nr_timesteps_averaged: int
+) -> pd.DataFrame:
+    """
+    Averages the full resolution data of an investment period
+
+    Calculates the mean of each block of nr_timesteps_averaged consecutive time
+    steps. If the number of time steps is not a multiple of nr_timesteps_averaged,
+    the remaining time steps are added to the last block (as done by the averaging
+    method of tsam), such that there are int(nr_timesteps / nr_timesteps_averaged)
+    averaged time steps.
+
+    :param pd.DataFrame full_res_data_matrix: full resolution data matrix
+    :param int nr_timesteps_averaged: number of time steps averaged into one
+    :return: averaged data with the same columns and an index starting at 0
+    :rtype: pd.DataFrame
+    """
+    data = full_res_data_matrix.to_numpy(dtype=float)
+    nr_timesteps = data.shape[0]
+    nr_blocks = int(nr_timesteps / nr_timesteps_averaged)
+    if nr_blocks == 0:
+        raise ValueError(
+            f"Cannot average {nr_timesteps} time steps to blocks of "
+            f"{nr_timesteps_averaged} time steps"
+        )
+
+    nr_timesteps_in_blocks = nr_blocks * nr_timesteps_averaged
+    averaged_data = (
+        data[:nr_timesteps_in_blocks]
+        .reshape(nr_blocks, nr_timesteps_averaged, data.shape[1])
+        .mean(axis=1)
+    )
+    if nr_timesteps_in_blocks < nr_timesteps:
+        log.warning(
+            f"Number of time steps ({nr_timesteps}) is not a multiple of the number "
+            f"of time steps averaged ({nr_timesteps_averaged}). The last "
+            f"{nr_timesteps - nr_timesteps_in_blocks} time steps are added to the "
+            f"last averaged time step."
+        )
+        averaged_data[-1] = data[(nr_blocks - 1) * nr_timesteps_averaged :].mean(axis=0)
+
+    return pd.DataFrame(averaged_data, columns=full_res_data_matrix.columns)
+
+
+def get_clustering_fingerprint(data: pd.DataFrame, settings: dict) -> str:
+    """
+    Calculates a fingerprint of a full resolution data matrix and the clustering
+    settings
+
+    :param pd.DataFrame data: full resolution data matrix of an investment period
+    :param dict settings: clustering settings (need to be json serializable)
+    :return: fingerprint as hex string
+    :rtype: str
+    """
+    try:
+        tsam_version = version("tsam")
+    except PackageNotFoundError:
+        tsam_version = "unknown"
+
+    fingerprint = hashlib.sha256()
+    fingerprint.update(
+        json.dumps(
+            {
+                "settings": settings,
+                "tsam_version": tsam_version,
+                "columns": [str(col) for col in data.columns],
+            },
+            sort_keys=True,
+        ).encode()
+    )
+    fingerprint.update(
+        pd.util.hash_pandas_object(data, index=True).to_numpy().tobytes()
+    )
+
+    return fingerprint.hexdigest()
+
+
+def load_clustering_cache(cache_path: Path) -> dict | None:
+    """
+    Loads the clustering results of an investment period from an h5 cache file
+
+    :param Path cache_path: path of the cache file
+    :return: dict with typical periods, cluster order and number of occurrences of
+        each cluster or None, if there is no valid cache file
+    """
+    if not os.path.isfile(cache_path):
+        return None
+
+    try:
+        clustering = {
+            "typical_periods": pd.read_hdf(cache_path, key="typical_periods"),
+            "cluster_order": pd.read_hdf(cache_path, key="cluster_order").to_numpy(),
+            "cluster_no_occur": pd.read_hdf(
+                cache_path, key="cluster_no_occur"
+            ).to_dict(),
+        }
+        return clustering
+    except (KeyError, OSError, ValueError) as e:
+        log.warning(f"Could not read clustering cache {cache_path}: {e}")
+        return None
+
+
+def save_clustering_cache(cache_path: Path, clustering: dict):
+    """
+    Saves the clustering results of an investment period to an h5 cache file
+
+    The file is written to a temporary file first and then moved, so that
+    processes sharing a cache directory never read incomplete files.
+
+    :param Path cache_path: path of the cache file
+    :param dict clustering: dict with typical periods, cluster order and number of
+        occurrences of each cluster
+    """
+    try:
+        with tempfile.NamedTemporaryFile(
+            dir=os.path.dirname(cache_path), suffix=".tmp", delete=False
+        ) as file:
+            temp_path = file.name
+        clustering["typical_periods"].to_hdf(temp_path, key="typical_periods", mode="w")
+        pd.Series(clustering["cluster_order"]).to_hdf(temp_path, key="cluster_order")
+        pd.Series(clustering["cluster_no_occur"]).to_hdf(
+            temp_path, key="cluster_no_occur"
+        )
+        os.replace(temp_path, cache_path)
+    except OSError as e:
+        log.warning(f"Could not write clustering cache {cache_path}: {e}")
+
+
 def select_technology(tec_data: dict):
     """
     Returns the correct subclass for a technology
@@ -86,29 +375,317 @@ def read_tec_data(tec_name: str, load_path: Path):
     return tec_data
 
 
+def fit_technology(tec_data, climate_data: pd.DataFrame, location: pd.Series):
+    """
+    Fits the performance of a technology
+
+    This is a module level function, so that it can be used in a process pool.
+
+    :param tec_data: Technology Class
+    :param pd.DataFrame climate_data: climate data of the node
+    :param pd.Series location: node location
+    :return: fitted Technology Class
+    """
+    tec_data.fit_technology_performance(climate_data, location)
+    return tec_data
+
+
+def get_package_version() -> str:
+    """
+    Returns the version of the installed adopt_net0 package
+
+    :return: package version or "unknown" if the package is not installed
+    :rtype: str
+    """
+    try:
+        return version("adopt_net0")
+    except PackageNotFoundError:
+        return "unknown"
+
+
+@lru_cache(maxsize=1)
+def get_fitting_code_fingerprint() -> str:
+    """
+    Returns a fingerprint of the source code of the components package
+
+    The technology fits are implemented in the components package. The fingerprint
+    changes with its source code, also if the package version does not change
+    (e.g. in a source checkout).
+
+    :return: fingerprint as hex string
+    :rtype: str
+    """
+    components_path = Path(__file__).parent.parent / "components"
+    fingerprint = hashlib.sha256()
+    for file_path in sorted(components_path.rglob("*.py")):
+        fingerprint.update(file_path.relative_to(components_path).as_posix().encode())
+        fingerprint.update(file_path.read_bytes())
+
+    return fingerprint.hexdigest()
+
+
+def get_file_fingerprint(file_path: Path | str) -> str:
+    """
+    Returns a fingerprint of the content of a file
+
+    The fingerprint is calculated only once per process (and again if the file is
+    modified).
+
+    :param Path | str file_path: path of the file
+    :return: fingerprint as hex string
+    :rtype: str
+    """
+    stat = os.stat(file_path)
+    return _get_file_fingerprint(str(file_path), stat.st_mtime_ns, stat.st_size)
+
+
+@lru_cache(maxsize=64)
+def _get_file_fingerprint(file_path: str, mtime: int, size: int) -> str:
+    """
+    Returns a fingerprint of the content of a file (cached)
+
+    :param str file_path: path of the file
+    :param int mtime: modification time of the file (cache key)
+    :param int size: size of the file (cache key)
+    :return: fingerprint as hex string
+    :rtype: str
+    """
+    with open(file_path, "rb") as file:
+        return hashlib.sha256(file.read()).hexdigest()
+
+
+def get_technology_fingerprint(
+    tec_name: str,
+    load_path: Path,
+    tec_data,
+    climate_data_fingerprint: str,
+    location: pd.Series,
+) -> str:
+    """
+    Calculates a fingerprint of everything a technology fit depends on
+
+    The fingerprint is based on the technology json (and the CCS json, if
+    applicable), the data files read by the fit (see
+    Technology.get_fitting_data_files), the climate data, the node location, the
+    package version and the source code of the fits. It does not depend on whether
+    the technology is existing, as the size limits are set when restoring a fitted
+    state (see Technology.restore_fitted_state).
+
+    :param str tec_name: technology name
+    :param Path load_path: path the technology json was read from
+    :param tec_data: Technology Class (not yet fitted)
+    :param str climate_data_fingerprint: fingerprint of the climate data of the
+        node (see get_climate_data_fingerprint)
+    :param pd.Series location: node location
+    :return: fingerprint as hex string
+    :rtype: str
+    """
+    settings = {
+        "technology": open_json(tec_name, load_path),
+        "ccs": None,
+        "name": tec_name,
+        "climate_data": climate_data_fingerprint,
+        "version": get_package_version(),
+        "code": get_fitting_code_fingerprint(),
+        "data_files": [
+            get_file_fingerprint(file_path)
+            for file_path in tec_data.get_fitting_data_files()
+        ],
+    }
+    if tec_data.component_options.ccs_possible:
+        settings["ccs"] = open_json(tec_data.component_options.ccs_type, load_path)
+
+    fingerprint = hashlib.sha256()
+    fingerprint.update(json.dumps(settings, sort_keys=True, default=str).encode())
+    fingerprint.update(
+        pd.util.hash_pandas_object(pd.Series(location), index=True).to_numpy().tobytes()
+    )
+
+    return fingerprint.hexdigest()
+
+
+def share_fitted_state(item):
+    """
+    Copies a fitted state of a technology and shares its arrays with the copy
+
+    All containers are copied, so that every technology has its own coefficients.
+    Writeable numpy arrays are copied and the copies are set to read-only, so that
+    the arrays of the original state are not changed. Read-only arrays are not
+    copied but shared. Thus, all copies of a shared state share their arrays.
+
+    :param item: fitted state (see Technology.get_fitted_state)
+    :return: copy of the fitted state
+    """
+    if isinstance(item, dict):
+        return {key: share_fitted_state(value) for key, value in item.items()}
+    elif isinstance(item, list):
+        return [share_fitted_state(value) for value in item]
+    elif isinstance(item, tuple):
+        return tuple(share_fitted_state(value) for value in item)
+    elif isinstance(item, np.ndarray):
+        if item.flags.writeable:
+            item = item.copy()
+            item.flags.writeable = False
+        return item
+    elif isinstance(item, (pd.Series, pd.DataFrame)):
+        return item.copy()
+    else:
+        return item
+
+
+def _encode_fitted_state(item, arrays: list):
+    """
+    Encodes a fitted state into a json serializable structure and a list of arrays
+
+    :param item: item to encode
+    :param list arrays: list the arrays of the item are appended to
+    :return: json serializable structure
+    """
+    if isinstance(item, dict):
+        return {
+            "type": "dict",
+            "items": [
+                [_encode_fitted_state(key, arrays), _encode_fitted_state(value, arrays)]
+                for key, value in item.items()
+            ],
+        }
+    elif isinstance(item, (list, tuple)):
+        return {
+            "type": type(item).__name__,
+            "items": [_encode_fitted_state(value, arrays) for value in item],
+        }
+    elif isinstance(item, np.ndarray):
+        if item.dtype.hasobject:
+            raise TypeError("Arrays of dtype object cannot be cached")
+        arrays.append(item)
+        return {"type": "array", "id": len(arrays) - 1}
+    elif isinstance(item, pd.Series):
+        return {
+            "type": "series",
+            "values": _encode_fitted_state(item.to_numpy(), arrays),
+            "index": _encode_fitted_state(item.index.to_numpy(), arrays),
+            "name": _encode_fitted_state(item.name, arrays),
+        }
+    elif isinstance(item, pd.DataFrame):
+        return {
+            "type": "frame",
+            "values": _encode_fitted_state(item.to_numpy(), arrays),
+            "index": _encode_fitted_state(item.index.to_numpy(), arrays),
+            "columns": _encode_fitted_state(list(item.columns), arrays),
+        }
+    elif isinstance(item, np.generic):
+        return _encode_fitted_state(item.item(), arrays)
+    elif item is None or isinstance(item, (bool, int, float, str)):
+        return {"type": "value", "value": item}
+    else:
+        raise TypeError(f"Items of type {type(item)} cannot be cached")
+
+
+def _decode_fitted_state(structure: dict, arrays: dict):
+    """
+    Decodes a structure created with _encode_fitted_state
+
+    :param dict structure: json serializable structure
+    :param dict arrays: arrays referenced in the structure
+    :return: decoded item
+    """
+    item_type = structure["type"]
+    if item_type == "dict":
+        return {
+            _decode_fitted_state(key, arrays): _decode_fitted_state(value, arrays)
+            for key, value in structure["items"]
+        }
+    elif item_type == "list":
+        return [_decode_fitted_state(value, arrays) for value in structure["items"]]
+    elif item_type == "tuple":
+        return tuple(
+            _decode_fitted_state(value, arrays) for value in structure["items"]
+        )
+    elif item_type == "array":
+        return arrays["array" + str(structure["id"])]
+    elif item_type == "series":
+        return pd.Series(
+            _decode_fitted_state(structure["values"], arrays),
+            index=_decode_fitted_state(structure["index"], arrays),
+            name=_decode_fitted_state(structure["name"], arrays),
+        )
+    elif item_type == "frame":
+        return pd.DataFrame(
+            _decode_fitted_state(structure["values"], arrays),
+            index=_decode_fitted_state(structure["index"], arrays),
+            columns=_decode_fitted_state(structure["columns"], arrays),
+        )
+    else:
+        return structure["value"]
+
+
+def load_fitted_technology(cache_path: Path) -> dict | None:
+    """
+    Loads the fitted state of a technology from a npz cache file
+
+    :param Path cache_path: path of the cache file
+    :return: fitted state or None, if there is no valid cache file
+    """
+    if not os.path.isfile(cache_path):
+        return None
+
+    try:
+        with np.load(cache_path, allow_pickle=False) as data:
+            arrays = {key: data[key] for key in data.files if key != "structure"}
+            structure = json.loads(str(data["structure"]))
+        return _decode_fitted_state(structure, arrays)
+    except (KeyError, OSError, ValueError) as e:
+        log.warning(f"Could not read technology cache {cache_path}: {e}")
+        return None
+
+
+def save_fitted_technology(cache_path: Path, state: dict):
+    """
+    Saves the fitted state of a technology to a npz cache file
+
+    The file is written to a temporary file first and then moved, so that
+    processes sharing a cache directory never read incomplete files.
+
+    :param Path cache_path: path of the cache file
+    :param dict state: fitted state of the technology
+    """
+    try:
+        arrays = []
+        structure = _encode_fitted_state(state, arrays)
+    except TypeError as e:
+        log.warning(f"Fitted technology is not cached: {e}")
+        return
+
+    try:
+        with tempfile.NamedTemporaryFile(
+            dir=os.path.dirname(cache_path), suffix=".tmp", delete=False
+        ) as file:
+            np.savez(
+                file,
+                structure=np.array(json.dumps(structure)),
+                **{"array" + str(i): array for i, array in enumerate(arrays)},
+            )
+        os.replace(file.name, cache_path)
+    except OSError as e:
+        log.warning(f"Could not write technology cache {cache_path}: {e}")
+
+
 def open_json(tec: str, load_path: Path) -> dict:
     """
-    Loops through load_path and subdirectories and returns json with name tec + ".json"
+    Returns json with name tec + ".json" from load_path or its subdirectories
+
+    The lookup uses the shared json catalogue, so that each load_path is only walked
+    once.
 
     :param str tec: name of technology to read json for
     :param Path load_path: directory path to loop through all subdirectories and search for tec + ".json"
     :return: Dictionary containing the json data
     :rtype: dict
     """
-    # Read in JSON files
-    for path, subdirs, files in os.walk(load_path):
-        if "data" in locals():
-            break
-        else:
-            for name in files:
-                if (tec + ".json") == name:
-                    filepath = os.path.join(path, name)
-                    with open(filepath) as json_file:
-                        data = json.load(json_file)
-                    break
+    data = json_catalogue.load(tec, load_path)
 
     # Assign name
-    if "data" in locals():
+    if data is not None:
         data["Name"] = tec
     else:
         raise Exception("There is no json data file for technology " + tec)
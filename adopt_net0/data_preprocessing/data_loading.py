@@ -8,6 +8,8 @@ import requests
 from timezonefinder import TimezoneFinder
 from pathlib import Path
 
+from ..utilities import json_catalogue
+
 
 def load_climate_data_from_api(folder_path: str | Path, dataset: str = "JRC"):
     """
@@ -256,14 +258,14 @@ def find_json_path(data_path: str | Path, name: str) -> Path | None:
     """
     Search for a JSON file with the given technology name in the specified path and its subfolders.
 
+    The lookup is case insensitive and uses the shared json catalogue, so that
+    data_path is only walked once.
+
     :param str data_path: Path to the folder containing technology JSON files.
     :param str name: Name of the technology.
     :return: Path to the JSON file if found, otherwise None.
     """
-    for root, dirs, files in os.walk(data_path.resolve()):
-        for file in files:
-            if file.lower() == f"{name.lower()}.json":
-                return Path(root) / Path(file)
+    return json_catalogue.find(name, data_path, case_sensitive=False)
 
 
 def import_jrc_climate_data(
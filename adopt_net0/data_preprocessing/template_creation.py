@@ -330,12 +330,26 @@ def initialize_configuration_templates() -> dict:
                     "options": [],
                     "value": ["RES", "STOR", "Hydro_Open"],
                 },
+                "segments": {
+                    "description": "Number of segments per typical day. The hours of "
+                    "each typical day are merged into segments of variable duration "
+                    "(0 = hourly resolution of typical days).",
+                    "value": 0,
+                },
             },
             "multiyear": {
                 "description": "Enable multiyear analysis, if turned off max time horizon is 1 year.",
                 "options": [0, 1],
                 "value": 0,
             },
+            "lean_model": {
+                "description": "If 1, aggregated input, output, variable opex and "
+                "emissions of technologies are defined as expressions instead of "
+                "variables with defining constraints, which reduces the size of the "
+                "model.",
+                "options": [0, 1],
+                "value": 0,
+            },
         },
         "solveroptions": {
             "solver": {
@@ -427,6 +441,13 @@ def initialize_configuration_templates() -> dict:
                 "options": [0, 1, 2],
                 "value": 0,
             },
+            "profile_construction": {
+                "description": "If 1, records wall time, constraints and variables "
+                "added and memory allocated for each block and phase of the model "
+                "construction, if 2 also writes the records to the results folder.",
+                "options": [0, 1, 2],
+                "value": 0,
+            },
         },
         "energybalance": {
             "violation": {
@@ -478,6 +499,45 @@ def initialize_configuration_templates() -> dict:
                 },
             },
         },
+        "datahandling": {
+            "read_workers": {
+                "description": "Number of threads used to read the time series csv "
+                "files (1 = serial reading).",
+                "value": 1,
+            },
+            "fitting_workers": {
+                "description": "Number of processes used to fit the technology "
+                "performances (1 = serial fitting).",
+                "value": 1,
+            },
+            "aggregation_workers": {
+                "description": "Number of processes used to cluster the "
+                "investment periods (1 = serial clustering).",
+                "value": 1,
+            },
+            "fitting_cache_path": {
+                "description": "Directory to cache fitted technology performances "
+                "in. Technologies with unchanged input data are read from the cache "
+                "instead of being fitted again. Relative paths are relative to the "
+                "input data folder. Leave empty to disable the cache.",
+                "value": "",
+            },
+            "time_series_cache": {
+                "description": "Stores the time series in TimeSeriesCache.h5 next to "
+                "Topology.json and reads them from there as long as no input file "
+                "has changed.",
+                "options": [0, 1],
+                "value": 0,
+            },
+            "clustering_cache_path": {
+                "description": "Directory to cache the results of the k-means "
+                "clustering in. Investment periods with unchanged full resolution "
+                "data and clustering settings are read from the cache instead of "
+                "being clustered again. Relative paths are relative to the input data "
+                "folder. Leave empty to disable the cache.",
+                "value": "",
+            },
+        },
     }
 
     return configuration_template
@@ -1 +1,3 @@
 from .check_infeasibilities import get_infeasible_constraints
+from .clustering_benchmark import benchmark_clustering, recommend_nr_typical_days
+from .fitting_benchmark import benchmark_linear_fit
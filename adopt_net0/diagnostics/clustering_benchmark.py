@@ -0,0 +1,278 @@
+import copy
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyomo.environ as pyo
+
+from ..data_management import DataHandle
+from ..data_management.utilities import (
+    cluster_time_series,
+    get_clustering_sequence_and_factors,
+)
+from ..modelhub import ModelHub
+from ..utilities import get_config_option
+import logging
+
+log = logging.getLogger(__name__)
+
+ERROR_METRICS = ["rmse", "mae", "max_error", "duration_curve_rmse"]
+
+
+def calculate_reconstruction_errors(
+    full_res_data_matrix: pd.DataFrame, clustering: dict, nr_segments: int = 0
+) -> dict:
+    """
+    Calculates the errors of the full resolution data reconstructed from a clustering
+
+    The full resolution data is reconstructed by mapping each time step to its
+    clustered time step (see get_clustering_sequence_and_factors). All series are
+    normalized by their range (as done by tsam), the errors are averaged over all
+    series that are not constant (except max_error, which is the maximum over these
+    series):
+
+    - rmse: root mean squared error
+    - mae: mean absolute error
+    - max_error: maximal absolute error
+    - duration_curve_rmse: root mean squared error of the duration curves
+
+    :param pd.DataFrame full_res_data_matrix: full resolution data matrix
+    :param dict clustering: clustering as returned by cluster_time_series
+    :param int nr_segments: number of segments per typical day (0 = no
+        segmentation)
+    :return: errors
+    :rtype: dict
+    """
+    sequence, _ = get_clustering_sequence_and_factors(clustering, nr_segments)
+    typical_periods = clustering["typical_periods"][full_res_data_matrix.columns]
+
+    full_res_data = full_res_data_matrix.to_numpy(dtype=float)
+    reconstructed = typical_periods.to_numpy(dtype=float)[sequence - 1]
+    nr_timesteps = min(len(full_res_data), len(reconstructed))
+    full_res_data = full_res_data[:nr_timesteps]
+    reconstructed = reconstructed[:nr_timesteps]
+
+    # Constant series are reconstructed exactly and are not considered
+    data_range = full_res_data.max(axis=0) - full_res_data.min(axis=0)
+    is_varying = data_range > 0
+    if not is_varying.any():
+        return {metric: 0.0 for metric in ERROR_METRICS}
+
+    data_range = data_range[is_varying]
+    full_res_data = full_res_data[:, is_varying]
+    reconstructed = reconstructed[:, is_varying]
+    deviation = (reconstructed - full_res_data) / data_range
+    deviation_duration_curve = (
+        np.sort(reconstructed, axis=0) - np.sort(full_res_data, axis=0)
+    ) / data_range
+
+    return {
+        "rmse": np.sqrt((deviation**2).mean(axis=0)).mean(),
+        "mae": np.abs(deviation).mean(axis=0).mean(),
+        "max_error": np.abs(deviation).max(),
+        "duration_curve_rmse": np.sqrt(
+            (deviation_duration_curve**2).mean(axis=0)
+        ).mean(),
+    }
+
+
+def recommend_nr_typical_days(
+    report: pd.DataFrame, tolerance: float, metric: str = "rmse"
+) -> int | None:
+    """
+    Recommends the smallest number of typical days within a tolerance
+
+    For each number of typical days, the worst value of the metric over all
+    investment periods is compared to the tolerance.
+
+    :param pd.DataFrame report: report as returned by benchmark_clustering
+    :param float tolerance: tolerance on the metric
+    :param str metric: column of the report to use (an error metric or
+        objective_drift)
+    :return: smallest number of typical days within tolerance, None if no number of
+        typical days is within tolerance
+    :rtype: int | None
+    """
+    if metric not in report:
+        raise KeyError(f"Metric {metric} is not contained in the report")
+
+    worst = report.groupby("nr_typical_days")[metric].max()
+    within_tolerance = worst.index[worst.abs() <= tolerance]
+    if within_tolerance.empty:
+        return None
+    return int(within_tolerance.min())
+
+
+def benchmark_clustering(
+    data: DataHandle,
+    nr_typical_days: list,
+    tolerance: float = 0.05,
+    metric: str = "rmse",
+    solve: bool = False,
+    solve_full_resolution: bool = False,
+    report_path: Path | str = None,
+) -> (pd.DataFrame, int | None):
+    """
+    Benchmarks the clustering into typical days for multiple numbers of typical days
+
+    For each number of typical days and each investment period, the full resolution
+    data (see DataHandle._collect_full_res_data) is clustered with tsam. The
+    clustering time and the errors of the reconstructed full resolution data (see
+    calculate_reconstruction_errors) are reported. The settings segments (typical
+    days) and method are taken from the model configuration of the data handle.
+
+    If solve is True, the model is additionally constructed and solved with the
+    same clustering for each number of typical days and the objective, the
+    construction time, the solve time and the relative drift of the objective are
+    reported. The drift is calculated with respect to the full resolution model, if
+    solve_full_resolution is True, and with respect to the largest number of
+    typical days otherwise. Note that all results are saved as specified in the
+    model configuration.
+
+    The smallest number of typical days for which the metric is within tolerance in
+    all investment periods is recommended (see recommend_nr_typical_days).
+
+    Use as follows:
+
+    .. code-block:: python
+
+        pyhub = ModelHub()
+        pyhub.read_data(path)
+        report, nr_typical_days = benchmark_clustering(
+            pyhub.data, [5, 10, 20, 40], report_path="clustering_benchmark.csv"
+        )
+
+    :param DataHandle data: data handle with data read
+    :param list nr_typical_days: numbers of typical days to benchmark
+    :param float tolerance: tolerance on the metric used for the recommendation
+    :param str metric: metric used for the recommendation (rmse, mae, max_error,
+        duration_curve_rmse or objective_drift, if solve is True)
+    :param bool solve: solve the clustered model for each number of typical days
+    :param bool solve_full_resolution: solve the full resolution model as reference
+        for the objective drift
+    :param Path, str report_path: path to write the report to (.h5 for HDF5, csv
+        otherwise), not written if None
+    :return: report with a row per number of typical days and investment period and
+        the recommended number of typical days
+    :rtype: (pd.DataFrame, int | None)
+    """
+    nr_typical_days = sorted(nr_typical_days)
+    hours_per_day = data.topology["hours_per_day"]["full"]
+    nr_segments = get_config_option(
+        data.model_config, ["optimization", "typicaldays", "segments"], 0
+    )
+    if not 0 < nr_segments < hours_per_day:
+        nr_segments = 0
+
+    full_res_data_matrices = {
+        investment_period: data._collect_full_res_data(investment_period)
+        for investment_period in data.topology["investment_periods"]
+    }
+
+    # Cluster and calculate reconstruction errors
+    rows = []
+    clusterings = {}
+    for nr_clusters in nr_typical_days:
+        clusterings[nr_clusters] = {}
+        for investment_period, matrix in full_res_data_matrices.items():
+            start = time.time()
+            clustering = cluster_time_series(
+                matrix, nr_clusters, hours_per_day, nr_segments
+            )
+            clustering_time = time.time() - start
+            clusterings[nr_clusters][investment_period] = clustering
+
+            row = {
+                "nr_typical_days": nr_clusters,
+                "investment_period": investment_period,
+                "clustering_time": clustering_time,
+            }
+            row.update(calculate_reconstruction_errors(matrix, clustering, nr_segments))
+            rows.append(row)
+
+            log_msg = (
+                f"Clustered investment period {investment_period} into {nr_clusters} "
+                f"typical days in {round(clustering_time, 2)}s (rmse: "
+                f"{round(row['rmse'], 4)})"
+            )
+            log.info(log_msg)
+
+    report = pd.DataFrame(rows)
+
+    # Solve clustered models
+    if solve:
+        results = {}
+        for nr_clusters in nr_typical_days:
+            results[nr_clusters] = _solve_clustered_model(
+                data, nr_clusters, clusterings[nr_clusters], nr_segments
+            )
+        if solve_full_resolution:
+            reference = _solve_clustered_model(data, 0)["objective"]
+        else:
+            reference = results[nr_typical_days[-1]]["objective"]
+
+        for column in ["objective", "construction_time", "solve_time"]:
+            report[column] = report["nr_typical_days"].map(
+                {nr_clusters: results[nr_clusters][column] for nr_clusters in results}
+            )
+        report["objective_drift"] = (report["objective"] - reference) / abs(reference)
+
+    recommendation = recommend_nr_typical_days(report, tolerance, metric)
+    if recommendation is None:
+        log_msg = f"No number of typical days has a {metric} within {tolerance}"
+    else:
+        log_msg = (
+            f"Recommended number of typical days: {recommendation} ({metric} within "
+            f"{tolerance})"
+        )
+    log.info(log_msg)
+
+    if report_path is not None:
+        report_path = Path(report_path)
+        if report_path.suffix == ".h5":
+            report.to_hdf(report_path, key="clustering_benchmark", mode="w")
+        else:
+            report.to_csv(report_path, index=False)
+
+    return report, recommendation
+
+
+def _solve_clustered_model(
+    data: DataHandle, nr_clusters: int, clusterings: dict = None, nr_segments: int = 0
+) -> dict:
+    """
+    Constructs and solves the model with a given clustering
+
+    :param DataHandle data: data handle with data read
+    :param int nr_clusters: number of typical days (0 = full resolution)
+    :param dict clusterings: clustering per investment period
+    :param int nr_segments: number of segments per typical day
+    :return: objective value, construction time and solve time
+    :rtype: dict
+    """
+    pyhub = ModelHub()
+    pyhub.data = copy.deepcopy(data)
+    config = pyhub.data.model_config
+    config["optimization"]["typicaldays"]["N"]["value"] = nr_clusters
+    config["optimization"]["timestaging"]["value"] = 0
+
+    if nr_clusters:
+        pyhub.data._write_clustered_data(clusterings, nr_segments)
+
+    start = time.time()
+    pyhub.construct_model()
+    pyhub.construct_balances()
+    construction_time = time.time() - start
+
+    start = time.time()
+    pyhub.solve()
+    solve_time = time.time() - start
+
+    model = pyhub.model[pyhub.info_solving_algorithms["aggregation_model"]]
+
+    return {
+        "objective": pyo.value(model.objective),
+        "construction_time": construction_time,
+        "solve_time": solve_time,
+    }
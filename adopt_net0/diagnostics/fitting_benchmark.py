@@ -0,0 +1,80 @@
+import timeit
+
+import numpy as np
+import pandas as pd
+from statsmodels import api as sm
+
+from ..components.technologies.utilities import (
+    fit_linear_function_batched,
+    add_constant,
+)
+import logging
+
+log = logging.getLogger(__name__)
+
+
+def benchmark_linear_fit(
+    nr_timesteps: int = 8760, nr_repetitions: int = 3, seed: int = 0
+) -> pd.DataFrame:
+    """
+    Micro-benchmark of the linear performance fits
+
+    Compares fitting a heat pump performance for nr_timesteps time steps with one
+    statsmodels OLS regression per time step (as done previously) to fitting all
+    time steps with a single least squares call (fit_linear_function_batched). Both
+    performance function types are benchmarked: type 1 (through the origin) and
+    type 2 (with intercept). Times are the minimum over all repetitions.
+
+    :param int nr_timesteps: number of time steps to fit
+    :param int nr_repetitions: number of repetitions of each fit
+    :param int seed: seed of the random coefficients of performance
+    :return: report with a row per performance function type and the columns
+        time_ols_ms, time_batched_ms, speedup and max_deviation (maximal absolute
+        deviation of the coefficients)
+    :rtype: pd.DataFrame
+    """
+    # Heat pump performance data (see HeatPump.fit_technology_performance)
+    rng = np.random.default_rng(seed)
+    cop = rng.uniform(2, 5, nr_timesteps)
+    x = np.linspace(0.5, 1, 9)
+    y = np.outer((x / (1 - 0.9 * (1 - x))) * x, cop)
+
+    def fit_ols_per_time_step(design_matrix):
+        coeff = [sm.OLS(y[:, t], design_matrix).fit().params for t in range(y.shape[1])]
+        return np.column_stack(coeff).reshape(-1, nr_timesteps)
+
+    def fit_batched(design_matrix):
+        return fit_linear_function_batched(design_matrix, y).reshape(-1, nr_timesteps)
+
+    report = []
+    for performance_function_type, design_matrix in [(1, x), (2, add_constant(x))]:
+        times = {}
+        for method, fit in [("ols", fit_ols_per_time_step), ("batched", fit_batched)]:
+            times[method] = (
+                min(
+                    timeit.repeat(
+                        lambda: fit(design_matrix), number=1, repeat=nr_repetitions
+                    )
+                )
+                * 1000
+            )
+        deviation = np.max(
+            np.abs(fit_ols_per_time_step(design_matrix) - fit_batched(design_matrix))
+        )
+        report.append(
+            {
+                "performance_function_type": performance_function_type,
+                "nr_timesteps": nr_timesteps,
+                "time_ols_ms": times["ols"],
+                "time_batched_ms": times["batched"],
+                "speedup": times["ols"] / times["batched"],
+                "max_deviation": deviation,
+            }
+        )
+        log.info(
+            f"Linear fit (type {performance_function_type}, {nr_timesteps} time "
+            f"steps): {times['ols']:.1f} ms with OLS per time step, "
+            f"{times['batched']:.1f} ms batched"
+        )
+
+    return pd.DataFrame(report).set_index("performance_function_type")
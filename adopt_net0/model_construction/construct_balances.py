@@ -1,6 +1,13 @@
+import numpy as np
 import pyomo.environ as pyo
 
-from ..utilities import get_set_t, get_hour_factors, get_nr_timesteps_averaged
+from ..utilities import (
+    get_set_t,
+    get_hour_factors,
+    get_timestep_weights,
+    get_carrier_technology_incidence,
+    build_linear_expression,
+)
 
 
 def delete_all_balances(model):
@@ -133,52 +140,46 @@ def construct_nodal_energybalance(model, config: dict):
                 domain=pyo.NonNegativeReals,
             )
 
+        incidence = get_carrier_technology_incidence(b_period)
+        has_violation = config["energybalance"]["violation"]["value"] > 0
+
         def init_energybalance(const, t, car, node):
-            if car in b_period.node_blocks[node].set_carriers:
-                node_block = b_period.node_blocks[node]
-                tec_output = sum(
-                    node_block.tech_blocks_active[tec].var_output_tot[t, car]
-                    for tec in node_block.set_technologies
-                    if car in node_block.tech_blocks_active[tec].set_output_carriers_all
-                )
+            if car not in incidence[node]:
+                return pyo.Constraint.Skip
 
-                tec_input = sum(
-                    node_block.tech_blocks_active[tec].var_input_tot[t, car]
-                    for tec in node_block.set_technologies
-                    if car in node_block.tech_blocks_active[tec].set_input_carriers_all
-                )
+            node_block = b_period.node_blocks[node]
+            tecs = incidence[node][car]
+
+            # Technology outputs and inputs
+            linear_vars = [b_tec.var_output_tot[t, car] for b_tec in tecs["output"]]
+            linear_coefs = [1] * len(linear_vars)
+            linear_vars.extend(b_tec.var_input_tot[t, car] for b_tec in tecs["input"])
+            linear_coefs.extend([-1] * len(tecs["input"]))
+
+            # Network flows, imports, exports and generic production
+            linear_vars.extend(
+                [
+                    node_block.var_netw_inflow[t, car],
+                    node_block.var_netw_outflow[t, car],
+                    node_block.var_import_flow[t, car],
+                    node_block.var_export_flow[t, car],
+                    node_block.var_generic_production[t, car],
+                ]
+            )
+            linear_coefs.extend([1, -1, 1, -1, 1])
 
-                netw_inflow = node_block.var_netw_inflow[t, car]
-
-                netw_outflow = node_block.var_netw_outflow[t, car]
-
-                if hasattr(node_block, "var_netw_consumption"):
-                    netw_consumption = node_block.var_netw_consumption[t, car]
-                else:
-                    netw_consumption = 0
-
-                import_flow = node_block.var_import_flow[t, car]
-
-                export_flow = node_block.var_export_flow[t, car]
-
-                if config["energybalance"]["violation"]["value"] > 0:
-                    violation = b_period.var_violation[t, car, node]
-                else:
-                    violation = 0
-                return (
-                    tec_output
-                    - tec_input
-                    + netw_inflow
-                    - netw_outflow
-                    - netw_consumption
-                    + import_flow
-                    - export_flow
-                    + violation
-                    == node_block.para_demand[t, car]
-                    - node_block.var_generic_production[t, car]
-                )
-            else:
-                return pyo.Constraint.Skip
+            if hasattr(node_block, "var_netw_consumption"):
+                linear_vars.append(node_block.var_netw_consumption[t, car])
+                linear_coefs.append(-1)
+
+            if has_violation:
+                linear_vars.append(b_period.var_violation[t, car, node])
+                linear_coefs.append(1)
+
+            return (
+                build_linear_expression(linear_coefs, linear_vars)
+                == node_block.para_demand[t, car]
+            )
 
         b_ebalance.const_energybalance = pyo.Constraint(
             set_t, model.set_carriers, model.set_nodes, rule=init_energybalance
@@ -218,72 +219,47 @@ def construct_global_energybalance(model, config):
                 domain=pyo.NonNegativeReals,
             )
 
-        def init_energybalance_global(const, t, car):
-            tec_output = sum(
-                sum(
-                    b_period.node_blocks[node]
-                    .tech_blocks_active[tec]
-                    .var_output_tot[t, car]
-                    for tec in b_period.node_blocks[node].set_technologies
-                    if car in b_period.node_blocks[node].set_carriers
-                    and b_period.node_blocks[node]
-                    .tech_blocks_active[tec]
-                    .set_output_carriers_all
-                )
-                for node in model.set_nodes
-            )
-
-            tec_input = sum(
-                sum(
-                    b_period.node_blocks[node]
-                    .tech_blocks_active[tec]
-                    .var_input_tot[t, car]
-                    for tec in b_period.node_blocks[node].set_technologies
-                    if car in b_period.node_blocks[node].set_carriers
-                    and b_period.node_blocks[node]
-                    .tech_blocks_active[tec]
-                    .set_input_carriers_all
-                )
-                for node in model.set_nodes
-            )
+        incidence = get_carrier_technology_incidence(b_period)
+        has_violation = config["energybalance"]["violation"]["value"] > 0
 
-            import_flow = sum(
-                b_period.node_blocks[node].var_import_flow[t, car]
-                for node in model.set_nodes
-                if car in b_period.node_blocks[node].set_carriers
-            )
+        def init_energybalance_global(const, t, car):
+            linear_vars = []
+            linear_coefs = []
+            demand = 0
+            for node in model.set_nodes:
+                if car not in incidence[node]:
+                    continue
 
-            export_flow = sum(
-                b_period.node_blocks[node].var_export_flow[t, car]
-                for node in model.set_nodes
-                if car in b_period.node_blocks[node].set_carriers
-            )
+                node_block = b_period.node_blocks[node]
+                tecs = incidence[node][car]
 
-            demand = sum(
-                b_period.node_blocks[node].para_demand[t, car]
-                for node in model.set_nodes
-                if car in b_period.node_blocks[node].set_carriers
-            )
+                # Technology outputs and inputs
+                linear_vars.extend(
+                    b_tec.var_output_tot[t, car] for b_tec in tecs["output"]
+                )
+                linear_coefs.extend([1] * len(tecs["output"]))
+                linear_vars.extend(
+                    b_tec.var_input_tot[t, car] for b_tec in tecs["input"]
+                )
+                linear_coefs.extend([-1] * len(tecs["input"]))
+
+                # Imports, exports and generic production
+                linear_vars.extend(
+                    [
+                        node_block.var_import_flow[t, car],
+                        node_block.var_export_flow[t, car],
+                        node_block.var_generic_production[t, car],
+                    ]
+                )
+                linear_coefs.extend([1, -1, 1])
 
-            gen_prod = sum(
-                b_period.node_blocks[node].var_generic_production[t, car]
-                for node in model.set_nodes
-                if car in b_period.node_blocks[node].set_carriers
-            )
+                if has_violation:
+                    linear_vars.append(b_period.var_violation[t, car, node])
+                    linear_coefs.append(1)
 
-            if config["energybalance"]["violation"]["value"] > 0:
-                violation = sum(
-                    b_period.var_violation[t, car, node]
-                    for node in model.set_nodes
-                    if car in b_period.node_blocks[node].set_carriers
-                )
-            else:
-                violation = 0
+                demand += node_block.para_demand[t, car]
 
-            return (
-                tec_output - tec_input + import_flow - export_flow + violation
-                == demand - gen_prod
-            )
+            return build_linear_expression(linear_coefs, linear_vars) == demand
 
         model.set_used_carriers = pyo.Set(
             initialize=list(
@@ -331,81 +307,61 @@ def construct_emission_balance(model, data):
     def init_emissionbalance(b_emissionbalance, period):
         b_period = model.periods[period]
         set_t = get_set_t(config, b_period)
-        hour_factors = get_hour_factors(config, data, period)
-        nr_timesteps_averaged = get_nr_timesteps_averaged(config)
+        weights = get_timestep_weights(config, data, period, set_t).tolist()
 
         # calculate total emissions from technologies, networks and importing/exporting carriers
         def init_emissions_pos(const):
-            from_technologies = sum(
-                sum(
-                    sum(
-                        b_period.node_blocks[node]
-                        .tech_blocks_active[tec]
-                        .var_tec_emissions_pos[t]
-                        * nr_timesteps_averaged
-                        * hour_factors[t - 1]
-                        for t in set_t
+            linear_vars = []
+            linear_coefs = []
+            for node in model.set_nodes:
+                node_block = b_period.node_blocks[node]
+                # From technologies
+                for tec in node_block.set_technologies:
+                    tec_block = node_block.tech_blocks_active[tec]
+                    linear_vars.extend(
+                        tec_block.var_tec_emissions_pos[t] for t in set_t
                     )
-                    for tec in b_period.node_blocks[node].set_technologies
-                )
-                for node in model.set_nodes
-            )
-            from_carriers = sum(
-                sum(
-                    b_period.node_blocks[node].var_car_emissions_pos[t]
-                    * nr_timesteps_averaged
-                    * hour_factors[t - 1]
-                    for t in set_t
-                )
-                for node in model.set_nodes
-            )
+                    linear_coefs.extend(weights)
+                # From carriers
+                linear_vars.extend(node_block.var_car_emissions_pos[t] for t in set_t)
+                linear_coefs.extend(weights)
+            # From networks
             if not config["energybalance"]["copperplate"]["value"]:
-                from_networks = sum(
-                    sum(
-                        sum(
-                            b_period.network_block[netw].var_netw_emissions_pos[t, node]
-                            * nr_timesteps_averaged
-                            * hour_factors[t - 1]
-                            for t in set_t
+                for netw in b_period.set_networks:
+                    netw_block = b_period.network_block[netw]
+                    for node in model.set_nodes:
+                        linear_vars.extend(
+                            netw_block.var_netw_emissions_pos[t, node] for t in set_t
                         )
-                        for node in model.set_nodes
-                    )
-                    for netw in b_period.set_networks
-                )
-            else:
-                from_networks = 0
+                        linear_coefs.extend(weights)
+
             return (
-                from_technologies + from_carriers + from_networks
+                build_linear_expression(linear_coefs, linear_vars)
                 == b_period.var_emissions_pos
             )
 
         b_emissionbalance.const_emissions_tot = pyo.Constraint(rule=init_emissions_pos)
 
         def init_emissions_neg(const):
-            from_technologies = sum(
-                sum(
-                    sum(
-                        b_period.node_blocks[node]
-                        .tech_blocks_active[tec]
-                        .var_tec_emissions_neg[t]
-                        * nr_timesteps_averaged
-                        * hour_factors[t - 1]
-                        for t in set_t
+            linear_vars = []
+            linear_coefs = []
+            for node in model.set_nodes:
+                node_block = b_period.node_blocks[node]
+                # From technologies
+                for tec in node_block.set_technologies:
+                    tec_block = node_block.tech_blocks_active[tec]
+                    linear_vars.extend(
+                        tec_block.var_tec_emissions_neg[t] for t in set_t
                     )
-                    for tec in b_period.node_blocks[node].set_technologies
-                )
-                for node in model.set_nodes
-            )
-            from_carriers = sum(
-                sum(
-                    b_period.node_blocks[node].var_car_emissions_neg[t]
-                    * nr_timesteps_averaged
-                    * hour_factors[t - 1]
-                    for t in set_t
-                )
-                for node in model.set_nodes
+                    linear_coefs.extend(weights)
+                # From carriers
+                linear_vars.extend(node_block.var_car_emissions_neg[t] for t in set_t)
+                linear_coefs.extend(weights)
+
+            return (
+                build_linear_expression(linear_coefs, linear_vars)
+                == b_period.var_emissions_neg
             )
-            return from_technologies + from_carriers == b_period.var_emissions_neg
 
         b_emissionbalance.const_emissions_neg = pyo.Constraint(rule=init_emissions_neg)
 
@@ -438,22 +394,23 @@ def construct_import_costs(b_period, data, period: str):
     config = data.model_config
 
     set_t = get_set_t(config, b_period)
-    hour_factors = get_hour_factors(config, data, period)
-    nr_timesteps_averaged = get_nr_timesteps_averaged(config)
+    weights = get_timestep_weights(config, data, period, set_t).tolist()
 
     def init_cost_import(const):
-        return b_period.var_cost_imports == sum(
-            sum(
-                sum(
-                    b_period.node_blocks[node].var_import_flow[t, car]
-                    * b_period.node_blocks[node].para_import_price[t, car]
-                    * nr_timesteps_averaged
-                    * hour_factors[t - 1]
-                    for car in b_period.node_blocks[node].set_carriers
-                )
-                for t in set_t
-            )
-            for node in b_period.node_blocks
+        # Prices are mutable parameters for monte carlo runs and are then kept as
+        # parameters in the coefficients
+        linear_vars = []
+        linear_coefs = []
+        for node_block in b_period.node_blocks.values():
+            flow = node_block.var_import_flow
+            price = node_block.para_import_price
+            for t, weight in zip(set_t, weights):
+                for car in node_block.set_carriers:
+                    linear_vars.append(flow[t, car])
+                    linear_coefs.append(price[t, car] * weight)
+
+        return b_period.var_cost_imports == build_linear_expression(
+            linear_coefs, linear_vars
         )
 
     return pyo.Constraint(rule=init_cost_import)
@@ -474,22 +431,23 @@ def construct_export_costs(b_period, data, period):
     config = data.model_config
 
     set_t = get_set_t(config, b_period)
-    hour_factors = get_hour_factors(config, data, period)
-    nr_timesteps_averaged = get_nr_timesteps_averaged(config)
+    weights = get_timestep_weights(config, data, period, set_t).tolist()
 
     def init_cost_export(const):
-        return b_period.var_cost_exports == -sum(
-            sum(
-                sum(
-                    b_period.node_blocks[node].var_export_flow[t, car]
-                    * b_period.node_blocks[node].para_export_price[t, car]
-                    * nr_timesteps_averaged
-                    * hour_factors[t - 1]
-                    for car in b_period.node_blocks[node].set_carriers
-                )
-                for t in set_t
-            )
-            for node in b_period.node_blocks
+        # Prices are mutable parameters for monte carlo runs and are then kept as
+        # parameters in the coefficients
+        linear_vars = []
+        linear_coefs = []
+        for node_block in b_period.node_blocks.values():
+            flow = node_block.var_export_flow
+            price = node_block.para_export_price
+            for t, weight in zip(set_t, weights):
+                for car in node_block.set_carriers:
+                    linear_vars.append(flow[t, car])
+                    linear_coefs.append(-price[t, car] * weight)
+
+        return b_period.var_cost_exports == build_linear_expression(
+            linear_coefs, linear_vars
         )
 
     return pyo.Constraint(rule=init_cost_export)
@@ -521,8 +479,20 @@ def construct_system_cost(model, data):
     def init_period_cost(b_period_cost, period):
         b_period = model.periods[period]
         set_t = get_set_t(config, b_period)
-        hour_factors = get_hour_factors(config, data, period)
-        nr_timesteps_averaged = get_nr_timesteps_averaged(config)
+        weights = get_timestep_weights(config, data, period, set_t)
+
+        # Carbon prices (per node) multiplied with the weights of the time steps
+        carbon_tax_weights = {}
+        carbon_subsidy_weights = {}
+        for node in model.set_nodes:
+            node_block = b_period.node_blocks[node]
+            carbon_tax_weights[node] = (
+                weights * np.array([node_block.para_carbon_tax[t] for t in set_t])
+            ).tolist()
+            carbon_subsidy_weights[node] = (
+                weights * np.array([node_block.para_carbon_subsidy[t] for t in set_t])
+            ).tolist()
+        weights = weights.tolist()
 
         # Capex Tecs
         def init_cost_capex_tecs(const):
@@ -550,53 +520,39 @@ def construct_system_cost(model, data):
 
         # Opex Tecs
         def init_cost_opex_tecs(const):
-            tec_opex_variable = sum(
-                sum(
-                    sum(
-                        b_period.node_blocks[node]
-                        .tech_blocks_active[tec]
-                        .var_opex_variable_tot[t]
-                        * nr_timesteps_averaged
-                        * hour_factors[t - 1]
-                        for tec in b_period.node_blocks[node].set_technologies
+            linear_vars = []
+            linear_coefs = []
+            for node in model.set_nodes:
+                node_block = b_period.node_blocks[node]
+                for tec in node_block.set_technologies:
+                    tec_block = node_block.tech_blocks_active[tec]
+                    linear_vars.extend(
+                        tec_block.var_opex_variable_tot[t] for t in set_t
                     )
-                    for t in set_t
-                )
-                for node in model.set_nodes
-            )
+                    linear_coefs.extend(weights)
+                    linear_vars.append(tec_block.var_opex_fixed_tot)
+                    linear_coefs.append(1)
 
-            tec_opex_fixed = sum(
-                sum(
-                    b_period.node_blocks[node]
-                    .tech_blocks_active[tec]
-                    .var_opex_fixed_tot
-                    for tec in b_period.node_blocks[node].set_technologies
-                )
-                for node in model.set_nodes
+            return b_period.var_cost_opex_tecs == build_linear_expression(
+                linear_coefs, linear_vars
             )
 
-            return b_period.var_cost_opex_tecs == tec_opex_fixed + tec_opex_variable
-
         b_period_cost.const_opex_tecs = pyo.Constraint(rule=init_cost_opex_tecs)
 
         # Opex Networks
         def init_cost_opex_netws(const):
             if not config["energybalance"]["copperplate"]["value"]:
-                netw_opex_variable = sum(
-                    sum(
-                        b_period.network_block[netw].var_opex_variable[t]
-                        * nr_timesteps_averaged
-                        * hour_factors[t - 1]
-                        for netw in b_period.set_networks
-                    )
-                    for t in set_t
-                )
-                netw_opex_fixed = sum(
-                    b_period.network_block[netw].var_opex_fixed
-                    for netw in b_period.set_networks
-                )
-                return (
-                    b_period.var_cost_opex_netws == netw_opex_fixed + netw_opex_variable
+                linear_vars = []
+                linear_coefs = []
+                for netw in b_period.set_networks:
+                    netw_block = b_period.network_block[netw]
+                    linear_vars.extend(netw_block.var_opex_variable[t] for t in set_t)
+                    linear_coefs.extend(weights)
+                    linear_vars.append(netw_block.var_opex_fixed)
+                    linear_coefs.append(1)
+
+                return b_period.var_cost_opex_netws == build_linear_expression(
+                    linear_coefs, linear_vars
                 )
             else:
                 return b_period.var_cost_opex_netws == 0
@@ -628,20 +584,22 @@ def construct_system_cost(model, data):
         # Total violation cost
         def init_violation_cost(const):
             if config["energybalance"]["violation"]["value"] >= 0:
-                return (
-                    b_period.var_cost_violation
-                    == sum(
-                        sum(
-                            sum(
-                                b_period.var_violation[t, car, node]
-                                * hour_factors[t - 1]
-                                for t in set_t
-                            )
-                            for car in model.set_carriers
-                        )
-                        for node in model.set_nodes
-                    )
+                hour_factors = get_hour_factors(config, data, period)
+                violation_weights = (
+                    hour_factors[[t - 1 for t in set_t]]
                     * config["energybalance"]["violation"]["value"]
+                ).tolist()
+                linear_vars = []
+                linear_coefs = []
+                for node in model.set_nodes:
+                    for car in model.set_carriers:
+                        linear_vars.extend(
+                            b_period.var_violation[t, car, node] for t in set_t
+                        )
+                        linear_coefs.extend(violation_weights)
+
+                return b_period.var_cost_violation == build_linear_expression(
+                    linear_coefs, linear_vars
                 )
             else:
                 return b_period.var_cost_violation == 0
@@ -650,71 +608,51 @@ def construct_system_cost(model, data):
 
         # Emission cost and revenues (if applicable)
         def init_carbon_revenue(const):
-            revenue_carbon_from_technologies = sum(
-                sum(
-                    sum(
-                        b_period.node_blocks[node]
-                        .tech_blocks_active[tec]
-                        .var_tec_emissions_neg[t]
-                        * nr_timesteps_averaged
-                        * hour_factors[t - 1]
-                        * b_period.node_blocks[node].para_carbon_subsidy[t]
-                        for t in set_t
+            linear_vars = []
+            linear_coefs = []
+            for node in model.set_nodes:
+                node_block = b_period.node_blocks[node]
+                for tec in node_block.set_technologies:
+                    tec_block = node_block.tech_blocks_active[tec]
+                    linear_vars.extend(
+                        tec_block.var_tec_emissions_neg[t] for t in set_t
                     )
-                    for tec in b_period.node_blocks[node].set_technologies
-                )
-                for node in model.set_nodes
+                    linear_coefs.extend(carbon_subsidy_weights[node])
+
+            return (
+                build_linear_expression(linear_coefs, linear_vars)
+                == b_period.var_carbon_revenue
             )
-            return revenue_carbon_from_technologies == b_period.var_carbon_revenue
 
         b_period_cost.const_revenue_carbon = pyo.Constraint(rule=init_carbon_revenue)
 
         def init_carbon_cost(const):
-            cost_carbon_from_technologies = sum(
-                sum(
-                    sum(
-                        b_period.node_blocks[node]
-                        .tech_blocks_active[tec]
-                        .var_tec_emissions_pos[t]
-                        * nr_timesteps_averaged
-                        * hour_factors[t - 1]
-                        * b_period.node_blocks[node].para_carbon_tax[t]
-                        for t in set_t
+            linear_vars = []
+            linear_coefs = []
+            for node in model.set_nodes:
+                node_block = b_period.node_blocks[node]
+                # From technologies
+                for tec in node_block.set_technologies:
+                    tec_block = node_block.tech_blocks_active[tec]
+                    linear_vars.extend(
+                        tec_block.var_tec_emissions_pos[t] for t in set_t
                     )
-                    for tec in b_period.node_blocks[node].set_technologies
-                )
-                for node in model.set_nodes
-            )
-            cost_carbon_from_carriers = sum(
-                sum(
-                    b_period.node_blocks[node].var_car_emissions_pos[t]
-                    * nr_timesteps_averaged
-                    * b_period.node_blocks[node].para_carbon_tax[t]
-                    * hour_factors[t - 1]
-                    for t in set_t
-                )
-                for node in model.set_nodes
-            )
+                    linear_coefs.extend(carbon_tax_weights[node])
+                # From carriers
+                linear_vars.extend(node_block.var_car_emissions_pos[t] for t in set_t)
+                linear_coefs.extend(carbon_tax_weights[node])
+            # From networks
             if not config["energybalance"]["copperplate"]["value"]:
-                cost_carbon_from_networks = sum(
-                    sum(
-                        sum(
-                            b_period.network_block[netw].var_netw_emissions_pos[t, node]
-                            * nr_timesteps_averaged
-                            * hour_factors[t - 1]
-                            * b_period.node_blocks[node].para_carbon_tax[t]
-                            for t in set_t
+                for netw in b_period.set_networks:
+                    netw_block = b_period.network_block[netw]
+                    for node in model.set_nodes:
+                        linear_vars.extend(
+                            netw_block.var_netw_emissions_pos[t, node] for t in set_t
                         )
-                        for node in model.set_nodes
-                    )
-                    for netw in b_period.set_networks
-                )
-            else:
-                cost_carbon_from_networks = 0
+                        linear_coefs.extend(carbon_tax_weights[node])
+
             return (
-                cost_carbon_from_technologies
-                + cost_carbon_from_carriers
-                + cost_carbon_from_networks
+                build_linear_expression(linear_coefs, linear_vars)
                 == b_period.var_carbon_cost
             )
 
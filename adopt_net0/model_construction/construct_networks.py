@@ -1,7 +1,10 @@
 from ..components.utilities import perform_disjunct_relaxation
+from .profiling import profile
 
 
-def construct_network_block(b_netw, data: dict, set_nodes, set_t_full, set_t_clustered):
+def construct_network_block(
+    b_netw, data: dict, set_nodes, set_t_full, set_t_clustered, profiler=None
+):
     """
     Construct network block and performs disjunct relaxation if required
 
@@ -10,14 +13,18 @@ def construct_network_block(b_netw, data: dict, set_nodes, set_t_full, set_t_clu
     :param set_nodes: pyomo set containing all nodes
     :param set_t_full: pyomo set containing timesteps
     :param set_t_clustered: pyomo set containing clustered timesteps
+    :param ConstructionProfiler profiler: profiler recording the construction (None =
+        no profiling)
     :return: pyomo block with network model
     """
     netw = b_netw.index()
     network = data["network_data"][netw]
-    b_netw = network.construct_netw_model(
-        b_netw, data, set_nodes, set_t_full, set_t_clustered
-    )
+    with profile(profiler, b_netw, "network", "construct_netw_model"):
+        b_netw = network.construct_netw_model(
+            b_netw, data, set_nodes, set_t_full, set_t_clustered, profiler
+        )
     if network.big_m_transformation_required:
-        b_netw = perform_disjunct_relaxation(b_netw)
+        with profile(profiler, b_netw, "network", "perform_disjunct_relaxation"):
+            b_netw = perform_disjunct_relaxation(b_netw)
 
     return b_netw
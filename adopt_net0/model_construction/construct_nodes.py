@@ -144,31 +144,54 @@ def construct_node_block(b_node, data: dict, set_t_full, set_t_clustered):
         set_t = set_t_full
 
     # PARAMETERS
+    # The carrier data is converted once from the numpy columns of the time series to
+    # lists, which initialize the parameters and are used directly for the bounds and
+    # coefficients in this block (avoids a parameter lookup for each index). The
+    # domain of the parameters is set to Any explicitly, which skips checking each
+    # value against Reals.
+    ts = {
+        key: {
+            car: data["time_series"]["CarrierData"][car][key].to_numpy().tolist()
+            for car in b_node.set_carriers
+        }
+        for key in [
+            "Demand",
+            "Generic production",
+            "Import price",
+            "Export price",
+            "Import limit",
+            "Export limit",
+            "Import emission factor",
+            "Export emission factor",
+        ]
+    }
+
     def create_carrier_parameter(key, par_mutable=False):
-        # Convert to dict/list for performance
-        ts = {}
-        for car in b_node.set_carriers:
-            ts[car] = {}
-            ts[car][key] = data["time_series"]["CarrierData"][car][key].to_list()
+        ts_key = ts[key]
 
         def init_carrier_parameter(para, t, car):
             """Rule initiating a carrier parameter"""
-            return ts[car][key][t - 1]
+            return ts_key[car][t - 1]
 
         parameter = pyo.Param(
-            set_t, b_node.set_carriers, rule=init_carrier_parameter, mutable=par_mutable
+            set_t,
+            b_node.set_carriers,
+            rule=init_carrier_parameter,
+            mutable=par_mutable,
+            within=pyo.Any,
         )
         return parameter
 
     def create_carbonprice_parameter(key):
-        # Convert to dict/list for performance
-        ts = data["time_series"]["CarbonCost"]["global"][key].to_list()
+        ts_key = data["time_series"]["CarbonCost"]["global"][key].to_numpy().tolist()
 
         def init_carbonprice_parameter(para, t):
             """Rule initiating a carrier parameter"""
-            return ts[t - 1]
+            return ts_key[t - 1]
 
-        parameter = pyo.Param(set_t, rule=init_carbonprice_parameter, mutable=False)
+        parameter = pyo.Param(
+            set_t, rule=init_carbonprice_parameter, mutable=False, within=pyo.Any
+        )
         return parameter
 
     if config["optimization"]["monte_carlo"]["N"]["value"] != 0:
@@ -197,14 +220,14 @@ def construct_node_block(b_node, data: dict, set_t_full, set_t_clustered):
 
     # VARIABLES
     def init_import_bounds(var, t, car):
-        return (0, b_node.para_import_limit[t, car])
+        return (0, ts["Import limit"][car][t - 1])
 
     b_node.var_import_flow = pyo.Var(
         set_t, b_node.set_carriers, bounds=init_import_bounds
     )
 
     def init_export_bounds(var, t, car):
-        return (0, b_node.para_export_limit[t, car])
+        return (0, ts["Export limit"][car][t - 1])
 
     b_node.var_export_flow = pyo.Var(
         set_t, b_node.set_carriers, bounds=init_export_bounds
@@ -237,12 +260,12 @@ def construct_node_block(b_node, data: dict, set_t_full, set_t_clustered):
     def init_generic_production(const, t, car):
         if data["energybalance_options"][car]["curtailment_possible"] == 0:
             return (
-                b_node.para_production_profile[t, car]
+                ts["Generic production"][car][t - 1]
                 == b_node.var_generic_production[t, car]
             )
         elif data["energybalance_options"][car]["curtailment_possible"] == 1:
             return (
-                b_node.para_production_profile[t, car]
+                ts["Generic production"][car][t - 1]
                 >= b_node.var_generic_production[t, car]
             )
 
@@ -252,10 +275,10 @@ def construct_node_block(b_node, data: dict, set_t_full, set_t_clustered):
 
     # Emission constraints
     def init_import_emissions_pos(const, t, car):
-        if b_node.para_import_emissionfactors[t, car] >= 0:
+        emission_factor = ts["Import emission factor"][car][t - 1]
+        if emission_factor >= 0:
             return (
-                b_node.var_import_flow[t, car]
-                * b_node.para_import_emissionfactors[t, car]
+                b_node.var_import_flow[t, car] * emission_factor
                 == b_node.var_import_emissions_pos[t, car]
             )
         else:
@@ -266,10 +289,10 @@ def construct_node_block(b_node, data: dict, set_t_full, set_t_clustered):
     )
 
     def init_export_emissions_pos(const, t, car):
-        if b_node.para_export_emissionfactors[t, car] >= 0:
+        emission_factor = ts["Export emission factor"][car][t - 1]
+        if emission_factor >= 0:
             return (
-                b_node.var_export_flow[t, car]
-                * b_node.para_export_emissionfactors[t, car]
+                b_node.var_export_flow[t, car] * emission_factor
                 == b_node.var_export_emissions_pos[t, car]
             )
         else:
@@ -280,10 +303,10 @@ def construct_node_block(b_node, data: dict, set_t_full, set_t_clustered):
     )
 
     def init_import_emissions_neg(const, t, car):
-        if b_node.para_import_emissionfactors[t, car] < 0:
+        emission_factor = ts["Import emission factor"][car][t - 1]
+        if emission_factor < 0:
             return (
-                b_node.var_import_flow[t, car]
-                * (-b_node.para_import_emissionfactors[t, car])
+                b_node.var_import_flow[t, car] * (-emission_factor)
                 == b_node.var_import_emissions_neg[t, car]
             )
         else:
@@ -294,10 +317,10 @@ def construct_node_block(b_node, data: dict, set_t_full, set_t_clustered):
     )
 
     def init_export_emissions_neg(const, t, car):
-        if b_node.para_export_emissionfactors[t, car] < 0:
+        emission_factor = ts["Export emission factor"][car][t - 1]
+        if emission_factor < 0:
             return (
-                b_node.var_export_flow[t, car]
-                * (-b_node.para_export_emissionfactors[t, car])
+                b_node.var_export_flow[t, car] * (-emission_factor)
                 == b_node.var_export_emissions_neg[t, car]
             )
         else:
@@ -1,7 +1,10 @@
 from ..components.utilities import perform_disjunct_relaxation
+from .profiling import profile
 
 
-def construct_technology_block(b_tec, data: dict, set_t_full, set_t_clustered):
+def construct_technology_block(
+    b_tec, data: dict, set_t_full, set_t_clustered, profiler=None
+):
     """
     Construct technology block and performs disjunct relaxation if required
 
@@ -9,12 +12,18 @@ def construct_technology_block(b_tec, data: dict, set_t_full, set_t_clustered):
     :param dict data: data containing model configuration
     :param set_t_full: pyomo set containing timesteps
     :param set_t_clustered: pyomo set containing clustered timesteps
+    :param ConstructionProfiler profiler: profiler recording the construction (None =
+        no profiling)
     :return: pyomo block with technology model
     """
     tec = b_tec.index()
     technology = data["technology_data"][tec]
-    b_tec = technology.construct_tech_model(b_tec, data, set_t_full, set_t_clustered)
+    with profile(profiler, b_tec, "technology", "construct_tech_model"):
+        b_tec = technology.construct_tech_model(
+            b_tec, data, set_t_full, set_t_clustered
+        )
     if technology.big_m_transformation_required:
-        b_tec = perform_disjunct_relaxation(b_tec)
+        with profile(profiler, b_tec, "technology", "perform_disjunct_relaxation"):
+            b_tec = perform_disjunct_relaxation(b_tec)
 
     return b_tec
@@ -0,0 +1,170 @@
+import json
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+
+import pandas as pd
+import pyomo.environ as pyo
+
+
+class ConstructionProfiler:
+    """
+    Records the construction of the model per phase and block
+
+    For each profiled phase (e.g. constructing a technology model or performing the
+    disjunct relaxation of a technology), the following is recorded:
+
+    - type: type of the block (period, node, technology, network, arc, balance)
+    - component: name of the block
+    - phase: construction step
+    - wall_time: wall time in s
+    - constraints: number of active constraints added
+    - variables: number of variables added
+    - memory: memory allocated and not released in MB (traced with tracemalloc)
+
+    Constraints and variables are counted in the block (including its sub-blocks)
+    before and after the phase. Records of networks include their arcs. Note that
+    counting and tracing the memory slow down the construction.
+    """
+
+    def __init__(self):
+        """
+        Constructor
+        """
+        self.records = []
+        self._started_tracing = False
+
+    def start(self):
+        """
+        Starts tracing the memory
+        """
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+
+    def stop(self):
+        """
+        Stops tracing the memory (if started by the profiler)
+        """
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def reset(self):
+        """
+        Deletes all records
+        """
+        self.records = []
+
+    @contextmanager
+    def profile(self, block, block_type: str, phase: str, component: str = None):
+        """
+        Profiles the construction step executed within the context
+
+        :param block: pyomo block the components are added to
+        :param str block_type: type of the block
+        :param str phase: construction step
+        :param str component: name of the block, if None, the name of the pyomo
+            block is used
+        """
+        constraints_start = _count_component_data(block, pyo.Constraint)
+        variables_start = _count_component_data(block, pyo.Var)
+        memory_start = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+
+        yield
+
+        wall_time = time.perf_counter() - start
+        memory = tracemalloc.get_traced_memory()[0] - memory_start
+
+        self.records.append(
+            {
+                "type": block_type,
+                "component": block.name if component is None else component,
+                "phase": phase,
+                "wall_time": wall_time,
+                "constraints": _count_component_data(block, pyo.Constraint)
+                - constraints_start,
+                "variables": _count_component_data(block, pyo.Var) - variables_start,
+                "memory": memory / 1e6,
+            }
+        )
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """
+        Returns all records as a data frame
+
+        :return: data frame with a row per record
+        :rtype: pd.DataFrame
+        """
+        return pd.DataFrame(
+            self.records,
+            columns=[
+                "type",
+                "component",
+                "phase",
+                "wall_time",
+                "constraints",
+                "variables",
+                "memory",
+            ],
+        )
+
+    def summarize(self) -> pd.DataFrame:
+        """
+        Sums up all records per type and phase
+
+        :return: data frame with a row per type and phase
+        :rtype: pd.DataFrame
+        """
+        return (
+            self.to_dataframe()
+            .drop(columns="component")
+            .groupby(["type", "phase"], sort=False)
+            .sum()
+        )
+
+    def write(self, save_path: Path | str):
+        """
+        Writes all records to construction_profile.csv and construction_profile.json
+
+        :param Path, str save_path: folder to write to
+        """
+        save_path = Path(save_path)
+        self.to_dataframe().to_csv(save_path / "construction_profile.csv", index=False)
+        with open(save_path / "construction_profile.json", "w") as file:
+            json.dump(self.records, file, indent=4)
+
+
+def profile(profiler, block, block_type: str, phase: str, component: str = None):
+    """
+    Returns a context profiling a construction step, if a profiler is given
+
+    :param ConstructionProfiler profiler: profiler (None = no profiling)
+    :param block: pyomo block the components are added to
+    :param str block_type: type of the block
+    :param str phase: construction step
+    :param str component: name of the block
+    :return: context manager
+    """
+    if profiler is None:
+        return nullcontext()
+    return profiler.profile(block, block_type, phase, component)
+
+
+def _count_component_data(block, ctype) -> int:
+    """
+    Counts the component data of a type in a block (including all sub-blocks)
+
+    Only active constraints are counted.
+
+    :param block: pyomo block
+    :param ctype: pyomo component type (pyo.Constraint or pyo.Var)
+    :return: number of component data
+    :rtype: int
+    """
+    active = True if ctype is pyo.Constraint else None
+    return sum(
+        1 for _ in block.component_data_objects(ctype, active=active, descend_into=True)
+    )
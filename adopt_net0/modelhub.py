@@ -13,7 +13,11 @@ from .utilities import get_set_t
 from .data_management import DataHandle, read_tec_data
 from .model_construction import *
 from .result_management.read_results import add_values_to_summary
-from .utilities import get_glpk_parameters, get_gurobi_parameters
+from .utilities import (
+    get_glpk_parameters,
+    get_gurobi_parameters,
+    get_config_option,
+)
 from .result_management import *
 from .components.utilities import (
     annualize,
@@ -41,6 +45,8 @@ class ModelHub:
     - self.info_pareto: Current pareto point (if used)
     - self.info_solving_algorithms: Information on time aggregation algorithms
     - self.info_monte_carlo: Information on monte carlo runs
+    - self.construction_profiler: Records of the model construction per phase and
+      block (if profile_construction is turned on in the model configuration)
     """
 
     def __init__(self):
@@ -60,6 +66,7 @@ class ModelHub:
         self.info_solving_algorithms["time_stage"] = 1
         self.info_monte_carlo = {}
         self.info_monte_carlo["monte_carlo_run"] = -1
+        self.construction_profiler = None
 
     def read_data(
         self, data_path: Path | str, start_period: int = None, end_period: int = None
@@ -89,6 +96,7 @@ class ModelHub:
         - Save path must exist
         - monte carlo and pareto cannot be used at the same time
         - dynamics checks
+        - no ramping constraints for typical days with segments
         :return:
         """
         config = self.data.model_config
@@ -115,6 +123,10 @@ class ModelHub:
                 raise Exception(
                     "Dynamics and clustering with typical days is not " "allowed"
                 )
+            nr_segments = get_config_option(
+                config, ["optimization", "typicaldays", "segments"], 0
+            )
+            segmentation = 0 < nr_segments < topology["hours_per_day"]["full"]
             for period in topology["investment_periods"]:
                 for node in topology["nodes"]:
                     for tec_name in self.data.technology_data[period][node]:
@@ -126,6 +138,18 @@ class ModelHub:
                                 f"Ramping constraint with integers (ramping_const_int) for technology {tec_name} "
                                 f"needs to be -1 when clustering with typical days"
                             )
+                        # Segments have different durations, ramping rates are
+                        # defined per time step
+                        if (
+                            segmentation
+                            and ("ramping_time" in tec.processed_coeff.dynamics)
+                            and (tec.processed_coeff.dynamics["ramping_time"] != -1)
+                        ):
+                            raise Exception(
+                                f"Ramping Rate for technology {tec_name} "
+                                f"needs to be -1 when typical days are divided into "
+                                f"segments"
+                            )
 
         if config["optimization"]["timestaging"]["value"] != 0:
             if config["performance"]["dynamics"]["value"]:
@@ -247,6 +271,9 @@ class ModelHub:
         model.var_npv = pyo.Var()
         model.var_emissions_net = pyo.Var()
 
+        # Profiling (used by the rules below)
+        profiler = self._start_construction_profiling(reset=True)
+
         # INVESTMENT PERIOD BLOCK
         def init_period_block(b_period):
             """Pyomo rule to initialize a block holding all investment periods"""
@@ -257,7 +284,10 @@ class ModelHub:
                 self.data, investment_period, aggregation_data
             )
             # Add sets, parameters, variables, constraints to block
-            b_period = construct_investment_period_block(b_period, data_period)
+            with profile(
+                profiler, b_period, "period", "construct_investment_period_block"
+            ):
+                b_period = construct_investment_period_block(b_period, data_period)
 
             # NETWORK BLOCK
             if not config["energybalance"]["copperplate"]["value"]:
@@ -271,6 +301,7 @@ class ModelHub:
                         model.set_nodes,
                         b_period.set_t_full,
                         b_period.set_t_clustered,
+                        profiler,
                     )
 
                     return b_netw
@@ -286,14 +317,19 @@ class ModelHub:
                 data_node = get_data_for_node(data_period, node)
 
                 # Add sets, parameters, variables, constraints to block
-                b_node = construct_node_block(
-                    b_node, data_node, b_period.set_t_full, b_period.set_t_clustered
-                )
+                with profile(profiler, b_node, "node", "construct_node_block"):
+                    b_node = construct_node_block(
+                        b_node, data_node, b_period.set_t_full, b_period.set_t_clustered
+                    )
 
                 # TECHNOLOGY BLOCK
                 def init_technology_block(b_tec, tec):
                     b_tec = construct_technology_block(
-                        b_tec, data_node, b_period.set_t_full, b_period.set_t_clustered
+                        b_tec,
+                        data_node,
+                        b_period.set_t_full,
+                        b_period.set_t_clustered,
+                        profiler,
                     )
 
                     return b_tec
@@ -308,7 +344,11 @@ class ModelHub:
 
             return b_period
 
-        model.periods = pyo.Block(model.set_periods, rule=init_period_block)
+        try:
+            model.periods = pyo.Block(model.set_periods, rule=init_period_block)
+        finally:
+            if profiler is not None:
+                profiler.stop()
 
         log_msg = f"Constructing model completed in {str(round(time.time() - start))}s"
         log.info(log_msg)
@@ -327,21 +367,69 @@ class ModelHub:
 
         model = delete_all_balances(model)
 
-        if not config["energybalance"]["copperplate"]["value"]:
-            model = construct_network_constraints(model, config)
-            model = construct_nodal_energybalance(model, config)
-        else:
-            model = construct_global_energybalance(model, config)
+        profiler = self._start_construction_profiling()
 
-        model = construct_emission_balance(model, data)
-        model = construct_system_cost(model, data)
-        model = construct_global_balance(model)
+        try:
+            if not config["energybalance"]["copperplate"]["value"]:
+                with profile(
+                    profiler, model, "balance", "construct_network_constraints", "model"
+                ):
+                    model = construct_network_constraints(model, config)
+                with profile(
+                    profiler, model, "balance", "construct_nodal_energybalance", "model"
+                ):
+                    model = construct_nodal_energybalance(model, config)
+            else:
+                with profile(
+                    profiler,
+                    model,
+                    "balance",
+                    "construct_global_energybalance",
+                    "model",
+                ):
+                    model = construct_global_energybalance(model, config)
+
+            with profile(
+                profiler, model, "balance", "construct_emission_balance", "model"
+            ):
+                model = construct_emission_balance(model, data)
+            with profile(profiler, model, "balance", "construct_system_cost", "model"):
+                model = construct_system_cost(model, data)
+            with profile(
+                profiler, model, "balance", "construct_global_balance", "model"
+            ):
+                model = construct_global_balance(model)
+        finally:
+            if profiler is not None:
+                profiler.stop()
 
         log_msg = (
             f"Constructing balances completed in {str(round(time.time() - start))}s"
         )
         log.warning(log_msg)
 
+    def _start_construction_profiling(self, reset: bool = False):
+        """
+        Starts profiling the model construction, if profile_construction is turned on
+        in the model configuration
+
+        :param bool reset: delete records of previous constructions
+        :return: construction profiler (None if profiling is turned off)
+        """
+        profile_construction = get_config_option(
+            self.data.model_config, ["reporting", "profile_construction"], 0
+        )
+        if not profile_construction:
+            return None
+
+        if self.construction_profiler is None:
+            self.construction_profiler = ConstructionProfiler()
+        elif reset:
+            self.construction_profiler.reset()
+        self.construction_profiler.start()
+
+        return self.construction_profiler
+
     def solve(self):
         """
         Defines objective and solves model
@@ -898,6 +986,12 @@ class ModelHub:
         if config["reporting"]["write_solution_diagnostics"]["value"] >= 1:
             self._write_solution_diagnostics(result_folder_path)
 
+        if (
+            get_config_option(config, ["reporting", "profile_construction"], 0) >= 2
+            and self.construction_profiler is not None
+        ):
+            self.construction_profiler.write(result_folder_path)
+
         self.solution.write()
 
         self.last_solve_info["pareto_point"] = self.info_pareto["pareto_point"]
@@ -2,8 +2,9 @@ import h5py
 from pathlib import Path
 import os
 
+import pyomo.environ as pyo
 from pyomo.environ import ConcreteModel
-from ..utilities import get_set_t
+from ..utilities import get_set_t, get_carrier_technology_incidence
 
 import logging
 
@@ -250,6 +251,10 @@ def write_optimization_results_to_h5(model, solution, model_info: dict, data) ->
         for period in model.set_periods:
             g_period_ebalance = ebalance_group.create_group(period)
 
+            b_period = model.periods[period]
+            set_t = get_set_t(config, b_period)
+            incidence = get_carrier_technology_incidence(b_period)
+
             for node_name in model.set_nodes:
                 node_specific_group = g_period_ebalance.create_group(node_name)
                 b_node = b_period.node_blocks[node_name]
@@ -258,12 +263,11 @@ def write_optimization_results_to_h5(model, solution, model_info: dict, data) ->
                     car_group = node_specific_group.create_group(car)
                     node_data = b_node
 
+                    tecs = incidence[node_name][car]
                     technology_inputs = [
                         sum(
-                            node_data.tech_blocks_active[tec].var_input[t, car].value
-                            for tec in node_data.set_technologies
-                            if car
-                            in node_data.tech_blocks_active[tec].set_input_carriers
+                            pyo.value(b_tec.var_input_tot[t, car], exception=False)
+                            for b_tec in tecs["input"]
                         )
                         for t in set_t
                     ]
@@ -272,10 +276,8 @@ def write_optimization_results_to_h5(model, solution, model_info: dict, data) ->
                     )
                     technology_outputs = [
                         sum(
-                            node_data.tech_blocks_active[tec].var_output[t, car].value
-                            for tec in node_data.set_technologies
-                            if car
-                            in node_data.tech_blocks_active[tec].set_output_carriers
+                            pyo.value(b_tec.var_output_tot[t, car], exception=False)
+                            for b_tec in tecs["output"]
                         )
                         for t in set_t
                     ]
@@ -289,24 +291,27 @@ def write_optimization_results_to_h5(model, solution, model_info: dict, data) ->
                             for t in set_t
                         ],
                     )
-                    car_group.create_dataset(
-                        "network_inflow",
-                        data=[
-                            0 if x is None else x
-                            for x in [
-                                node_data.var_netw_inflow[t, car].value for t in set_t
-                            ]
-                        ],
-                    )
-                    car_group.create_dataset(
-                        "network_outflow",
-                        data=[
-                            0 if x is None else x
-                            for x in [
-                                node_data.var_netw_outflow[t, car].value for t in set_t
-                            ]
-                        ],
-                    )
+                    if hasattr(node_data, "var_netw_inflow"):
+                        car_group.create_dataset(
+                            "network_inflow",
+                            data=[
+                                0 if x is None else x
+                                for x in [
+                                    node_data.var_netw_inflow[t, car].value
+                                    for t in set_t
+                                ]
+                            ],
+                        )
+                        car_group.create_dataset(
+                            "network_outflow",
+                            data=[
+                                0 if x is None else x
+                                for x in [
+                                    node_data.var_netw_outflow[t, car].value
+                                    for t in set_t
+                                ]
+                            ],
+                        )
                     if hasattr(node_data, "var_netw_consumption"):
                         network_consumption = [
                             node_data.var_netw_consumption[t, car].value for t in set_t
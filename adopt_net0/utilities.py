@@ -1,4 +1,12 @@
-from pyomo.environ import SolverFactory
+import os
+import json
+from functools import lru_cache
+import numpy as np
+from pathlib import Path
+from pyomo.environ import SolverFactory, quicksum
+from pyomo.common.numeric_types import native_numeric_types
+from pyomo.core.expr import LinearExpression
+from pyomo.repn import generate_standard_repn
 
 
 def get_gurobi_parameters(solveroptions: dict):
@@ -57,7 +65,7 @@ def get_set_t(config: dict, model_block):
         return model_block.set_t_full
 
 
-def get_hour_factors(config: dict, data, period: str) -> list:
+def get_hour_factors(config: dict, data, period: str) -> np.ndarray:
     """
     Returns the correct hour factors to use for global balances
 
@@ -66,11 +74,11 @@ def get_hour_factors(config: dict, data, period: str) -> list:
     :return: hour factors
     """
     if config["optimization"]["typicaldays"]["N"]["value"] == 0:
-        return [1] * len(data.topology["time_index"]["full"])
+        return np.ones(len(data.topology["time_index"]["full"]))
     elif config["optimization"]["typicaldays"]["method"]["value"] == 1:
-        return data.k_means_specs[period]["factors"]
+        return np.asarray(data.k_means_specs[period]["factors"], dtype=float)
     elif config["optimization"]["typicaldays"]["method"]["value"] == 2:
-        return [1] * len(data.topology["time_index"]["full"])
+        return np.ones(len(data.topology["time_index"]["full"]))
 
 
 def get_nr_timesteps_averaged(config: dict) -> int:
@@ -86,3 +94,260 @@ def get_nr_timesteps_averaged(config: dict) -> int:
         nr_timesteps_averaged = 1
 
     return nr_timesteps_averaged
+
+
+def get_timestep_weights(config: dict, data, period: str, set_t) -> np.ndarray:
+    """
+    Returns the weight of each time step in balances over an investment period
+
+    The weight is the hour factor of the time step multiplied with the number of
+    timesteps averaged.
+
+    :param dict config: config dict
+    :param data: DataHandle
+    :param str period: investment period
+    :param set_t: time steps to return the weights for
+    :return: weights in the order of set_t
+    :rtype: np.ndarray
+    """
+    hour_factors = get_hour_factors(config, data, period)
+    nr_timesteps_averaged = get_nr_timesteps_averaged(config)
+    return nr_timesteps_averaged * hour_factors[[t - 1 for t in set_t]]
+
+
+def get_carrier_technology_incidence(b_period) -> dict:
+    """
+    Returns the technology blocks having a carrier as an input or output per node
+
+    The map is structured as node > carrier > "input"/"output" > list of technology
+    blocks. It contains all carriers of a node, technologies are considered with
+    their input and output carriers including CCS (set_input_carriers_all,
+    set_output_carriers_all). Carriers of a technology that are not carriers of
+    the node (e.g. CO2captured without a CO2 sink at the node) are skipped, as they
+    do not appear in the balances of the node.
+
+    :param b_period: pyomo block of an investment period holding the node blocks
+    :return: incidence map
+    :rtype: dict
+    """
+    incidence = {}
+    for node, b_node in b_period.node_blocks.items():
+        node_incidence = {
+            car: {"input": [], "output": []} for car in b_node.set_carriers
+        }
+        for tec in b_node.set_technologies:
+            b_tec = b_node.tech_blocks_active[tec]
+            for car in b_tec.set_input_carriers_all:
+                if car in node_incidence:
+                    node_incidence[car]["input"].append(b_tec)
+            for car in b_tec.set_output_carriers_all:
+                if car in node_incidence:
+                    node_incidence[car]["output"].append(b_tec)
+        incidence[node] = node_incidence
+
+    return incidence
+
+
+def build_linear_expression(linear_coefs: list, linear_vars: list):
+    """
+    Returns the sum of the products of coefficients and variables
+
+    The sum is built as a flat linear expression. Terms that are not variables (e.g.
+    aggregated technology quantities in lean models, which are expressions) are
+    expanded into their linear terms and constant. Terms that are not linear are
+    added to the linear expression as they are.
+
+    :param list linear_coefs: coefficients
+    :param list linear_vars: variables (or expressions)
+    :return: pyomo expression
+    """
+    coefs = []
+    variables = []
+    constant = 0
+    nonlinear_terms = []
+    for coef, var in zip(linear_coefs, linear_vars):
+        if var.is_variable_type():
+            coefs.append(coef)
+            variables.append(var)
+            continue
+
+        repn = generate_standard_repn(var, compute_values=False, quadratic=False)
+        if not repn.is_linear():
+            nonlinear_terms.append(coef * var)
+            continue
+        coefs.extend(coef * term_coef for term_coef in repn.linear_coefs)
+        variables.extend(repn.linear_vars)
+        if not (type(repn.constant) in native_numeric_types and repn.constant == 0):
+            constant = constant + coef * repn.constant
+
+    expr = LinearExpression(
+        constant=constant, linear_coefs=coefs, linear_vars=variables
+    )
+    if nonlinear_terms:
+        expr = expr + quicksum(nonlinear_terms)
+
+    return expr
+
+
+def is_lower_bound_implied(expr, lower_bound) -> bool:
+    """
+    Returns if a lower bound on an expression is implied by the bounds of its
+    variables
+
+    This is the case for linear expressions with non-negative coefficients on
+    variables with a non-negative lower bound and a constant that is not below the
+    lower bound (e.g. a sum of non-negative variables is non-negative).
+
+    :param expr: pyomo expression
+    :param lower_bound: lower bound on the expression (None: no bound)
+    :return: True if the lower bound is implied
+    :rtype: bool
+    """
+    if lower_bound is None:
+        return True
+
+    repn = generate_standard_repn(expr, compute_values=False, quadratic=False)
+    if not repn.is_linear():
+        return False
+    if type(repn.constant) not in native_numeric_types:
+        return False
+    if repn.constant < lower_bound:
+        return False
+    for coef, var in zip(repn.linear_coefs, repn.linear_vars):
+        if type(coef) not in native_numeric_types or coef < 0:
+            return False
+        if var.lb is None or var.lb < 0:
+            return False
+
+    return True
+
+
+def get_config_option(config: dict, keys: list, default=None):
+    """
+    Returns the value of a configuration setting
+
+    Settings that have been added in later versions might not be contained in
+    existing ConfigModel.json files. In this case, the default value is returned.
+
+    :param dict config: config dict
+    :param list keys: list of keys leading to the setting, e.g. ["datahandling",
+        "read_workers"]
+    :param default: value to return if the setting is not contained in the config
+    :return: value of the setting
+    """
+    setting = config
+    for key in keys:
+        if not isinstance(setting, dict) or key not in setting:
+            return default
+        setting = setting[key]
+
+    return setting["value"]
+
+
+class JsonCatalogue:
+    """
+    Catalogue of json files in directory trees
+
+    Each directory tree (load path) is walked only once. The resulting index maps file
+    names to file paths. If the same name occurs multiple times in a tree, the file
+    found first by os.walk is used. The content of recently read files is kept in a
+    LRU cache, which is invalidated if a file is modified.
+
+    :param int cache_size: number of json files kept in the cache
+    """
+
+    def __init__(self, cache_size: int = 256):
+        """
+        Constructor
+        """
+        self.indices = {}
+        self._read_file = lru_cache(maxsize=cache_size)(self._read_file_uncached)
+
+    def find(self, name: str, load_path: Path | str, case_sensitive: bool = True):
+        """
+        Returns the path of the json file name + ".json" in load_path or its
+        subdirectories
+
+        :param str name: name of the json file (without .json)
+        :param Path | str load_path: directory to search
+        :param bool case_sensitive: if False, the file name is matched case
+            insensitive
+        :return: path of the json file or None if it does not exist
+        :rtype: Path | None
+        """
+        file_name = name + ".json"
+        if not case_sensitive:
+            file_name = file_name.lower()
+
+        for rebuild in [False, True]:
+            index = self._get_index(load_path, rebuild)
+            index = index["case_sensitive"] if case_sensitive else index["lower"]
+            if file_name in index and os.path.isfile(index[file_name]):
+                return index[file_name]
+
+        return None
+
+    def load(self, name: str, load_path: Path | str) -> dict | None:
+        """
+        Returns the content of the json file name + ".json" in load_path or its
+        subdirectories
+
+        :param str name: name of the json file (without .json)
+        :param Path | str load_path: directory to search
+        :return: dictionary containing the json data or None if it does not exist
+        :rtype: dict | None
+        """
+        file_path = self.find(name, load_path)
+        if file_path is None:
+            return None
+
+        stat = os.stat(file_path)
+        return json.loads(self._read_file(file_path, stat.st_mtime_ns, stat.st_size))
+
+    def clear(self):
+        """
+        Clears all indices and cached files
+        """
+        self.indices = {}
+        self._read_file.cache_clear()
+
+    def _get_index(self, load_path: Path | str, rebuild: bool = False) -> dict:
+        """
+        Returns the index of load_path and walks load_path if the index does not
+        exist yet
+
+        :param Path | str load_path: directory to index
+        :param bool rebuild: if True, load_path is walked again
+        :return: dict with a case-sensitive and a lower case index
+        :rtype: dict
+        """
+        load_path = Path(load_path).resolve()
+
+        if rebuild or load_path not in self.indices:
+            index = {"case_sensitive": {}, "lower": {}}
+            for path, subdirs, files in os.walk(load_path):
+                for name in files:
+                    if name.lower().endswith(".json"):
+                        file_path = Path(path) / name
+                        index["case_sensitive"].setdefault(name, file_path)
+                        index["lower"].setdefault(name.lower(), file_path)
+            self.indices[load_path] = index
+
+        return self.indices[load_path]
+
+    @staticmethod
+    def _read_file_uncached(file_path: Path, mtime: int, size: int) -> str:
+        """
+        Reads a file. Modification time and size are only used as cache key.
+
+        :param Path file_path: path of the file
+        :param int mtime: modification time of the file
+        :param int size: size of the file
+        :return: file content
+        :rtype: str
+        """
+        with open(file_path) as json_file:
+            return json_file.read()
+
+
+json_catalogue = JsonCatalogue()
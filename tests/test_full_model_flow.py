@@ -1,9 +1,17 @@
+import json
+import shutil
+import tracemalloc
 from pathlib import Path
 from warnings import warn
 
+import h5py
+import pytest
+from pyomo.core.expr import LinearExpression
+from pyomo.environ import Constraint, Expression, Var, value
 from pyomo.opt import TerminationCondition
 
 from adopt_net0.modelhub import ModelHub
+from adopt_net0.utilities import is_lower_bound_implied
 
 
 def test_full_model_flow(request):
@@ -90,6 +98,234 @@ def test_full_model_flow(request):
     )
 
 
+def test_construction_profiling(request):
+    """
+    Tests profiling of the model construction
+
+    - each technology, node, network, arc and balance is recorded
+    - all constraints and variables (except the global ones) are recorded
+    - records are written to the results folder
+    """
+    path = Path("tests/case_study_full_pipeline")
+
+    pyhub = ModelHub()
+    pyhub.read_data(path, start_period=0, end_period=1)
+    pyhub.data.model_config["reporting"]["profile_construction"]["value"] = 2
+    pyhub.data.model_config["solveroptions"]["solver"]["value"] = request.config.solver
+    pyhub.quick_solve()
+
+    m = pyhub.model["full"]
+    profile = pyhub.construction_profiler.to_dataframe()
+
+    assert set(profile["type"]) == {
+        "period",
+        "node",
+        "technology",
+        "network",
+        "arc",
+        "balance",
+    }
+    assert (profile["type"] == "technology").sum() == 3
+    assert (profile["type"] == "arc").sum() == 2
+    not_arc = profile["type"] != "arc"
+    assert profile.loc[not_arc, "constraints"].sum() == sum(
+        1 for _ in m.component_data_objects(Constraint, active=True)
+    )
+    assert (
+        profile.loc[not_arc, "variables"].sum()
+        == sum(1 for _ in m.component_data_objects(Var)) - 2
+    )
+
+    result_folder_path = pyhub.last_solve_info["result_folder_path"]
+    assert (result_folder_path / "construction_profile.csv").exists()
+    assert (result_folder_path / "construction_profile.json").exists()
+
+
+def test_construction_profiling_error(monkeypatch):
+    """
+    Tests that tracing the memory is stopped if the construction fails
+    """
+    path = Path("tests/case_study_full_pipeline")
+
+    pyhub = ModelHub()
+    pyhub.read_data(path, start_period=0, end_period=1)
+    pyhub.data.model_config["reporting"]["profile_construction"]["value"] = 2
+    pyhub.construct_model()
+    assert not tracemalloc.is_tracing()
+
+    def fail(model):
+        raise RuntimeError("construction failed")
+
+    monkeypatch.setattr("adopt_net0.modelhub.construct_global_balance", fail)
+    with pytest.raises(RuntimeError, match="construction failed"):
+        pyhub.construct_balances()
+    assert not tracemalloc.is_tracing()
+
+
+def test_copperplate_energybalance(request):
+    """
+    Tests the global energy balance (copperplate) with the small case study
+
+    - only technologies having a carrier are contained in its balance
+    - the model is solved to optimality
+    - the heat demand at node2 is covered by the electric boiler
+    """
+    path = Path("tests/case_study_full_pipeline")
+
+    pyhub = ModelHub()
+    pyhub.read_data(path, start_period=0, end_period=1)
+    pyhub.data.model_config["energybalance"]["copperplate"]["value"] = 1
+    pyhub.data.model_config["solveroptions"]["solver"]["value"] = request.config.solver
+    pyhub.quick_solve()
+
+    m = pyhub.model["full"]
+    p = m.periods["period1"]
+
+    assert pyhub.solution.solver.termination_condition == TerminationCondition.optimal
+    assert "TestTec_BoilerEl" not in str(
+        m.block_energybalance["period1"].const_energybalance[1, "gas"].body
+    )
+
+    tec_block = p.node_blocks["node2"].tech_blocks_active["TestTec_BoilerEl"]
+    assert round(tec_block.var_output[1, "heat"].value, 3) == 1
+
+
+def test_ccs_without_co2_sink(request, tmp_path):
+    """
+    Tests a technology with CCS at a node that has no CO2captured carrier
+
+    The carriers of the CCS unit (CO2captured) are no carriers of the node and are
+    not contained in its balances. The model is constructed and solved to
+    optimality and the energy balance results contain the inputs of the CCS unit.
+    """
+    path = tmp_path / "case_study"
+    shutil.copytree(Path("tests/case_study_full_pipeline"), path)
+    node_path = path / "period1" / "node_data" / "node1"
+    for tec in ["TestTec_Conv1_ccs", "Test_tec_CCS_MEA"]:
+        shutil.copy(
+            Path("tests/technology_data") / (tec + ".json"),
+            node_path / "technology_data",
+        )
+    with open(node_path / "Technologies.json", "r") as json_file:
+        technologies = json.load(json_file)
+    technologies["new"].append("TestTec_Conv1_ccs")
+    with open(node_path / "Technologies.json", "w") as json_file:
+        json.dump(technologies, json_file, indent=4)
+
+    pyhub = ModelHub()
+    pyhub.read_data(path, start_period=0, end_period=1)
+    pyhub.data.model_config["solveroptions"]["solver"]["value"] = request.config.solver
+    pyhub.quick_solve()
+
+    b_node = pyhub.model["full"].periods["period1"].node_blocks["node1"]
+    assert "CO2captured" not in b_node.set_carriers
+    assert (
+        "CO2captured"
+        in b_node.tech_blocks_active["TestTec_Conv1_ccs"].set_output_carriers_all
+    )
+    assert pyhub.solution.solver.termination_condition == TerminationCondition.optimal
+
+    # Energy balance results contain the aggregated flows including CCS
+    tec_block = b_node.tech_blocks_active["TestTec_Conv1_ccs"]
+    tec_block.var_input_tot[1, "electricity"].value = 2.5
+    pyhub.write_results()
+    h5_path = pyhub.last_solve_info["result_folder_path"] / "optimization_results.h5"
+    with h5py.File(h5_path, "r") as hdf_file:
+        ebalance = hdf_file["operation/energy_balance/period1/node1/electricity"]
+        assert round(ebalance["technology_inputs"][0], 3) == 2.5
+
+
+def test_segments_ramping(tmp_path):
+    """
+    Tests that ramping constraints are not allowed for typical days with segments
+    """
+    path = tmp_path / "case_study"
+    shutil.copytree(Path("tests/case_study_full_pipeline"), path)
+    with open(path / "ConfigModel.json", "r") as json_file:
+        config = json.load(json_file)
+    config["optimization"]["typicaldays"]["N"]["value"] = 1
+    config["optimization"]["typicaldays"]["segments"]["value"] = 4
+    with open(path / "ConfigModel.json", "w") as json_file:
+        json.dump(config, json_file, indent=4)
+    tec_path = (
+        path
+        / "period1"
+        / "node_data"
+        / "node2"
+        / "technology_data"
+        / "TestTec_BoilerEl.json"
+    )
+    with open(tec_path, "r") as json_file:
+        tec = json.load(json_file)
+    tec["Performance"]["ramping_time"] = 2
+    with open(tec_path, "w") as json_file:
+        json.dump(tec, json_file, indent=4)
+
+    pyhub = ModelHub()
+    with pytest.raises(Exception, match="segments"):
+        pyhub.read_data(path, start_period=0, end_period=24)
+
+
+def test_lean_model(request):
+    """
+    Tests the lean model with the small case study
+
+    - aggregated technology quantities are expressions, the domain of the
+      variables in the full model is kept with constraints where it is not implied
+      by the bounds of the variables
+    - the energy balance is a flat linear expression
+    - the lean model has fewer constraints and variables
+    - objective and technology output are the same as for the full model
+    """
+    path = Path("tests/case_study_full_pipeline")
+
+    results = {}
+    for lean_model in [0, 1]:
+        pyhub = ModelHub()
+        pyhub.read_data(path, start_period=0, end_period=1)
+        pyhub.data.model_config["optimization"]["lean_model"]["value"] = lean_model
+        pyhub.data.model_config["solveroptions"]["solver"][
+            "value"
+        ] = request.config.solver
+        pyhub.quick_solve()
+
+        m = pyhub.model["full"]
+        tec_block = (
+            m.periods["period1"]
+            .node_blocks["node2"]
+            .tech_blocks_active["TestTec_BoilerEl"]
+        )
+        results[lean_model] = {
+            "constraints": sum(
+                1 for _ in m.component_data_objects(Constraint, active=True)
+            ),
+            "variables": sum(1 for _ in m.component_data_objects(Var)),
+            "objective": value(m.objective),
+            "output": value(tec_block.var_output_tot[1, "heat"]),
+            "output_type": tec_block.var_output_tot.ctype,
+            "balance_type": type(
+                m.block_energybalance["period1"]
+                .const_energybalance[1, "heat", "node2"]
+                .body
+            ),
+            "output_bound_rows": len(tec_block.const_output_aggregation),
+        }
+
+    assert results[0]["output_type"] is Var
+    assert results[1]["output_type"] is Expression
+    assert results[1]["output_bound_rows"] == 0
+    assert is_lower_bound_implied(tec_block.var_output_tot[1, "heat"], 0)
+    assert not is_lower_bound_implied(
+        tec_block.var_output_tot[1, "heat"] - tec_block.var_size, 0
+    )
+    assert not is_lower_bound_implied(tec_block.var_output_tot[1, "heat"] - 1, 0)
+    assert results[1]["balance_type"] is LinearExpression
+    assert results[1]["constraints"] < results[0]["constraints"]
+    assert results[1]["variables"] < results[0]["variables"]
+    assert round(results[1]["objective"], 3) == round(results[0]["objective"], 3)
+    assert round(results[1]["output"], 3) == round(results[0]["output"], 3) == 1
+
+
 def test_clustering_algo(request):
     """
     Tests method 1 and two of the clustering algorithm
@@ -1,6 +1,23 @@
 import pytest
+import shutil
+import copy
+from pathlib import Path
+import pandas as pd
+import numpy as np
 
 from adopt_net0.data_management import DataHandle
+from adopt_net0.data_management.utilities import (
+    average_time_series,
+    get_technology_fingerprint,
+    read_tec_data,
+)
+from adopt_net0.diagnostics.clustering_benchmark import (
+    ERROR_METRICS,
+    benchmark_clustering,
+    recommend_nr_typical_days,
+)
+from adopt_net0.utilities import JsonCatalogue
+from tests.utilities import save_json, load_json
 
 
 def test_data_handle_reading(request):
@@ -12,3 +29,501 @@ def test_data_handle_reading(request):
 
     dh = DataHandle()
     dh.set_settings(case_study_folder_path)
+
+
+def test_read_time_series_parallel():
+    """
+    Tests that reading the time series with multiple threads gives the same data
+    frame as reading them serially
+    """
+    path = Path("tests/case_study_full_pipeline")
+
+    dh = DataHandle()
+    dh.set_settings(path)
+    dh._read_topology()
+    dh._read_model_config()
+
+    dh.model_config["datahandling"]["read_workers"]["value"] = 1
+    dh._read_time_series()
+    time_series_serial = dh.time_series["full"]
+
+    dh.model_config["datahandling"]["read_workers"]["value"] = 4
+    dh._read_time_series()
+    time_series_parallel = dh.time_series["full"]
+
+    pd.testing.assert_frame_equal(time_series_serial, time_series_parallel)
+
+
+def test_fit_technologies_parallel():
+    """
+    Tests that fitting the technologies with multiple processes gives the same
+    coefficients as fitting them serially
+    """
+    path = Path("tests/case_study_full_pipeline")
+
+    dh = DataHandle()
+    dh.set_settings(path, start_period=0, end_period=24)
+    dh._read_topology()
+    dh._read_model_config()
+    dh._read_time_series()
+    dh._read_node_locations()
+
+    dh.model_config["datahandling"]["fitting_workers"]["value"] = 1
+    dh._read_technology_data()
+    technology_data_serial = dh.technology_data
+
+    dh.model_config["datahandling"]["fitting_workers"]["value"] = 2
+    dh._read_technology_data()
+    technology_data_parallel = dh.technology_data
+
+    for period in technology_data_serial:
+        for node in technology_data_serial[period]:
+            assert list(technology_data_serial[period][node]) == list(
+                technology_data_parallel[period][node]
+            )
+            for tec in technology_data_serial[period][node]:
+                coeff_serial = technology_data_serial[period][node][tec].processed_coeff
+                coeff_parallel = technology_data_parallel[period][node][
+                    tec
+                ].processed_coeff
+                assert (
+                    coeff_serial.time_independent.keys()
+                    == coeff_parallel.time_independent.keys()
+                )
+                for par in coeff_serial.time_dependent_full:
+                    pd.testing.assert_series_equal(
+                        pd.Series(coeff_serial.time_dependent_full[par]).reset_index(
+                            drop=True
+                        ),
+                        pd.Series(coeff_parallel.time_dependent_full[par]).reset_index(
+                            drop=True
+                        ),
+                    )
+
+
+def test_cluster_data_parallel(tmp_path):
+    """
+    Tests that clustering the investment periods with multiple processes gives the
+    same results as doing it serially
+    """
+    path = tmp_path / "case_study"
+    shutil.copytree(Path("tests/case_study_full_pipeline"), path)
+    shutil.copytree(path / "period1", path / "period2")
+    topology = load_json(path / "Topology.json")
+    topology["investment_periods"] = ["period1", "period2"]
+    save_json(topology, path / "Topology.json")
+
+    dh = DataHandle()
+    dh.set_settings(path)
+    dh.read_data()
+    dh.model_config["optimization"]["typicaldays"]["N"]["value"] = 1
+
+    results = {}
+    for nr_workers in [1, 2]:
+        dh.model_config["datahandling"]["aggregation_workers"]["value"] = nr_workers
+        dh._cluster_data()
+        results[nr_workers] = {
+            "k_means_specs": copy.deepcopy(dh.k_means_specs),
+            "clustered": dh.time_series["clustered"].copy(),
+        }
+
+    assert list(results[2]["k_means_specs"]) == ["period1", "period2"]
+    for period in results[1]["k_means_specs"]:
+        for key in ["sequence", "factors"]:
+            assert (
+                results[1]["k_means_specs"][period][key]
+                == results[2]["k_means_specs"][period][key]
+            ).all()
+    pd.testing.assert_frame_equal(results[1]["clustered"], results[2]["clustered"])
+
+
+def test_average_time_series():
+    """
+    Tests averaging of time series
+
+    - blocks of consecutive time steps are averaged
+    - remaining time steps are added to the last block
+    """
+    data = pd.DataFrame(
+        {("a", "x"): np.arange(10, dtype=float), ("b", "y"): np.ones(10)}
+    )
+    averaged = average_time_series(data, 2)
+    assert list(averaged.columns) == list(data.columns)
+    assert (averaged[("a", "x")] == [0.5, 2.5, 4.5, 6.5, 8.5]).all()
+    assert (averaged[("b", "y")] == 1).all()
+
+    averaged = average_time_series(data, 3)
+    assert (averaged[("a", "x")] == [1, 4, 7.5]).all()
+
+
+def test_read_time_series_cache(tmp_path):
+    """
+    Tests the time series cache
+
+    - cache is written on first read and used on second read
+    - cache is invalidated if an input file changes
+    """
+    path = tmp_path / "case_study"
+    shutil.copytree(Path("tests/case_study_full_pipeline"), path)
+
+    dh = DataHandle()
+    dh.set_settings(path, start_period=0, end_period=24)
+    dh._read_topology()
+    dh._read_model_config()
+    dh.model_config["datahandling"]["time_series_cache"]["value"] = 1
+
+    # Cold start writes cache
+    dh._read_time_series()
+    time_series_csv = dh.time_series["full"]
+    assert (path / "TimeSeriesCache.h5").is_file()
+
+    # Warm start reads cache
+    dh._read_time_series()
+    pd.testing.assert_frame_equal(time_series_csv, dh.time_series["full"])
+
+    # Changing an input file invalidates the cache
+    carbon_cost_path = path / "period1" / "node_data" / "node1" / "CarbonCost.csv"
+    carbon_cost = pd.read_csv(carbon_cost_path, sep=";", index_col=0)
+    carbon_cost["price"] = 123.0
+    carbon_cost.to_csv(carbon_cost_path, sep=";")
+    dh._read_time_series()
+    assert (
+        dh.time_series["full"]["period1"]["node1"]["CarbonCost"]["global"]["price"]
+        == 123
+    ).all()
+
+
+def test_fitting_deduplication(tmp_path):
+    """
+    Tests that identical technologies are only fitted once
+
+    - technologies fitted as copies share read-only arrays of their coefficients
+    - the arrays of the fitted technology are not shared and stay writeable, so
+      modifying them does not change the copies
+    - size limits are set for each technology
+    """
+    path = tmp_path / "case_study"
+    shutil.copytree(Path("tests/case_study_full_pipeline"), path)
+    technologies_path = path / "period1" / "node_data" / "node1" / "Technologies.json"
+    technologies = load_json(technologies_path)
+    technologies["existing"]["TestTec_WindTurbine"] = 2
+    save_json(technologies, technologies_path)
+    shutil.copytree(path / "period1", path / "period2")
+    topology = load_json(path / "Topology.json")
+    topology["investment_periods"] = ["period1", "period2"]
+    save_json(topology, path / "Topology.json")
+
+    dh = DataHandle()
+    dh.set_settings(path, start_period=0, end_period=24)
+    dh.read_data()
+
+    tec_new = dh.technology_data["period1"]["node1"]["TestTec_WindTurbine"]
+    tec_existing = dh.technology_data["period1"]["node1"][
+        "TestTec_WindTurbine_existing"
+    ]
+    tec_period2 = dh.technology_data["period2"]["node1"]["TestTec_WindTurbine"]
+    assert tec_new is not tec_existing
+    capfactor_new = tec_new.processed_coeff.time_dependent_full["capfactor"]
+    capfactor_existing = tec_existing.processed_coeff.time_dependent_full["capfactor"]
+    capfactor_period2 = tec_period2.processed_coeff.time_dependent_full["capfactor"]
+    assert capfactor_existing is capfactor_period2
+    assert not capfactor_existing.flags.writeable
+    assert capfactor_new.flags.writeable
+    np.testing.assert_array_equal(capfactor_new, capfactor_existing)
+    assert "size_initial" not in tec_new.processed_coeff.time_independent
+    assert tec_existing.processed_coeff.time_independent["size_max"] == 2
+    assert tec_existing.processed_coeff.time_independent["size_initial"] == 2
+
+    # Modifying the fitted technology does not change the copies
+    capfactor_before = capfactor_existing.copy()
+    capfactor_new[:] = capfactor_new + 1
+    np.testing.assert_array_equal(capfactor_existing, capfactor_before)
+
+
+def test_fitting_cache(tmp_path):
+    """
+    Tests the cache of fitted technologies
+
+    - fitted technologies are written to the cache on first read
+    - cached technologies are the same as the fitted ones
+    - cache is not used if a technology json changes
+    """
+    path = tmp_path / "case_study"
+    shutil.copytree(Path("tests/case_study_full_pipeline"), path)
+
+    dh = DataHandle()
+    dh.set_settings(path, start_period=0, end_period=24)
+    dh._read_topology()
+    dh._read_model_config()
+    dh._read_time_series()
+    dh._read_node_locations()
+    dh.model_config["datahandling"]["fitting_cache_path"]["value"] = "cache"
+
+    dh._read_technology_data()
+    nr_tecs = dh.fitting_cache_statistics["misses"]
+    assert dh.fitting_cache_statistics["hits"] == 0
+    assert len(list((path / "cache").glob("*.npz"))) == nr_tecs
+    technology_data_fitted = dh.technology_data
+
+    dh._read_technology_data()
+    assert dh.fitting_cache_statistics == {"hits": nr_tecs, "misses": 0}
+    for period in technology_data_fitted:
+        for node in technology_data_fitted[period]:
+            for tec in technology_data_fitted[period][node]:
+                coeff_fitted = technology_data_fitted[period][node][tec].processed_coeff
+                coeff_cached = dh.technology_data[period][node][tec].processed_coeff
+                assert coeff_fitted.time_independent == coeff_cached.time_independent
+                for par in coeff_fitted.time_dependent_full:
+                    assert (
+                        coeff_fitted.time_dependent_full[par]
+                        == coeff_cached.time_dependent_full[par]
+                    ).all()
+
+    tec_path = (
+        path
+        / "period1"
+        / "node_data"
+        / "node2"
+        / "technology_data"
+        / "TestTec_BoilerEl.json"
+    )
+    tec_json = load_json(tec_path)
+    tec_json["Economics"]["lifetime"] = tec_json["Economics"]["lifetime"] + 1
+    save_json(tec_json, tec_path)
+
+    dh._read_technology_data()
+    assert dh.fitting_cache_statistics == {"hits": nr_tecs - 1, "misses": 1}
+
+
+def test_technology_fingerprint_data_files(tmp_path):
+    """
+    Tests that the fingerprint of a technology fit changes if a data file read by
+    the fit changes
+    """
+    data_path = tmp_path / "ccpp_data"
+    tec_data = read_tec_data(
+        "TestTec_CombinedCycle_fixed_size", Path("tests/technology_data")
+    )
+    shutil.copytree(tec_data.get_fitting_data_files()[0].parent, data_path)
+    tec_data.input_parameters.performance_data["performance_data_path"] = data_path
+    assert data_path / "GT_fitting_data.csv" in tec_data.get_fitting_data_files()
+
+    location = pd.Series({"lon": 5, "lat": 52, "alt": 10})
+    fingerprint = get_technology_fingerprint(
+        "TestTec_CombinedCycle_fixed_size",
+        Path("tests/technology_data"),
+        tec_data,
+        "climate",
+        location,
+    )
+
+    with open(data_path / "GT_fitting_data.csv", "a") as csv_file:
+        csv_file.write("\n")
+    assert fingerprint != get_technology_fingerprint(
+        "TestTec_CombinedCycle_fixed_size",
+        Path("tests/technology_data"),
+        tec_data,
+        "climate",
+        location,
+    )
+
+
+def test_cluster_data(tmp_path):
+    """
+    Tests the sequence and factors determined after clustering
+
+    - sequence maps each full resolution hour to an hour of its typical day
+    - factors sum up to the number of full resolution hours
+    """
+    dh = DataHandle()
+    dh.set_settings(Path("tests/case_study_full_pipeline"))
+    dh.read_data()
+    dh.model_config["optimization"]["typicaldays"]["N"]["value"] = 1
+    dh._cluster_data()
+
+    nr_timesteps_full = len(dh.topology["time_index"]["full"])
+    hours_per_day = dh.topology["hours_per_day"]["full"]
+    for period in dh.topology["investment_periods"]:
+        sequence = dh.k_means_specs[period]["sequence"]
+        factors = dh.k_means_specs[period]["factors"]
+        assert sequence.dtype == np.int32
+        assert factors.dtype == float
+        assert (
+            sequence
+            == np.tile(
+                np.arange(1, hours_per_day + 1), nr_timesteps_full // hours_per_day
+            )
+        ).all()
+        assert len(factors) == hours_per_day
+        assert factors.sum() == nr_timesteps_full
+
+
+def test_cluster_data_segments():
+    """
+    Tests clustering to typical days with segments
+
+    - number of clustered time steps is number of typical days times segments
+    - each hour is mapped to a segment of its typical day
+    - factors sum up to the number of full resolution hours
+    """
+    dh = DataHandle()
+    dh.set_settings(Path("tests/case_study_full_pipeline"))
+    dh.read_data()
+    dh.model_config["optimization"]["typicaldays"]["N"]["value"] = 1
+    dh.model_config["optimization"]["typicaldays"]["segments"]["value"] = 4
+    dh._cluster_data()
+
+    nr_timesteps_full = len(dh.topology["time_index"]["full"])
+    hours_per_day = dh.topology["hours_per_day"]["full"]
+    assert len(dh.topology["time_index"]["clustered"]) == 4
+    for period in dh.topology["investment_periods"]:
+        sequence = dh.k_means_specs[period]["sequence"]
+        factors = dh.k_means_specs[period]["factors"]
+        assert len(sequence) == nr_timesteps_full
+        assert (np.diff(sequence[:hours_per_day]) >= 0).all()
+        assert set(sequence) == {1, 2, 3, 4}
+        assert len(factors) == 4
+        assert factors.sum() == nr_timesteps_full
+        assert len(dh.time_series["clustered"][period]) == 4
+
+
+def test_cluster_data_segments_totals():
+    """
+    Tests that the totals of clustered data with segments are the same for both
+    clustering methods
+
+    - method 1: clustered time steps weighted with the factors
+    - method 2: clustered time steps mapped to the full resolution with the
+      sequence
+    - with as many typical days as days, both are equal to the full resolution
+      totals
+    """
+    dh = DataHandle()
+    dh.set_settings(Path("tests/case_study_full_pipeline"))
+    dh.read_data()
+    nr_days = int(
+        len(dh.topology["time_index"]["full"]) / dh.topology["hours_per_day"]["full"]
+    )
+    dh.model_config["optimization"]["typicaldays"]["N"]["value"] = nr_days
+    dh.model_config["optimization"]["typicaldays"]["segments"]["value"] = 4
+    dh._cluster_data()
+
+    for period in dh.topology["investment_periods"]:
+        sequence = dh.k_means_specs[period]["sequence"]
+        factors = dh.k_means_specs[period]["factors"]
+        clustered = dh.time_series["clustered"][period]
+        full = dh.time_series["full"][period][clustered.columns]
+
+        totals_method1 = factors @ clustered.to_numpy(dtype=float)
+        totals_method2 = clustered.to_numpy(dtype=float)[sequence - 1].sum(axis=0)
+        np.testing.assert_allclose(totals_method1, totals_method2)
+        np.testing.assert_allclose(
+            totals_method1, full.to_numpy(dtype=float).sum(axis=0)
+        )
+
+        for node in dh.technology_data[period]:
+            for tec in dh.technology_data[period][node].values():
+                coeff = tec.processed_coeff
+                for par, values in coeff.time_dependent_clustered.items():
+                    values = np.asarray(values, dtype=float)
+                    np.testing.assert_allclose(
+                        factors @ values, values[sequence - 1].sum()
+                    )
+
+
+def test_clustering_cache(tmp_path):
+    """
+    Tests the cache of clustering results
+
+    - clustering results are written to the cache (one file per investment period)
+    - cached clustering results are the same as the clustered ones
+    - cache is not used if the clustering settings change
+    """
+    path = tmp_path / "case_study"
+    shutil.copytree(Path("tests/case_study_full_pipeline"), path)
+
+    dh = DataHandle()
+    dh.set_settings(path)
+    dh.read_data()
+    dh.model_config["datahandling"]["clustering_cache_path"]["value"] = "cache"
+    dh.model_config["optimization"]["typicaldays"]["N"]["value"] = 1
+
+    dh._cluster_data()
+    nr_periods = len(dh.topology["investment_periods"])
+    assert len(list((path / "cache").glob("*.h5"))) == nr_periods
+    k_means_specs = copy.deepcopy(dh.k_means_specs)
+    time_series_clustered = dh.time_series["clustered"].copy()
+
+    dh._cluster_data()
+    for period in k_means_specs:
+        for key in ["sequence", "factors"]:
+            assert (dh.k_means_specs[period][key] == k_means_specs[period][key]).all()
+    pd.testing.assert_frame_equal(dh.time_series["clustered"], time_series_clustered)
+
+    dh.model_config["optimization"]["typicaldays"]["N"]["value"] = 2
+    dh._cluster_data()
+    assert len(list((path / "cache").glob("*.h5"))) == 2 * nr_periods
+
+
+def test_benchmark_clustering(tmp_path):
+    """
+    Tests the clustering benchmark
+
+    - reconstruction errors are zero, if each day is a typical day
+    - smallest number of typical days within tolerance is recommended
+    - report is written
+    """
+    dh = DataHandle()
+    dh.set_settings(Path("tests/case_study_full_pipeline"))
+    dh.read_data()
+
+    report_path = tmp_path / "clustering_benchmark.csv"
+    report, nr_typical_days = benchmark_clustering(
+        dh, [2, 1], tolerance=1e-6, report_path=report_path
+    )
+
+    assert list(report["nr_typical_days"]) == [1, 2]
+    assert (report.loc[report["nr_typical_days"] == 2, ERROR_METRICS] == 0).all(
+        axis=None
+    )
+    assert (report["clustering_time"] > 0).all()
+    assert nr_typical_days == 2
+    assert recommend_nr_typical_days(report, report["rmse"].max()) == 1
+    assert recommend_nr_typical_days(report, -1) is None
+    assert pd.read_csv(report_path).shape == report.shape
+
+
+def test_json_catalogue(tmp_path):
+    """
+    Tests the json catalogue
+
+    - files in subdirectories are found, files in upper directories have priority
+    - case insensitive lookup
+    - modified and added files are picked up
+    """
+    (tmp_path / "sub").mkdir()
+    save_json({"value": 1}, tmp_path / "TecA.json")
+    save_json({"value": 2}, tmp_path / "sub" / "TecA.json")
+    save_json({"value": 3}, tmp_path / "sub" / "TecB.json")
+
+    catalogue = JsonCatalogue()
+    assert catalogue.load("TecA", tmp_path)["value"] == 1
+    assert catalogue.load("TecB", tmp_path)["value"] == 3
+    assert catalogue.find("tecb", tmp_path) is None
+    assert (
+        catalogue.find("tecb", tmp_path, case_sensitive=False)
+        == (tmp_path / "sub" / "TecB.json").resolve()
+    )
+    assert len(catalogue.indices) == 1
+
+    # Loaded data can be changed without changing the cache
+    data = catalogue.load("TecA", tmp_path)
+    data["value"] = 10
+    assert catalogue.load("TecA", tmp_path)["value"] == 1
+
+    # Modified and added files
+    save_json({"value": 100, "new_entry": 0}, tmp_path / "TecA.json")
+    save_json({"value": 4}, tmp_path / "TecC.json")
+    assert catalogue.load("TecA", tmp_path)["value"] == 100
+    assert catalogue.load("TecC", tmp_path)["value"] == 4
+    assert catalogue.load("TecD", tmp_path) is None
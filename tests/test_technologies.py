@@ -5,6 +5,9 @@ from pathlib import Path
 from pyomo.environ import ConcreteModel, Set, Constraint, TerminationCondition
 import json
 import numpy as np
+import pandas as pd
+import statsmodels.api as sm
+from scipy.interpolate import griddata
 
 from tests.utilities import (
     make_climate_data,
@@ -15,6 +18,25 @@ from adopt_net0.components.technologies.technology import Technology
 from adopt_net0.data_management.utilities import open_json, select_technology
 from adopt_net0.components.utilities import annualize
 from adopt_net0.components.utilities import perform_disjunct_relaxation
+from adopt_net0.components.technologies.utilities import (
+    fit_linear_function_batched,
+    add_constant,
+    fit_piecewise_function,
+    fit_piecewise_function_batched,
+    get_unique_conditions,
+    interpolate_linear_batched,
+)
+from adopt_net0.components.technologies.genericTechnologies.res import (
+    get_cec_module_database,
+    clear_pv_performance_cache,
+    WindTurbineCurveRegistry,
+    calculate_wind_turbine_capacity_factors,
+    wind_turbine_curves,
+)
+from adopt_net0.components.technologies.specificTechnologies.combined_cycle import (
+    read_ccpp_performance_tables,
+)
+from adopt_net0.diagnostics.fitting_benchmark import benchmark_linear_fit
 
 
 def define_technology(
@@ -278,6 +300,39 @@ def test_res_pv(request):
     assert termination == TerminationCondition.optimal
 
 
+def test_res_pv_cache(request):
+    """
+    tests that pv performances are calculated once per unique site
+
+    - the module database is read once
+    - identical sites have the same capacity factors (not the same array)
+    - a different location has different capacity factors
+    """
+    clear_pv_performance_cache()
+    get_cec_module_database.cache_clear()
+    assert get_cec_module_database() is get_cec_module_database()
+
+    load_path = request.config.technology_data_folder_path
+    tec1 = define_technology("TestTec_ResPhotovoltaic", 24, load_path)
+    tec2 = define_technology("TestTec_ResPhotovoltaic", 24, load_path)
+
+    capfactor1 = tec1.processed_coeff.time_dependent_full["capfactor"]
+    capfactor2 = tec2.processed_coeff.time_dependent_full["capfactor"]
+    assert (capfactor1 == capfactor2).all()
+    assert capfactor1 is not capfactor2
+
+    # Different location
+    with open(load_path / "TestTec_ResPhotovoltaic.json") as json_file:
+        tec_data = json.load(json_file)
+    tec_data["name"] = "TestTec_ResPhotovoltaic"
+    tec3 = select_technology(tec_data)
+    tec3.fit_technology_performance(
+        make_climate_data("2022-01-01 12:00", 24), {"lon": 5.5, "lat": 45, "alt": 0}
+    )
+    capfactor3 = tec3.processed_coeff.time_dependent_full["capfactor"]
+    assert (capfactor1 != capfactor3).any()
+
+
 def test_res_wt(request):
     """
     tests wind turbine technology
@@ -313,6 +368,122 @@ def test_res_wt(request):
     assert termination == TerminationCondition.optimal
 
 
+def test_res_wt_power_curve(request):
+    """
+    tests that a wind turbine uses the power curve of the turbine with its name
+    """
+    time_steps = 24
+    load_path = request.config.technology_data_folder_path
+    with open(load_path / "TestTec_WindTurbine.json") as json_file:
+        tec = json.load(json_file)
+    tec["name"] = "WindTurbine_Onshore_4000"
+    tec = select_technology(tec)
+
+    climate_data = make_climate_data("2022-01-01 12:00", time_steps)
+    climate_data["ws10"] = np.linspace(2, 12, time_steps)
+    tec.fit_technology_performance(climate_data, {"lon": 5.5, "lat": 52.5, "alt": 0})
+
+    registry = WindTurbineCurveRegistry()
+    hubheight = tec.input_parameters.performance_data.get("hubheight", 120)
+    capacity_factors = registry.calculate_capacity_factors(
+        climate_data["ws10"].to_numpy(),
+        [
+            ("WindTurbine_Onshore_4000", hubheight, 1 / 7),
+            (registry.default_turbine, hubheight, 1 / 7),
+        ],
+    ).round(3)
+    capfactor = tec.processed_coeff.time_dependent_full["capfactor"]
+    assert tec.input_parameters.rated_power == 4
+    np.testing.assert_array_equal(capfactor, capacity_factors[0])
+    assert (capfactor != capacity_factors[1]).any()
+
+
+def test_wind_turbine_curves():
+    """
+    tests the batched evaluation of wind turbine power curves
+    """
+    registry = WindTurbineCurveRegistry()
+    rated_power, power_curve = registry.get_power_curve("WindTurbine_Onshore_4000")
+    assert rated_power == 4000
+    assert len(power_curve) == len(registry.wind_speeds)
+
+    ws = np.array([-1, 0, 3.2, 5.25, 8, 12.5, 30])
+    turbines = [
+        ("WindTurbine_Onshore_4000", 120, 1 / 7),
+        ("WindTurbine_Offshore_6000", 120, 1 / 7),
+        ("WindTurbine_Onshore_4000", 120, 0.3),
+        ("WindTurbine_Onshore_4000", 0, 1 / 7),
+    ]
+    capacity_factors = registry.calculate_capacity_factors(ws, turbines)
+    assert capacity_factors.shape == (len(turbines), len(ws))
+    assert len(registry._capacity_factors) == len(turbines)
+    assert (capacity_factors >= 0).all() and (capacity_factors <= 1).all()
+
+    # Power law exponent is considered
+    assert (capacity_factors[0] != capacity_factors[2]).any()
+
+    # Batched evaluation equals np.interp of each turbine
+    for (name, hubheight, alpha), capacity_factor in zip(turbines, capacity_factors):
+        ws_hub = ws * (hubheight / 10) ** alpha if hubheight > 0 else ws
+        rated_power, power_curve = registry.get_power_curve(name)
+        expected = np.interp(ws_hub, registry.wind_speeds, power_curve) / rated_power
+        assert np.allclose(capacity_factor, expected)
+
+    # Missing wind speeds result in missing capacity factors
+    ws = np.array([np.nan, 8, np.inf])
+    capacity_factors = registry.calculate_capacity_factors(
+        ws, [("WindTurbine_Onshore_4000", 120, 1 / 7)]
+    )
+    assert np.isnan(capacity_factors[0, [0, 2]]).all()
+    assert capacity_factors[0, 1] > 0
+
+
+def test_wind_turbine_batch(request):
+    """
+    tests the evaluation of several wind turbines in one batch before fitting
+    """
+    load_path = request.config.technology_data_folder_path
+    climate_data = make_climate_data("2022-01-01 12:00", 24)
+    climate_data["ws10"] = np.linspace(2, 12, 24)
+    tecs = []
+    for name, hubheight in [
+        ("WindTurbine_Onshore_4000", 100),
+        ("WindTurbine_Onshore_4000", 140),
+        ("WindTurbine_Offshore_6000", 100),
+    ]:
+        with open(load_path / "TestTec_WindTurbine.json") as json_file:
+            tec_data = json.load(json_file)
+        tec_data["name"] = name
+        tec_data["Performance"]["hubheight"] = hubheight
+        tecs.append(select_technology(tec_data))
+    tecs.append(define_technology("TestTec_HeatPump_AirSourced", 24, load_path))
+
+    wind_turbine_curves.clear_cache()
+    calculate_wind_turbine_capacity_factors(tecs, [climate_data] * len(tecs))
+    assert len(wind_turbine_curves._capacity_factors) == 3
+    turbines = [tec.get_wind_turbine() for tec in tecs[:3]]
+    capacity_factors = wind_turbine_curves.calculate_capacity_factors(
+        climate_data["ws10"].to_numpy(), turbines
+    )
+
+    for tec, capacity_factor in zip(tecs[:3], capacity_factors):
+        tec.fit_technology_performance(
+            climate_data, {"lon": 5.5, "lat": 52.5, "alt": 0}
+        )
+        np.testing.assert_array_equal(
+            tec.processed_coeff.time_dependent_full["capfactor"],
+            capacity_factor.round(3),
+        )
+    assert len(wind_turbine_curves._capacity_factors) == 3
+
+    # Batches larger than the cache
+    registry = WindTurbineCurveRegistry(cache_size=1)
+    capacity_factors = registry.calculate_capacity_factors(
+        climate_data["ws10"].to_numpy(), turbines
+    )
+    assert capacity_factors.shape == (3, 24)
+
+
 def test_conv_perf(request):
     """
     tests generic conversion technologies
@@ -943,6 +1114,58 @@ def test_dac(request):
     assert model.var_capex.value > 0
 
 
+def test_dac_performance_interpolation(request):
+    """
+    Tests the interpolation of the DAC performance data against the interpolation
+    with griddata per performance point on a small grid of climate conditions
+    """
+    load_path = request.config.technology_data_folder_path
+    with open(load_path / "TestTec_DAC_Adsorption.json") as json_file:
+        tec_data = json.load(json_file)
+    tec_data["name"] = "TestTec_DAC_Adsorption"
+    tec = select_technology(tec_data)
+
+    T, RH = np.meshgrid([0, 10, 30, 40], [10, 43, 90])
+    climate_data = make_climate_data("2022-01-01 12:00", T.size)
+    climate_data["temp_air"] = T.flatten()
+    climate_data["rh"] = RH.flatten()
+    tec.fit_technology_performance(climate_data, {"lon": 5.5, "lat": 52.5, "alt": 0})
+    coeff = tec.processed_coeff.time_dependent_full
+
+    # Per-point interpolation with griddata
+    performance_data = pd.read_csv(tec.get_fitting_data_files()[0], sep=",")
+    for var in ["E_tot", "E_el"]:
+        performance_data[var] = performance_data[var] * (
+            performance_data.CO2_Out / 3600
+        )
+    performance_data.CO2_Out = performance_data.CO2_Out / 1000
+    T = np.maximum(climate_data["temp_air"], performance_data["T"].min())
+    nr_points = performance_data.Point.nunique()
+    performance = {
+        var: np.empty((T.size, nr_points)) for var in ["CO2_Out", "E_tot", "E_el"]
+    }
+    for point in performance_data.Point.unique():
+        point_data = performance_data.loc[performance_data.Point == point]
+        for var in performance:
+            performance[var][:, point - 1] = griddata(
+                (point_data["T"], point_data.RH),
+                point_data[var],
+                (T, climate_data["rh"]),
+                method="linear",
+            )
+    nr_segments = int(tec.input_parameters.performance_data["nr_segments"])
+    fit_output = fit_piecewise_function_batched(
+        performance["E_tot"], {"CO2_Out": performance["CO2_Out"]}, nr_segments
+    )["CO2_Out"]
+    fit_input = fit_piecewise_function_batched(
+        performance["E_tot"], {"E_el": performance["E_el"]}, nr_segments
+    )["E_el"]
+
+    assert np.allclose(coeff["alpha"], fit_output["alpha1"])
+    assert np.allclose(coeff["beta"], fit_output["alpha2"])
+    assert np.allclose(coeff["gamma"], fit_input["alpha1"])
+
+
 def test_hydro_open(request):
     """
     tests Open Hydro
@@ -1149,3 +1372,165 @@ def test_combined_cycle_fixed_size(request):
     termination = run_model(model, request.config.solver)
     assert termination == TerminationCondition.optimal
     assert model.var_input_tot[1, "gas"].value >= 140 / 0.5
+
+
+def test_fit_linear_function_batched():
+    """
+    Tests the batched linear fit against a statsmodels OLS fit of each series
+
+    - without and with intercept (add_constant equals sm.add_constant)
+    - one-dimensional x data
+    """
+    rng = np.random.default_rng(0)
+    x = np.linspace(0.5, 1, 9)
+    y = rng.uniform(0, 5, (9, 4))
+
+    assert np.array_equal(add_constant(x), sm.add_constant(x))
+    for design_matrix in [x[:, None], add_constant(x)]:
+        coeff = fit_linear_function_batched(design_matrix, y)
+        assert coeff.shape == (design_matrix.shape[1], 4)
+        for series in range(4):
+            coeff_ols = sm.OLS(y[:, series], design_matrix).fit().params
+            assert np.allclose(coeff[:, series], coeff_ols)
+
+    coeff_ols = sm.OLS(2 * x, x).fit().params
+    assert np.allclose(fit_linear_function_batched(x, 2 * x), coeff_ols)
+
+
+def test_benchmark_linear_fit():
+    """
+    Tests the micro-benchmark of the linear performance fits
+    """
+    report = benchmark_linear_fit(nr_timesteps=24, nr_repetitions=1)
+    assert list(report.index) == [1, 2]
+    assert (report["max_deviation"] < 1e-10).all()
+    assert (report["time_batched_ms"] > 0).all()
+
+
+def test_fit_piecewise_function_batched():
+    """
+    Tests the batched piecewise fit against the fit with pwlf
+
+    - root mean squared residual at most 0.5% of the range of y worse than pwlf
+    - second series uses the breakpoints of the first series
+    """
+    rng = np.random.default_rng(0)
+    nr_data_sets = 10
+    x = np.linspace(0.5, 1, 9)
+    y = {}
+    y["out"] = np.outer(rng.uniform(2, 5, nr_data_sets), x**2 / (1 - 0.9 * (1 - x)))
+    y["out"] = y["out"] + rng.normal(0, 0.01, y["out"].shape)
+    y["out2"] = 2 * y["out"]
+
+    def rms_residual(fit, y_data):
+        y_fit = np.interp(x, np.array(fit["bp_x"]), np.array(fit["bp_y"]))
+        return np.sqrt(np.mean((y_fit - y_data) ** 2))
+
+    for nr_segments in [1, 2, 3]:
+        fit = fit_piecewise_function_batched(x, y, nr_segments)
+        assert fit["out"]["alpha1"].shape == (nr_data_sets, nr_segments)
+        assert fit["out"]["bp_x"].shape == (nr_data_sets, nr_segments + 1)
+        assert (fit["out"]["bp_x"] == fit["out2"]["bp_x"]).all()
+
+        for i in range(nr_data_sets):
+            fit_pwlf = fit_piecewise_function(x, {"out": y["out"][i]}, nr_segments)
+            fit_batched = {par: fit["out"][par][i] for par in fit["out"]}
+            assert rms_residual(fit_batched, y["out"][i]) <= rms_residual(
+                fit_pwlf["out"], y["out"][i]
+            ) + 0.005 * np.ptp(y["out"][i])
+
+    with pytest.raises(ValueError):
+        fit_piecewise_function_batched(x, y, 2, nr_candidates=1)
+
+    # Segments contain at least two data points (CCPP gas turbine, 4 data points)
+    data_path = (
+        Path(__file__).parent.parent
+        / "adopt_net0/data/technology_data/PowerGeneration/CombinedCycle_fixed_size_data"
+    )
+    tables = read_ccpp_performance_tables(data_path)
+    T = np.linspace(0, 30, 31)
+    p_in = np.empty(shape=(len(T), tables["GT"]["nr_igv_positions"]))
+    p_out = np.empty(shape=p_in.shape)
+    for group in tables["GT"]["groups"]:
+        interpolated = interpolate_linear_batched(T, group["T"], group["values"])
+        p_in[:, group["positions"]] = interpolated[:, 1::3]
+        p_out[:, group["positions"]] = interpolated[:, 1::3] * interpolated[:, 0::3]
+    fit = fit_piecewise_function_batched(p_in, {"out": p_out}, 2)["out"]
+    assert (np.diff(fit["bp_x"], axis=1) > 0).all()
+    tolerance = 0.001 * np.ptp(p_in, axis=1, keepdims=True)
+    for bp in [1, 2]:
+        lower = fit["bp_x"][:, [bp - 1]] - tolerance
+        upper = fit["bp_x"][:, [bp]] + tolerance
+        assert (np.sum((p_in >= lower) & (p_in <= upper), axis=1) >= 2).all()
+    tolerance = 0.001 * np.ptp(p_out, axis=1)
+    assert (fit["bp_y"].min(axis=1) >= p_out.min(axis=1) - tolerance).all()
+    assert (fit["bp_y"].max(axis=1) <= p_out.max(axis=1) + tolerance).all()
+
+
+def test_fit_unique_conditions(request):
+    """
+    Tests that performances are fitted for unique (rounded) conditions
+
+    - same coefficients for time steps with the same (rounded) temperature
+    - rounding to a precision the data already has does not change the fit
+    """
+    conditions, index = get_unique_conditions(np.array([1.04, 2.0, 0.96, 2.0]), 1)
+    assert (conditions == [1.0, 2.0]).all()
+    assert (conditions[index] == [1.0, 2.0, 1.0, 2.0]).all()
+
+    load_path = request.config.technology_data_folder_path
+    climate_data = make_climate_data("2022-01-01 12:00", 6)
+    climate_data["temp_air"] = [4.1, 10.0, 3.9, 10.0, 4.1, -2.0]
+    location = {"lon": 5.5, "lat": 52.5, "alt": 0}
+
+    coeff = {}
+    for decimals in [None, 1, 0]:
+        with open(load_path / "TestTec_HeatPump_AirSourced.json") as json_file:
+            tec_data = json.load(json_file)
+        tec_data["name"] = "TestTec_HeatPump_AirSourced"
+        if decimals is not None:
+            tec_data["Performance"]["fitting_condition_decimals"] = decimals
+        tec = select_technology(tec_data)
+        tec.fit_technology_performance(climate_data, location)
+        coeff[decimals] = tec.processed_coeff.time_dependent_full
+
+    for par in coeff[None]:
+        assert (coeff[None][par][1] == coeff[None][par][3]).all()
+        assert (coeff[None][par][0] == coeff[None][par][4]).all()
+        assert (coeff[1][par] == coeff[None][par]).all()
+        assert (coeff[0][par][0] == coeff[0][par][2]).all()
+
+
+def test_interpolate_linear_batched():
+    """
+    Tests the linear interpolation of multiple data series and the cached CCPP
+    performance tables
+    """
+    xp = np.array([10, 0, 20, 30])
+    FP = np.array([[1, 5], [0, 2], [4, 3], [2, 3]])
+    x = np.array([-1, 0, 5, 10, 12.5, 30, 31])
+    interpolated = interpolate_linear_batched(x, xp, FP)
+    for i in range(FP.shape[1]):
+        expected = np.interp(x, np.sort(xp), FP[np.argsort(xp), i])
+        expected[(x < 0) | (x > 30)] = np.nan
+        assert np.array_equal(interpolated[:, i], expected, equal_nan=True)
+
+    # Data points with the same x value are replaced by their mean
+    xp = np.array([10, 0, 10, 30])
+    interpolated = interpolate_linear_batched(x, xp, FP)
+    assert np.isfinite(interpolated[1:-1]).all()
+    FP_mean = np.array([[0, 2], [2.5, 4], [2, 3]])
+    for i in range(FP.shape[1]):
+        expected = np.interp(x, [0, 10, 30], FP_mean[:, i])
+        expected[(x < 0) | (x > 30)] = np.nan
+        assert np.allclose(interpolated[:, i], expected, equal_nan=True)
+
+    data_path = (
+        Path(__file__).parent.parent
+        / "adopt_net0/data/technology_data/PowerGeneration/CombinedCycle_fixed_size_data"
+    )
+    tables = read_ccpp_performance_tables(data_path)
+    assert read_ccpp_performance_tables(data_path) is tables
+    assert sum(len(group["positions"]) for group in tables["GT"]["groups"]) == (
+        tables["GT"]["nr_igv_positions"]
+    )